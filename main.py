@@ -8,7 +8,14 @@
 - Масштабируемой структуры для будущего развития
 """
 
+import asyncio
+import time
+
+# Начало отсчета времени запуска (до импорта остальных модулей)
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import logging
@@ -19,7 +26,18 @@ load_dotenv()
 
 from src.routes import router
 from src.applications.azure_handling.routes import router as azure_router
-from src.config import get_app_config, validate_azure_config
+from src.applications.azure_handling.services import AzureSpeechService
+from src.applications.azure_handling.warmup import install_executor, prepare_engine
+from src.applications.azure_handling.analytics import start_analytics, stop_analytics
+from src.applications.azure_handling.difficulty import start_difficulty, stop_difficulty
+from src.applications.azure_handling.progress import start_progress, stop_progress
+from src.config import get_app_config, get_azure_config, validate_azure_config
+from src.admission import AdmissionMiddleware
+from src.rate_limit import RateLimitMiddleware
+from src.compression import CompressionMiddleware
+from src.startup import FirstResponseMiddleware, get_startup
+from src.tracing import TracingMiddleware, start_tracing_export, stop_tracing_export
+from src.watchdog import SlowRequestMiddleware, start_watchdog, stop_watchdog
 
 # Настройка логирования
 logging.basicConfig(
@@ -38,7 +56,34 @@ app = FastAPI(
     version=app_config.version,
     docs_url="/docs",
     redoc_url="/redoc",
-    openapi_url="/openapi.json"
+    openapi_url="/openapi.json",
+    # orjson заметно быстрее стандартного json на ответах с большим количеством слов
+    default_response_class=ORJSONResponse
+)
+
+# Контроль допуска запросов анализа: ограничение аудио в памяти и сброс нагрузки до чтения тела
+# (внутренний middleware, чтобы ответы 503 проходили через CORS)
+azure_config = get_azure_config()
+app.add_middleware(
+    AdmissionMiddleware,
+    path_prefix="/api/v1/azure",
+    max_requests=azure_config.admission_max_requests,
+    max_audio_bytes=azure_config.admission_max_audio_bytes,
+    streaming_body_bytes=azure_config.stream_max_item_bytes * azure_config.batch_concurrency,
+    retry_after=azure_config.admission_retry_after
+)
+
+# Клиент запроса и лимиты частоты по клиентам (до контроля допуска: отклоненные запросы
+# не занимают бюджет); клиент определяется и без лимитов — для справедливой очереди
+app.add_middleware(
+    RateLimitMiddleware,
+    path_prefix="/api/v1/azure",
+    requests_per_second=azure_config.rate_limit_rps,
+    burst=azure_config.rate_limit_burst,
+    audio_seconds_per_minute=azure_config.rate_limit_audio_seconds_per_minute,
+    enabled=azure_config.rate_limit_enabled,
+    trusted_proxies=azure_config.rate_limit_trusted_proxies,
+    trust_client_id=azure_config.rate_limit_trust_client_id
 )
 
 # Настройка CORS для мобильных приложений
@@ -48,6 +93,7 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
 print(app_config.cors_origins_list)
@@ -58,10 +104,42 @@ app.add_middleware(
     allowed_hosts=["*"]  # В продакшене следует ограничить
 )
 
+# Сжатие ответов (пакетные результаты и детали анализа)
+if app_config.compression_min_size > 0:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=app_config.compression_min_size,
+        offload_size=app_config.compression_offload_size,
+        level=app_config.compression_level
+    )
+
 # Подключение маршрутов
 app.include_router(router, prefix="/api/v1")
 app.include_router(azure_router, prefix="/api/v1")
 
+# Профили медленных запросов (внутри трассировки: отчет содержит этапы трассы)
+if app_config.slow_request_threshold > 0:
+    app.add_middleware(SlowRequestMiddleware, path_prefix="/api/v1/azure")
+
+# Трассировка этапов и Server-Timing (снаружи остальных middleware, чтобы учитывать их время)
+if app_config.tracing_enabled:
+    app.add_middleware(
+        TracingMiddleware,
+        path_prefix="/api/v1/azure",
+        sample_rate=app_config.tracing_sample_rate
+    )
+
+# Время до первого ответа (внешний middleware)
+app.add_middleware(FirstResponseMiddleware)
+
+startup = get_startup()
+startup.restart(_import_started)
+startup.budget = app_config.startup_budget
+startup.mark("app_imported")
+
+# Ссылки на фоновые задачи запуска (иначе задача может быть удалена сборщиком мусора)
+_background_tasks = set()
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -71,12 +149,30 @@ async def startup_event():
     """
     logger.info(f"Запуск {app_config.app_name} v{app_config.version}")
     
+    # Пул потоков по умолчанию устанавливается до того, как что-либо успеет им воспользоваться
+    install_executor()
+    
     # Проверка конфигурации Azure
     if not validate_azure_config():
         logger.error("Неверная конфигурация Azure")
         raise RuntimeError("Неверная конфигурация Azure")
     
     logger.info("Azure конфигурация валидна")
+    
+    # Azure Speech SDK загружается и прогревается в фоне, не задерживая начало приема
+    # соединений; /api/v1/ready станет успешным после прогрева
+    startup.require("engine")
+    task = asyncio.create_task(prepare_engine(AzureSpeechService(), startup))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    
+    # Фоновая выгрузка истории оценок (если настроена), агрегаты сложности и история попыток
+    start_analytics()
+    start_difficulty()
+    start_progress()
+    start_tracing_export()
+    start_watchdog()
+    startup.mark("startup_complete")
     logger.info(f"Сервер запущен на {app_config.host}:{app_config.port}")
     logger.info("API документация доступна на /docs")
 
@@ -84,6 +180,11 @@ async def startup_event():
 async def shutdown_event():
     """Событие остановки приложения."""
     logger.info("Остановка приложения")
+    await stop_analytics()
+    await stop_difficulty()
+    await stop_progress()
+    await stop_tracing_export()
+    stop_watchdog()
 
 # Корневой эндпоинт
 @app.get("/")
@@ -104,13 +205,19 @@ async def root():
 
 
 if __name__ == "__main__":
-    import uvicorn
-    
-    # Запуск сервера
-    uvicorn.run(
-        "main:app",
-        host=app_config.host,
-        port=app_config.port,
-        reload=app_config.debug,
-        log_level="info"
-    )
+    if app_config.server_mode == "production":
+        # Несколько процессов-воркеров под gunicorn
+        from src.server import run_production
+        
+        run_production("main:app")
+    else:
+        import uvicorn
+        
+        # Запуск сервера
+        uvicorn.run(
+            "main:app",
+            host=app_config.host,
+            port=app_config.port,
+            reload=app_config.debug,
+            log_level="info"
+        )
@@ -0,0 +1,81 @@
+"""
+Тест Azure эндпоинта /azure/audio и анализа по audio_id
+"""
+
+import httpx
+import asyncio
+import json
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_audio_upload_and_reuse():
+    """Тест загрузки аудио один раз и пакетного анализа по audio_id."""
+    print("Тестирование /api/v1/azure/audio")
+    
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/audio",
+                json={"audio_data": load_example_audio()}
+            )
+            
+            print(f"Status Code: {response.status_code}")
+            if response.status_code != 200:
+                print(f"Response: {response.text}")
+                return
+            
+            upload = response.json()
+            print(json.dumps(upload, indent=2, ensure_ascii=False))
+            audio_id = upload["audio_id"]
+            
+            # Одна запись оценивается по нескольким референсным текстам без повторной загрузки
+            test_data = {
+                "requests": [
+                    {"audio_id": audio_id, "reference_text": "jmenuji se", "language": "cs-CZ"},
+                    {"audio_id": audio_id, "reference_text": "jmenuji se Pavel", "language": "cs-CZ"},
+                    {"audio_id": audio_id, "reference_text": "jmenuji se Anna", "language": "cs-CZ"}
+                ]
+            }
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment/batch",
+                json=test_data
+            )
+            print(f"Batch Status Code: {response.status_code}")
+            if response.status_code == 200:
+                data = response.json()
+                print(f"Успешно: {data['successful_count']}, Неудачно: {data['failed_count']}")
+                for result in data["results"]:
+                    print(f"  {result['reference_text']}: {result['scores']['pronunciation_score']}")
+            else:
+                print(f"Response: {response.text}")
+            
+            # Неизвестный audio_id должен возвращать 404
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                json={"audio_id": "0" * 64, "reference_text": "jmenuji se"}
+            )
+            if response.status_code == 404:
+                print("Неизвестный audio_id корректно отклонен (404)")
+            else:
+                print(f"Неожиданный код для неизвестного audio_id: {response.status_code}")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ЗАГРУЗКИ АУДИО И АНАЛИЗА ПО AUDIO_ID")
+    print("=" * 60)
+    asyncio.run(test_audio_upload_and_reuse())
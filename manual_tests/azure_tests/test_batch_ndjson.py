@@ -0,0 +1,74 @@
+"""
+Тест Azure эндпоинта /azure/pronunciation-assessment/batch/ndjson
+"""
+
+import httpx
+import asyncio
+import json
+import time
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+ITEMS_COUNT = 10
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.wav."""
+    audio_path = Path(__file__).parent / "records" / "example.wav"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def ndjson_body(audio_data):
+    """Тело запроса NDJSON, отправляемое по одной строке с паузами."""
+    for i in range(ITEMS_COUNT):
+        item = {"audio_data": audio_data, "reference_text": "jmenuji se", "language": "cs-CZ"}
+        yield (json.dumps(item) + "\n").encode("utf-8")
+        await asyncio.sleep(0.2)
+    # Неверная строка должна вернуться ошибкой элемента, а не всего пакета
+    yield b'{"invalid": "data"}\n'
+
+
+async def test_batch_ndjson_endpoint():
+    """Тест пакетного анализа с потоковым разбором тела запроса."""
+    print("Тестирование /api/v1/azure/pronunciation-assessment/batch/ndjson")
+    
+    try:
+        async with httpx.AsyncClient(timeout=300.0) as client:
+            started = time.perf_counter()
+            async with client.stream(
+                "POST",
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment/batch/ndjson",
+                content=ndjson_body(load_example_audio()),
+                headers={"Content-Type": "application/x-ndjson"}
+            ) as response:
+                print(f"Status Code: {response.status_code}")
+                
+                summary = None
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    elapsed = time.perf_counter() - started
+                    if data.get("type") == "item":
+                        print(f"[{elapsed:.2f}s] Элемент {data['index']}: {data['status']} {data.get('error', '')}")
+                    else:
+                        summary = data
+                        print(f"[{elapsed:.2f}s] Сводка: {json.dumps(data, ensure_ascii=False)}")
+                
+                if summary and summary["total_processed"] == ITEMS_COUNT + 1 and summary["failed_count"] >= 1:
+                    print("Сводка корректна, неверная строка учтена как ошибка")
+                else:
+                    print("Сводка отсутствует или некорректна")
+                    
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ AZURE BATCH NDJSON ЭНДПОИНТА")
+    print("=" * 60)
+    asyncio.run(test_batch_ndjson_endpoint())
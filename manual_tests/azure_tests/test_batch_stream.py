@@ -0,0 +1,81 @@
+"""
+Тест Azure эндпоинта /azure/pronunciation-assessment/batch/stream
+"""
+
+import httpx
+import asyncio
+import json
+import time
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.wav."""
+    audio_path = Path(__file__).parent / "records" / "example.wav"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_batch_stream_endpoint():
+    """Тест потокового пакетного анализа произношения."""
+    print("Тестирование /api/v1/azure/pronunciation-assessment/batch/stream")
+    
+    audio_data = load_example_audio()
+    test_data = {
+        "requests": [
+            {"audio_data": audio_data, "reference_text": "jmenuji se", "language": "cs-CZ"},
+            {"audio_data": audio_data, "reference_text": "jmenuji se Pavel", "language": "cs-CZ"},
+            {"audio_data": audio_data, "reference_text": "jmenuji se Anna", "language": "cs-CZ"}
+        ]
+    }
+    
+    try:
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            started = time.perf_counter()
+            async with client.stream(
+                "POST",
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment/batch/stream",
+                json=test_data
+            ) as response:
+                print(f"Status Code: {response.status_code}")
+                print(f"Content-Type: {response.headers.get('content-type')}")
+                
+                items = []
+                summary = None
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    elapsed = time.perf_counter() - started
+                    if data.get("type") == "item":
+                        items.append(data)
+                        print(f"[{elapsed:.2f}s] Элемент {data['index']}: {data['status']}")
+                    elif data.get("type") == "summary":
+                        summary = data
+                        print(f"[{elapsed:.2f}s] Сводка: {json.dumps(data, ensure_ascii=False)}")
+                
+                # Проверка индексов и сводки
+                indexes = sorted(item["index"] for item in items)
+                if indexes == list(range(len(test_data["requests"]))):
+                    print("Получены результаты для всех элементов")
+                else:
+                    print(f"Несоответствие индексов: {indexes}")
+                
+                if summary and summary["successful_count"] + summary["failed_count"] == summary["total_processed"]:
+                    print("Сводка корректна")
+                else:
+                    print("Сводка отсутствует или некорректна")
+                    
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ AZURE BATCH STREAM ЭНДПОИНТА")
+    print("=" * 60)
+    asyncio.run(test_batch_stream_endpoint())
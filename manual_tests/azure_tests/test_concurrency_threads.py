@@ -0,0 +1,90 @@
+"""
+Тест количества потоков при росте конкурентности /azure/pronunciation-assessment
+
+Распознавание выполняется через неблокирующий recognize_once_async, поэтому
+количество потоков процесса не должно расти пропорционально числу
+одновременных запросов.
+"""
+
+import httpx
+import asyncio
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+CONCURRENCY_LEVELS = [1, 10, 50]
+# Допустимый прирост потоков между минимальным и максимальным уровнем конкурентности
+MAX_THREAD_GROWTH = 10
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.wav."""
+    audio_path = Path(__file__).parent / "records" / "example.wav"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def get_thread_counts(client):
+    """Получение количества потоков сервера из /metrics."""
+    response = await client.get(f"{BASE_URL}/api/v1/metrics")
+    gauges = response.json().get("gauges", {})
+    return gauges.get("python_threads", 0), gauges.get("process_threads", 0)
+
+
+async def run_level(client, concurrency, payload):
+    """Запуск N одновременных запросов с замером пикового числа потоков."""
+    peak = [0, 0]
+    finished = asyncio.Event()
+    
+    async def sample():
+        while not finished.is_set():
+            python_threads, process_threads = await get_thread_counts(client)
+            peak[0] = max(peak[0], python_threads)
+            peak[1] = max(peak[1], process_threads)
+            await asyncio.sleep(0.1)
+    
+    sampler = asyncio.create_task(sample())
+    responses = await asyncio.gather(*[
+        client.post(f"{BASE_URL}/api/v1/azure/pronunciation-assessment", json=payload)
+        for _ in range(concurrency)
+    ], return_exceptions=True)
+    finished.set()
+    await sampler
+    
+    ok = sum(1 for r in responses if not isinstance(r, Exception) and r.status_code == 200)
+    print(f"Конкурентность {concurrency}: успешно {ok}/{concurrency}, "
+          f"пик python-потоков {peak[0]}, пик потоков процесса {peak[1]}")
+    return peak
+
+
+async def test_thread_count_is_flat():
+    """Тест: количество потоков не растет вместе с конкурентностью."""
+    print("Тестирование потоков при росте конкурентности")
+    
+    payload = {
+        "audio_data": load_example_audio(),
+        "reference_text": "jmenuji se",
+        "language": "cs-CZ"
+    }
+    
+    try:
+        limits = httpx.Limits(max_connections=max(CONCURRENCY_LEVELS) + 5)
+        async with httpx.AsyncClient(timeout=120.0, limits=limits) as client:
+            peaks = [await run_level(client, level, payload) for level in CONCURRENCY_LEVELS]
+            
+            growth = peaks[-1][0] - peaks[0][0]
+            if growth <= MAX_THREAD_GROWTH:
+                print(f"Количество python-потоков стабильно (прирост {growth})")
+            else:
+                print(f"Количество python-потоков растет с конкурентностью (прирост {growth})")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ПОТОКОВ ПРИ КОНКУРЕНТНЫХ ЗАПРОСАХ")
+    print("=" * 60)
+    asyncio.run(test_thread_count_is_flat())
@@ -0,0 +1,64 @@
+"""
+Тест Azure эндпоинтов /azure/difficulty/words и /azure/difficulty/phrases (агрегаты сложности)
+"""
+
+import httpx
+import asyncio
+import base64
+import time
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_difficulty():
+    """Тест агрегатов сложности после нескольких оценок."""
+    print("Тестирование /api/v1/azure/difficulty/{words|phrases}")
+    
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            audio_data = load_example_audio()
+            for reference_text in ["jmenuji se", "jmenuji se Pavel"]:
+                response = await client.post(
+                    f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                    json={"audio_data": audio_data, "reference_text": reference_text, "language": "cs-CZ"}
+                )
+                print(f"Анализ '{reference_text}': {response.status_code}")
+            
+            for kind in ["words", "phrases"]:
+                for order_by in ["accuracy", "error_rate"]:
+                    start_time = time.time()
+                    response = await client.get(
+                        f"{BASE_URL}/api/v1/azure/difficulty/{kind}",
+                        params={"language": "cs-CZ", "min_count": 1, "limit": 5, "order_by": order_by}
+                    )
+                    elapsed = time.time() - start_time
+                    
+                    print(f"{kind} ({order_by}): {response.status_code} ({elapsed * 1000:.1f} мс)")
+                    if response.status_code == 200:
+                        for item in response.json()["items"]:
+                            print(
+                                f"  {item['item']}: n={item['count']} "
+                                f"accuracy={item['mean_accuracy']}±{item['std_accuracy']} "
+                                f"error_rate={item['error_rate']}"
+                            )
+                    else:
+                        print(f"Response: {response.text}")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ АГРЕГАТОВ СЛОЖНОСТИ СЛОВ И ФРАЗ")
+    print("=" * 60)
+    asyncio.run(test_difficulty())
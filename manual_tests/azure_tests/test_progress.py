@@ -0,0 +1,87 @@
+"""
+Тест Azure эндпоинтов /azure/progress/{user_id}/... (история попыток пользователя)
+"""
+
+import httpx
+import asyncio
+import base64
+import os
+import time
+import uuid
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+# Сервер запускается с AZURE_PROGRESS_DB_PATH и тем же AZURE_PROGRESS_READ_TOKEN
+PROGRESS_HEADERS = {"X-Progress-Token": os.environ.get("AZURE_PROGRESS_READ_TOKEN", "")}
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_progress():
+    """Тест истории попыток после нескольких оценок одного пользователя."""
+    print("Тестирование /api/v1/azure/progress/{user_id}/{attempts|trend|phrases}")
+    
+    user_id = f"manual-{uuid.uuid4().hex[:8]}"
+    reference_text = "jmenuji se"
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            audio_data = load_example_audio()
+            for attempt in range(3):
+                response = await client.post(
+                    f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                    json={"audio_data": audio_data, "reference_text": reference_text, "language": "cs-CZ"},
+                    headers={"X-User-Id": user_id}
+                )
+                print(f"Попытка {attempt + 1}: {response.status_code}")
+            
+            # История записывается фоновым потоком
+            await asyncio.sleep(2)
+            
+            cursor = None
+            page = 0
+            while True:
+                params = {"reference_text": reference_text, "limit": 2}
+                if cursor:
+                    params["cursor"] = cursor
+                start_time = time.time()
+                response = await client.get(
+                    f"{BASE_URL}/api/v1/azure/progress/{user_id}/attempts", params=params, headers=PROGRESS_HEADERS
+                )
+                elapsed = time.time() - start_time
+                page += 1
+                print(f"Страница {page}: {response.status_code} ({elapsed * 1000:.1f} мс)")
+                if response.status_code != 200:
+                    print(f"Response: {response.text}")
+                    break
+                data = response.json()
+                for item in data["items"]:
+                    print(f"  {item['timestamp']:.0f}: {item['scores']['pronunciation_score']}")
+                cursor = data["next_cursor"]
+                if not cursor:
+                    break
+            
+            response = await client.get(
+                f"{BASE_URL}/api/v1/azure/progress/{user_id}/trend",
+                params={"reference_text": reference_text},
+                headers=PROGRESS_HEADERS
+            )
+            print(f"Динамика: {response.status_code} {response.json()}")
+            
+            response = await client.get(f"{BASE_URL}/api/v1/azure/progress/{user_id}/phrases", headers=PROGRESS_HEADERS)
+            print(f"Фразы: {response.status_code} {response.json()}")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ИСТОРИИ ПОПЫТОК ПОЛЬЗОВАТЕЛЯ")
+    print("=" * 60)
+    asyncio.run(test_progress())
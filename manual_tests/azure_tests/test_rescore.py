@@ -0,0 +1,92 @@
+"""
+Тест Azure эндпоинта /azure/results/{result_id}/rescore (переоценка без повторного распознавания)
+"""
+
+import httpx
+import asyncio
+import base64
+import time
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_rescore():
+    """Тест определения произнесенной фразы среди нескольких кандидатов."""
+    print("Тестирование /api/v1/azure/results/{result_id}/rescore")
+    
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                json={
+                    "audio_data": load_example_audio(),
+                    "reference_text": "jmenuji se",
+                    "language": "cs-CZ"
+                }
+            )
+            
+            print(f"Status Code: {response.status_code}")
+            if response.status_code != 200 or not response.json().get("result_id"):
+                print(f"Response: {response.text}")
+                return
+            
+            result_id = response.json()["result_id"]
+            candidates = ["jmenuji se", "jmenuji se Pavel", "dobrý den", "ahoj, jak se máš"]
+            
+            start_time = time.time()
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/results/{result_id}/rescore",
+                json={"reference_texts": candidates}
+            )
+            elapsed = time.time() - start_time
+            
+            print(f"Rescore Status Code: {response.status_code} ({elapsed * 1000:.1f} мс)")
+            if response.status_code == 200:
+                data = response.json()
+                print(f"Распознано: {data['recognized_text']}")
+                print(f"Наиболее вероятная фраза: {data['best_reference_text']}")
+                for result in data["results"]:
+                    scores = result["scores"]
+                    print(
+                        f"  {result['reference_text']}: "
+                        f"pron={scores['pronunciation_score']} completeness={scores['completeness_score']}"
+                    )
+            else:
+                print(f"Response: {response.text}")
+            
+            # Результат профиля lite (без miscue) не переоценивается
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                json={
+                    "audio_data": load_example_audio(),
+                    "reference_text": "jmenuji se",
+                    "language": "cs-CZ",
+                    "profile": "lite"
+                }
+            )
+            lite_result_id = response.json().get("result_id") if response.status_code == 200 else None
+            if lite_result_id:
+                response = await client.post(
+                    f"{BASE_URL}/api/v1/azure/results/{lite_result_id}/rescore",
+                    json={"reference_texts": candidates}
+                )
+                print(f"Rescore lite Status Code: {response.status_code} (ожидается 422)")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ПЕРЕОЦЕНКИ ПО НЕСКОЛЬКИМ РЕФЕРЕНСНЫМ ТЕКСТАМ")
+    print("=" * 60)
+    asyncio.run(test_rescore())
@@ -0,0 +1,61 @@
+"""
+Тест форматов ответа Azure эндпоинтов (JSON, колоночная раскладка, MessagePack, проекция полей)
+"""
+
+import httpx
+import asyncio
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_response_formats():
+    """Сравнение объема пакетного ответа в разных форматах."""
+    print("Тестирование форматов ответа /api/v1/azure/pronunciation-assessment/batch")
+    
+    audio_data = load_example_audio()
+    test_data = {
+        "requests": [
+            {"audio_data": audio_data, "reference_text": "jmenuji se", "language": "cs-CZ"},
+            {"audio_data": audio_data, "reference_text": "jmenuji se Pavel", "language": "cs-CZ"}
+        ]
+    }
+    variants = [
+        ("json", "", {}),
+        ("json-columnar", "?layout=columnar", {}),
+        ("msgpack", "", {"Accept": "application/msgpack"}),
+        ("msgpack-columnar", "?layout=columnar", {"Accept": "application/msgpack"}),
+        ("fields", "?fields=scores.pronunciation_score,words_analysis.word", {}),
+    ]
+    
+    try:
+        async with httpx.AsyncClient(timeout=120.0) as client:
+            for name, query, headers in variants:
+                response = await client.post(
+                    f"{BASE_URL}/api/v1/azure/pronunciation-assessment/batch{query}",
+                    json=test_data,
+                    headers=headers
+                )
+                print(
+                    f"{name:18} status={response.status_code} "
+                    f"content-type={response.headers.get('content-type')} bytes={len(response.content)}"
+                )
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ФОРМАТОВ ОТВЕТА")
+    print("=" * 60)
+    asyncio.run(test_response_formats())
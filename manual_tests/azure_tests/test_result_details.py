@@ -0,0 +1,68 @@
+"""
+Тест Azure эндпоинтов /azure/results/{result_id}/... (детали результата анализа)
+"""
+
+import httpx
+import asyncio
+import json
+import base64
+from pathlib import Path
+
+
+BASE_URL = "http://localhost:10000"
+
+
+def load_example_audio():
+    """Загрузка реального аудио файла example.mp3."""
+    audio_path = Path(__file__).parent / "records" / "example.mp3"
+    with open(audio_path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+async def test_result_details():
+    """Тест получения фонем, слогов и просодии по result_id без повторного анализа."""
+    print("Тестирование /api/v1/azure/results/{result_id}")
+    
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            response = await client.post(
+                f"{BASE_URL}/api/v1/azure/pronunciation-assessment",
+                json={
+                    "audio_data": load_example_audio(),
+                    "reference_text": "jmenuji se",
+                    "language": "cs-CZ"
+                }
+            )
+            
+            print(f"Status Code: {response.status_code}")
+            if response.status_code != 200:
+                print(f"Response: {response.text}")
+                return
+            
+            result_id = response.json().get("result_id")
+            print(f"result_id: {result_id}")
+            if not result_id:
+                print("Результат не был сохранен")
+                return
+            
+            for detail in ("phonemes", "syllables", "prosody"):
+                response = await client.get(f"{BASE_URL}/api/v1/azure/results/{result_id}/{detail}")
+                print(f"{detail}: {response.status_code}")
+                print(json.dumps(response.json(), indent=2, ensure_ascii=False))
+            
+            # Неизвестный result_id должен возвращать 404
+            response = await client.get(f"{BASE_URL}/api/v1/azure/results/{'0' * 32}/prosody")
+            if response.status_code == 404:
+                print("Неизвестный result_id корректно отклонен (404)")
+            else:
+                print(f"Неожиданный код для неизвестного result_id: {response.status_code}")
+                
+    except Exception as e:
+        print(f"Ошибка выполнения теста: {str(e)}")
+
+
+if __name__ == "__main__":
+    print("=" * 60)
+    print("ТЕСТ ДЕТАЛЕЙ РЕЗУЛЬТАТА АНАЛИЗА")
+    print("=" * 60)
+    asyncio.run(test_result_details())
@@ -47,6 +47,15 @@ def main():
         "azure_tests/test_azure_languages.py",
         "azure_tests/test_pronunciation.py",
         "azure_tests/test_batch_pronunciation.py",
+        "azure_tests/test_batch_stream.py",
+        "azure_tests/test_batch_ndjson.py",
+        "azure_tests/test_audio_upload.py",
+        "azure_tests/test_result_details.py",
+        "azure_tests/test_rescore.py",
+        "azure_tests/test_response_formats.py",
+        "azure_tests/test_difficulty.py",
+        "azure_tests/test_progress.py",
+        "azure_tests/test_concurrency_threads.py",
     ]
     
     # Получение базового пути
@@ -0,0 +1,156 @@
+"""
+Контроль допуска запросов анализа.
+
+ASGI middleware перед маршрутами Azure ограничивает количество одновременно
+обрабатываемых запросов и объем декодированного аудио в памяти процесса.
+Объем оценивается по Content-Length еще до чтения тела (base64 в JSON
+декодируется примерно в 3/4 исходного размера), поэтому при перегрузке
+запрос отклоняется с 503 и Retry-After без чтения и декодирования тела.
+
+Запрос, который сам по себе больше бюджета, допускается только когда
+других запросов в обработке нет, чтобы крупные записи не блокировались навсегда.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics import get_metrics
+
+# Пути, тело которых читается потоково: в памяти одновременно лишь часть тела
+STREAMING_PATHS = ("/batch/ndjson",)
+
+
+class AdmissionController:
+    """
+    Учет запросов и аудио в обработке относительно бюджетов.
+    
+    Args:
+        max_requests: Максимальное количество запросов в обработке
+        max_audio_bytes: Максимальный суммарный объем декодированного аудио в байтах
+    """
+
+    def __init__(self, max_requests: int, max_audio_bytes: int):
+        self.max_requests = max_requests
+        self.max_audio_bytes = max_audio_bytes
+        self.in_flight_requests = 0
+        self.in_flight_audio_bytes = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self, audio_bytes: int) -> Optional[str]:
+        """
+        Попытка допуска запроса.
+        
+        Returns:
+            Optional[str]: Причина отказа (requests, audio_bytes) или None, если запрос допущен
+        """
+        with self._lock:
+            if self.in_flight_requests >= self.max_requests:
+                return "requests"
+            if self.in_flight_requests and self.in_flight_audio_bytes + audio_bytes > self.max_audio_bytes:
+                return "audio_bytes"
+            self.in_flight_requests += 1
+            self.in_flight_audio_bytes += audio_bytes
+            self._report()
+        return None
+
+    def release(self, audio_bytes: int) -> None:
+        """Завершение обработки допущенного запроса."""
+        with self._lock:
+            self.in_flight_requests -= 1
+            self.in_flight_audio_bytes -= audio_bytes
+            self._report()
+
+    def _report(self) -> None:
+        metrics = get_metrics()
+        metrics.set_gauge("admission_in_flight_requests", self.in_flight_requests)
+        metrics.set_gauge("admission_in_flight_audio_bytes", self.in_flight_audio_bytes)
+        metrics.set_gauge(
+            "admission_audio_budget_usage",
+            round(self.in_flight_audio_bytes / self.max_audio_bytes, 4) if self.max_audio_bytes else 0.0
+        )
+
+
+class AdmissionMiddleware:
+    """
+    Middleware допуска для POST запросов к маршрутам анализа.
+    
+    Args:
+        app: ASGI приложение
+        path_prefix: Префикс путей, к которым применяется контроль
+        max_requests: Максимальное количество запросов в обработке
+        max_audio_bytes: Бюджет декодированного аудио в байтах
+        streaming_body_bytes: Оценка тела в памяти для потоковых путей (элемент x параллельность)
+        retry_after: Значение заголовка Retry-After в секундах
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        path_prefix: str,
+        max_requests: int,
+        max_audio_bytes: int,
+        streaming_body_bytes: int,
+        retry_after: int = 2
+    ):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.streaming_body_bytes = streaming_body_bytes
+        self.retry_after = retry_after
+        self.controller = AdmissionController(max_requests, max_audio_bytes)
+
+    def _estimate_audio_bytes(self, scope: Scope) -> int:
+        """Оценка объема декодированного аудио по Content-Length (base64 -> 3/4)."""
+        content_length = Headers(scope=scope).get("content-length")
+        try:
+            body_bytes = int(content_length) if content_length is not None else self.streaming_body_bytes
+        except ValueError:
+            body_bytes = self.streaming_body_bytes
+        if scope["path"].endswith(STREAMING_PATHS):
+            body_bytes = min(body_bytes, self.streaming_body_bytes)
+        return body_bytes * 3 // 4
+
+    def _applies(self, scope: Scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].startswith(self.path_prefix)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        audio_bytes = self._estimate_audio_bytes(scope)
+        reason = self.controller.try_acquire(audio_bytes)
+        metrics = get_metrics()
+        if reason is not None:
+            metrics.increment("admission_rejected_total", reason=reason)
+            await self._reject(send, reason)
+            return
+
+        metrics.increment("admission_admitted_total")
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(audio_bytes)
+
+    async def _reject(self, send: Send, reason: str) -> None:
+        """Ответ 503 без чтения тела запроса."""
+        detail = {
+            "requests": "Сервис перегружен: слишком много запросов в обработке",
+            "audio_bytes": "Сервис перегружен: превышен объем аудио в обработке",
+        }[reason]
+        body = orjson.dumps({"detail": detail})
+        headers: Tuple[Tuple[bytes, bytes], ...] = (
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(self.retry_after).encode()),
+            (b"connection", b"close"),
+        )
+        await send({"type": "http.response.start", "status": 503, "headers": list(headers)})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк пути JSON: разбор результата SDK и сериализация ответа.
+
+Сравнивает прежний путь (json.loads, модели с валидацией, сериализация
+FastAPI через jsonable_encoder + json.dumps) с быстрым (orjson.loads,
+model_construct, orjson.dumps) на результатах с большим количеством слов.
+
+Запуск: python -m src.analyze_testing.benchmark_json [количество слов] [элементов в пакете]
+"""
+
+import json
+import os
+import sys
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+os.environ.setdefault("AZURE_SPEECH_KEY", "benchmark")
+
+from src.applications.azure_handling.schemas import (
+    PronunciationResponse,
+    BatchPronunciationResponse,
+    Scores,
+    WordAnalysis
+)
+from src.applications.azure_handling.services import AzureSpeechService
+
+
+def make_sdk_json(word_count: int) -> str:
+    """JSON результата SDK с заданным количеством слов."""
+    words = [
+        {
+            "Word": f"slovo{i}",
+            "Offset": i * 5000000,
+            "Duration": 4000000,
+            "PronunciationAssessment": {
+                "AccuracyScore": 60 + i % 40,
+                "ErrorType": "Mispronunciation" if i % 7 == 0 else "None",
+                "Feedback": {"Prosody": {"Break": {"ErrorTypes": ["None"]}, "Intonation": {"ErrorTypes": []}}}
+            }
+        }
+        for i in range(word_count)
+    ]
+    return json.dumps({
+        "DisplayText": " ".join(word["Word"] for word in words),
+        "NBest": [{
+            "PronunciationAssessment": {
+                "AccuracyScore": 90, "FluencyScore": 80, "CompletenessScore": 100,
+                "PronScore": 85, "ProsodyScore": 70
+            },
+            "Words": words
+        }]
+    })
+
+
+def legacy_path(json_str: str, reference_text: str, batch_size: int) -> bytes:
+    """Прежний путь: json + валидация моделей + jsonable_encoder."""
+    parsed = json.loads(json_str)
+    nbest = parsed["NBest"][0]
+    assessment = nbest["PronunciationAssessment"]
+    words = [
+        WordAnalysis(
+            word=word["Word"],
+            accuracy_score=word["PronunciationAssessment"]["AccuracyScore"],
+            error_type=word["PronunciationAssessment"]["ErrorType"]
+        )
+        for word in nbest["Words"]
+    ]
+    result = PronunciationResponse(
+        status="success",
+        recognized_text=parsed["DisplayText"],
+        reference_text=reference_text,
+        scores=Scores(
+            pronunciation_score=assessment["PronScore"],
+            accuracy_score=assessment["AccuracyScore"],
+            fluency_score=assessment["FluencyScore"],
+            completeness_score=assessment["CompletenessScore"],
+            prosody_score=assessment["ProsodyScore"]
+        ),
+        words_analysis=words
+    )
+    batch = BatchPronunciationResponse(
+        status="success",
+        results=[result] * batch_size,
+        failed_requests=[],
+        total_processed=batch_size,
+        successful_count=batch_size,
+        failed_count=0
+    )
+    # FastAPI повторно валидирует возвращенную модель по response_model и кодирует стандартным json
+    validated = BatchPronunciationResponse.model_validate(batch.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False).encode("utf-8")
+
+
+def fast_path(service: AzureSpeechService, json_str: str, reference_text: str, batch_size: int) -> bytes:
+    """Быстрый путь: orjson + model_construct + orjson.dumps."""
+    azure_response = service._parse_sdk_json(orjson.loads(json_str), reference_text)
+    result = PronunciationResponse.model_construct(
+        status="success",
+        recognized_text=azure_response.recognized_text,
+        reference_text=azure_response.reference_text,
+        scores=Scores.model_construct(
+            pronunciation_score=azure_response.pronunciation_score,
+            accuracy_score=azure_response.accuracy_score,
+            fluency_score=azure_response.fluency_score,
+            completeness_score=azure_response.completeness_score,
+            prosody_score=azure_response.prosody_score
+        ),
+        words_analysis=azure_response.words_analysis,
+        result_id=None
+    )
+    batch = BatchPronunciationResponse.model_construct(
+        status="success",
+        results=[result] * batch_size,
+        failed_requests=[],
+        total_processed=batch_size,
+        successful_count=batch_size,
+        failed_count=0
+    )
+    return orjson.dumps(batch.model_dump())
+
+
+def measure(func, *args, repeat: int = 20) -> float:
+    """Медианное время выполнения в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def main():
+    word_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    service = AzureSpeechService()
+    json_str = make_sdk_json(word_count)
+    reference_text = "benchmark"
+
+    print(f"Слов в результате: {word_count}, элементов в пакете: {batch_size}")
+    assert orjson.loads(legacy_path(json_str, reference_text, batch_size)) == \
+        orjson.loads(fast_path(service, json_str, reference_text, batch_size))
+
+    legacy = measure(legacy_path, json_str, reference_text, batch_size)
+    fast = measure(fast_path, service, json_str, reference_text, batch_size)
+    print(f"Прежний путь (json + валидация):       {legacy:8.2f} мс")
+    print(f"Быстрый путь (orjson + model_construct): {fast:8.2f} мс")
+    print(f"Ускорение: {legacy / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк истории попыток пользователей под постоянной нагрузкой записи.
+
+Публикует синтетические оценки с заданной частотой в шину событий (как
+сервис) и одновременно выполняет запросы "последние попытки фразы" и
+динамику оценок из нескольких потоков. Выводит фактическую
+скорость записи, усиление записи (физические байты WAL и checkpoint к байтам
+данных) и задержки запросов.
+
+Запуск: python -m src.analyze_testing.progress_benchmark [оценок в секунду] [секунд] [пользователей]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+os.environ.setdefault("AZURE_SPEECH_KEY", "benchmark")
+
+from src.applications.azure_handling.events import AssessmentCompleted, get_event_bus
+from src.applications.azure_handling.progress import ProgressStore
+from src.applications.azure_handling.schemas import PronunciationResponse, Scores, WordAnalysis
+from src.applications.azure_handling.text import reference_text_hash
+from src.metrics import get_metrics
+
+PHRASES = [f"Věta číslo {i} pro procvičování výslovnosti" for i in range(50)]
+
+
+def make_response(index: int) -> PronunciationResponse:
+    """Синтетический результат оценки с восемью словами."""
+    reference_text = PHRASES[index % len(PHRASES)]
+    score = 50.0 + index % 50
+    return PronunciationResponse.model_construct(
+        status="success",
+        recognized_text=reference_text,
+        reference_text=reference_text,
+        scores=Scores.model_construct(
+            pronunciation_score=score, accuracy_score=score, fluency_score=80.0,
+            completeness_score=100.0, prosody_score=None
+        ),
+        words_analysis=[
+            WordAnalysis.model_construct(word=word, accuracy_score=score, error_type="None")
+            for word in reference_text.split()
+        ],
+        result_id=None
+    )
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 500
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 20
+    users = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    directory = tempfile.mkdtemp(prefix="progress-benchmark-")
+    store = ProgressStore(os.path.join(directory, "progress.sqlite3"), retention_days=0)
+    store.start()
+    bus = get_event_bus()
+
+    stop = threading.Event()
+    latencies: list = []
+
+    def reader(seed: int) -> None:
+        index = seed
+        while not stop.is_set():
+            user = f"user{index % users}"
+            phrase_hash = reference_text_hash(PHRASES[index % len(PHRASES)])
+            started = time.perf_counter()
+            if index % 4:
+                store.attempts(user, phrase_hash, 50)
+            else:
+                store.trend(user, phrase_hash, "day", 0.0)
+            latencies.append((time.perf_counter() - started) * 1000)
+            index += 7
+            time.sleep(0.005)
+
+    readers = [threading.Thread(target=reader, args=(seed,), daemon=True) for seed in range(4)]
+    for thread in readers:
+        thread.start()
+
+    print(f"Запись: {rate:.0f} оценок/с в течение {duration:.0f} с, пользователей: {users}, каталог: {directory}")
+    started = time.monotonic()
+    published = 0
+    while time.monotonic() - started < duration:
+        target = int((time.monotonic() - started) * rate)
+        while published < target:
+            response = make_response(published)
+            bus.publish(AssessmentCompleted(
+                response=response, language="cs-CZ", profile="standard", user_id=f"user{published % users}"
+            ))
+            published += 1
+        time.sleep(0.001)
+
+    stop.set()
+    for thread in readers:
+        thread.join()
+    store.stop()
+    elapsed = time.monotonic() - started
+
+    snapshot = get_metrics().snapshot()
+    counters, gauges = snapshot["counters"], snapshot["gauges"]
+    latencies.sort()
+    size = sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+    print(f"Записано строк: {counters.get('progress_store_rows_written_total', 0):.0f} "
+          f"({published / elapsed:.0f}/с), отброшено: {counters.get('progress_store_dropped_total', 0):.0f}")
+    print(f"Данные: {counters.get('progress_store_logical_bytes_total', 0) / 1e6:.1f} МБ, "
+          f"физическая запись: {counters.get('progress_store_physical_bytes_total', 0) / 1e6:.1f} МБ, "
+          f"усиление записи: {gauges.get('progress_store_write_amplification', 0):.2f}x, "
+          f"размер файлов: {size / 1e6:.1f} МБ")
+    print(f"Запросы: {len(latencies)}, p50 {percentile(latencies, 0.5):.2f} мс, "
+          f"p95 {percentile(latencies, 0.95):.2f} мс, p99 {percentile(latencies, 0.99):.2f} мс")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Измерение холодного старта сервера.
+
+Запускает `python main.py` на свободном порту и измеряет время до первого
+успешного ответа /api/v1/health и до готовности /api/v1/ready, а также
+время импорта приложения. Завершается с кодом 1 при превышении бюджета,
+поэтому подходит для проверки регрессий в CI.
+
+Запуск: python -m src.analyze_testing.startup_benchmark [бюджет в секундах] [повторов]
+"""
+
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+def free_port() -> int:
+    """Свободный TCP порт."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, deadline: float) -> float:
+    """Ожидание ответа 200; возвращает момент получения ответа."""
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.perf_counter()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"Нет ответа от {url}")
+
+
+def measure_import() -> float:
+    """Время импорта приложения в отдельном процессе."""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    env = {**os.environ, "AZURE_SPEECH_KEY": os.environ.get("AZURE_SPEECH_KEY", "benchmark")}
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_start(timeout: float = 60.0) -> dict:
+    """Один холодный запуск сервера."""
+    port = free_port()
+    env = {
+        **os.environ,
+        "AZURE_SPEECH_KEY": os.environ.get("AZURE_SPEECH_KEY", "benchmark"),
+        "APP_PORT": str(port),
+        "APP_DEBUG": "false",
+        "APP_SERVER_MODE": "development",
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=PROJECT_ROOT, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = started + timeout
+        base_url = f"http://127.0.0.1:{port}/api/v1"
+        first_response = wait_for(f"{base_url}/health", deadline) - started
+        ready = wait_for(f"{base_url}/ready", deadline) - started
+        with urllib.request.urlopen(f"{base_url}/ready", timeout=1) as response:
+            stages = json.load(response)["stages"]
+        return {"first_response": first_response, "ready": ready, "stages": stages}
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def main():
+    budget = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    import_time = measure_import()
+    print(f"Импорт приложения: {import_time:.3f} с")
+
+    runs = [measure_start() for _ in range(repeat)]
+    for index, run in enumerate(runs, 1):
+        print(
+            f"Запуск {index}: первый ответ {run['first_response']:.3f} с, "
+            f"готовность {run['ready']:.3f} с, этапы: {run['stages']}"
+        )
+
+    worst = max(run["ready"] for run in runs)
+    print(f"Худшее время до готовности: {worst:.3f} с (бюджет {budget:.3f} с)")
+    if worst > budget:
+        print("Бюджет времени запуска превышен")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
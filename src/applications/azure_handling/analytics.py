@@ -0,0 +1,258 @@
+"""
+Выгрузка истории оценок в колоночные файлы для аналитики.
+
+Каждая завершенная оценка добавляет в буфер в памяти по строке на слово
+(слово, точность, тип ошибки, оценки, язык, хеш референсного текста).
+Фоновая задача периодически (или при заполнении буфера) записывает буфер в
+файлы Parquet или Arrow IPC, разбитые по дням и языкам в стиле Hive:
+
+    <каталог>/date=2024-05-01/language=cs-CZ/part-<время>-<pid>-<номер>.parquet
+
+Запись выполняется вне цикла событий, файлы появляются атомарно, поэтому
+аналитические запросы читают каталог напрямую и не обращаются к API.
+Колонки date и language задаются каталогами (pyarrow.dataset с
+partitioning="hive", DuckDB с hive_partitioning).
+
+Требуется pyarrow (есть в requirements.txt). Он импортируется только при
+запуске выгрузки: импорт занимает десятки миллисекунд и не должен замедлять
+старт приложения с отключенной аналитикой. Без pyarrow выгрузка отключается
+с предупреждением.
+"""
+
+import asyncio
+import logging
+import os
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional
+
+from .events import AssessmentCompleted, get_event_bus
+from .schemas import LANGUAGE_PATTERN
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+# pyarrow и pyarrow.parquet (загружаются при запуске выгрузки, см. _import_pyarrow)
+pa: Optional[ModuleType] = None
+pq: Optional[ModuleType] = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+# Язык становится именем каталога раздела
+_LANGUAGE_RE = re.compile(LANGUAGE_PATTERN)
+
+# Колонки файла; date и language — ключи разбиения (каталоги)
+COLUMNS = (
+    "timestamp", "reference_text_hash", "profile", "result_id", "word", "accuracy", "error_type",
+    "pronunciation_score", "accuracy_score", "fluency_score", "completeness_score", "prosody_score",
+)
+
+
+def _import_pyarrow() -> bool:
+    """Импорт pyarrow при первом запуске выгрузки; False, если он не установлен."""
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+
+def _schema() -> "pa.Schema":
+    return pa.schema([
+        ("timestamp", pa.timestamp("ms", tz="UTC")),
+        ("reference_text_hash", pa.string()),
+        ("profile", pa.string()),
+        ("result_id", pa.string()),
+        ("word", pa.string()),
+        ("accuracy", pa.float32()),
+        ("error_type", pa.string()),
+        ("pronunciation_score", pa.float32()),
+        ("accuracy_score", pa.float32()),
+        ("fluency_score", pa.float32()),
+        ("completeness_score", pa.float32()),
+        ("prosody_score", pa.float32()),
+    ])
+
+
+class AnalyticsSink:
+    """
+    Буфер строк аналитики с периодической записью в колоночные файлы.
+
+    Args:
+        directory: Корневой каталог выгрузки
+        file_format: parquet или arrow (Arrow IPC)
+        flush_interval: Период записи буфера в секундах
+        flush_rows: Количество строк, при котором буфер записывается досрочно
+        max_buffer_rows: Предел буфера; при переполнении новые строки отбрасываются
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        file_format: str = "parquet",
+        flush_interval: float = 60.0,
+        flush_rows: int = 50_000,
+        max_buffer_rows: int = 500_000
+    ):
+        if file_format not in FORMATS:
+            raise ValueError(f"Неизвестный формат аналитики: {file_format}")
+        self.directory = Path(directory)
+        self.file_format = file_format
+        self.flush_interval = flush_interval
+        self.flush_rows = flush_rows
+        self.max_buffer_rows = max_buffer_rows
+        self._rows: List[tuple] = []
+        self._seq = 0
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def handle(self, event: AssessmentCompleted) -> None:
+        """Обработчик события оценки: только добавление строк в буфер."""
+        if not _LANGUAGE_RE.match(event.language):
+            get_metrics().increment("analytics_invalid_language_total")
+            logger.warning(f"Оценка с недопустимым языком {event.language!r} не выгружена в аналитику")
+            return
+        response = event.response
+        scores = response.scores
+        base = (
+            event.timestamp, event.language, event.reference_text_hash, event.profile, response.result_id,
+        )
+        tail = (
+            scores.pronunciation_score, scores.accuracy_score, scores.fluency_score,
+            scores.completeness_score, scores.prosody_score,
+        )
+        # Оценка без слов сохраняется одной строкой с пустым word
+        words = response.words_analysis or [None]
+        if len(self._rows) + len(words) > self.max_buffer_rows:
+            get_metrics().increment("analytics_dropped_rows_total", len(words))
+            return
+        for word in words:
+            if word is None:
+                self._rows.append(base + (None, None, None) + tail)
+            else:
+                self._rows.append(base + (word.word, word.accuracy_score, word.error_type) + tail)
+        get_metrics().set_gauge("analytics_buffered_rows", len(self._rows))
+        if len(self._rows) >= self.flush_rows:
+            self._wake.set()
+
+    def start(self) -> None:
+        """Подписка на события и запуск фоновой записи."""
+        get_event_bus().subscribe(self.handle)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отписка, остановка фоновой записи и запись остатка буфера."""
+        get_event_bus().unsubscribe(self.handle)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Запись накопленных строк вне цикла событий."""
+        if not self._rows:
+            return
+        rows, self._rows = self._rows, []
+        get_metrics().set_gauge("analytics_buffered_rows", 0)
+        started = time.perf_counter()
+        try:
+            files = await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            get_metrics().increment("analytics_flush_errors_total")
+            get_metrics().increment("analytics_dropped_rows_total", len(rows))
+            logger.error(f"Ошибка записи аналитики ({len(rows)} строк): {str(e)}")
+            return
+        metrics = get_metrics()
+        metrics.observe("analytics_flush_duration_seconds", time.perf_counter() - started)
+        metrics.increment("analytics_rows_written_total", len(rows))
+        metrics.increment("analytics_files_written_total", files)
+
+    def _write(self, rows: List[tuple]) -> int:
+        """Запись строк по разделам (день, язык); возвращает количество файлов."""
+        partitions: Dict[tuple, List[tuple]] = defaultdict(list)
+        for row in rows:
+            day = time.strftime("%Y-%m-%d", time.gmtime(row[0]))
+            partitions[(day, row[1])].append(row)
+
+        schema = _schema()
+        for (day, language), partition_rows in partitions.items():
+            columns: Dict[str, List[Any]] = {name: [] for name in COLUMNS}
+            for row in partition_rows:
+                timestamp, _, ref_hash, profile, result_id, word, accuracy, error_type, *scores = row
+                columns["timestamp"].append(int(timestamp * 1000))
+                columns["reference_text_hash"].append(ref_hash)
+                columns["profile"].append(profile)
+                columns["result_id"].append(result_id)
+                columns["word"].append(word)
+                columns["accuracy"].append(accuracy)
+                columns["error_type"].append(error_type)
+                for name, value in zip(COLUMNS[-5:], scores):
+                    columns[name].append(value)
+            table = pa.Table.from_pydict(columns, schema=schema)
+            self._write_table(table, self.directory / f"date={day}" / f"language={language}")
+        return len(partitions)
+
+    def _write_table(self, table: "pa.Table", directory: Path) -> None:
+        """Атомарная запись файла раздела."""
+        directory.mkdir(parents=True, exist_ok=True)
+        self._seq += 1
+        name = f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._seq}{FORMATS[self.file_format]}"
+        tmp_path = directory / f".{name}.tmp"
+        if self.file_format == "parquet":
+            pq.write_table(table, tmp_path, compression="zstd")
+        else:
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        os.replace(tmp_path, directory / name)
+
+
+_sink: Optional[AnalyticsSink] = None
+
+
+def start_analytics() -> Optional[AnalyticsSink]:
+    """Запуск выгрузки аналитики, если задан AZURE_ANALYTICS_DIR (вызывается при старте воркера)."""
+    global _sink
+    config = get_azure_config()
+    if not config.analytics_dir:
+        return None
+    if not _import_pyarrow():
+        logger.warning("AZURE_ANALYTICS_DIR задан, но pyarrow не установлен: выгрузка аналитики отключена")
+        return None
+    _sink = AnalyticsSink(
+        config.analytics_dir,
+        config.analytics_format,
+        config.analytics_flush_interval,
+        config.analytics_flush_rows,
+        config.analytics_max_buffer_rows
+    )
+    _sink.start()
+    logger.info(f"Выгрузка аналитики: {config.analytics_dir} ({config.analytics_format})")
+    return _sink
+
+
+async def stop_analytics() -> None:
+    """Запись остатка буфера при остановке воркера."""
+    global _sink
+    if _sink is not None:
+        await _sink.stop()
+        _sink = None
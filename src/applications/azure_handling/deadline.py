@@ -0,0 +1,56 @@
+"""
+Крайние сроки (deadline) обработки запросов анализа произношения.
+
+Deadline создается при получении HTTP запроса и передается через все этапы
+обработки: декодирование, настройку SDK и распознавание. Пакетные запросы
+получают общий deadline, из которого выделяется бюджет на каждый элемент.
+"""
+
+import time
+from dataclasses import dataclass
+
+from ...metrics import get_metrics
+
+
+@dataclass(frozen=True)
+class Deadline:
+    """Крайний срок обработки запроса (по monotonic часам)."""
+    expires_at: float
+    timeout: float
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Deadline через заданное количество секунд от текущего момента."""
+        return cls(expires_at=time.monotonic() + seconds, timeout=seconds)
+
+    def budget(self, seconds: float) -> "Deadline":
+        """Дочерний deadline: не более seconds, но и не позже текущего."""
+        expires_at = min(self.expires_at, time.monotonic() + seconds)
+        return Deadline(expires_at=expires_at, timeout=seconds)
+
+    def remaining(self) -> float:
+        """Оставшееся время в секундах (не меньше нуля)."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        """Истек ли крайний срок."""
+        return time.monotonic() >= self.expires_at
+
+    def exceeded(self, stage: str) -> TimeoutError:
+        """
+        Учет прерванной работы и формирование ошибки таймаута.
+
+        Args:
+            stage: Этап обработки, на котором истек срок
+
+        Returns:
+            TimeoutError: Ошибка для передачи вызывающему коду
+        """
+        get_metrics().increment("azure_requests_abandoned_total", stage=stage)
+        return TimeoutError(f"Превышено время обработки запроса ({self.timeout} с) на этапе: {stage}")
+
+    def check(self, stage: str) -> None:
+        """Проверка крайнего срока перед началом этапа."""
+        if self.expired:
+            raise self.exceeded(stage)
@@ -0,0 +1,105 @@
+"""
+Извлечение деталей (фонемы, слоги, просодия) из сохраненного JSON результата Azure.
+
+Детали не входят в основной ответ анализа, чтобы он оставался компактным;
+они строятся по запросу из исходного JSON в ResultStore без повторного
+обращения к Azure.
+"""
+
+from typing import Any, Dict, List
+
+from .schemas import (
+    PhonemeDetail,
+    SyllableDetail,
+    WordDetails,
+    WordProsody,
+    PhonemeDetailsResponse,
+    SyllableDetailsResponse,
+    ProsodyDetailsResponse
+)
+
+
+def _best_words(raw: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Слова лучшей гипотезы распознавания."""
+    nbest = raw.get('NBest') or [{}]
+    return nbest[0].get('Words', [])
+
+
+def _word_details(word: Dict[str, Any], phonemes: bool, syllables: bool) -> WordDetails:
+    """Детали слова из JSON результата."""
+    assessment = word.get('PronunciationAssessment', {})
+    details = WordDetails(
+        word=word.get('Word', ''),
+        accuracy_score=assessment.get('AccuracyScore', 0.0),
+        error_type=assessment.get('ErrorType', 'None')
+    )
+    if phonemes:
+        details.phonemes = [
+            PhonemeDetail(
+                phoneme=phoneme.get('Phoneme', ''),
+                accuracy_score=phoneme.get('PronunciationAssessment', {}).get('AccuracyScore', 0.0),
+                offset=phoneme.get('Offset'),
+                duration=phoneme.get('Duration'),
+                nbest_phonemes=phoneme.get('PronunciationAssessment', {}).get('NBestPhonemes')
+            )
+            for phoneme in word.get('Phonemes', [])
+        ]
+    if syllables:
+        details.syllables = [
+            SyllableDetail(
+                syllable=syllable.get('Syllable', ''),
+                grapheme=syllable.get('Grapheme'),
+                accuracy_score=syllable.get('PronunciationAssessment', {}).get('AccuracyScore', 0.0),
+                offset=syllable.get('Offset'),
+                duration=syllable.get('Duration')
+            )
+            for syllable in word.get('Syllables', [])
+        ]
+    return details
+
+
+def extract_phonemes(result_id: str, raw: Dict[str, Any]) -> PhonemeDetailsResponse:
+    """Фонемы по каждому слову."""
+    words = [_word_details(word, phonemes=True, syllables=False) for word in _best_words(raw)]
+    return PhonemeDetailsResponse(
+        result_id=result_id,
+        available=any(word.phonemes for word in words),
+        words=words
+    )
+
+
+def extract_syllables(result_id: str, raw: Dict[str, Any]) -> SyllableDetailsResponse:
+    """Слоги по каждому слову."""
+    words = [_word_details(word, phonemes=False, syllables=True) for word in _best_words(raw)]
+    return SyllableDetailsResponse(
+        result_id=result_id,
+        available=any(word.syllables for word in words),
+        words=words
+    )
+
+
+def extract_prosody(result_id: str, raw: Dict[str, Any]) -> ProsodyDetailsResponse:
+    """Общая оценка просодии и обратная связь по словам."""
+    nbest = (raw.get('NBest') or [{}])[0]
+    prosody_score = nbest.get('PronunciationAssessment', {}).get('ProsodyScore')
+
+    words = []
+    for word in _best_words(raw):
+        feedback = word.get('PronunciationAssessment', {}).get('Feedback', {}).get('Prosody', {})
+        words.append(WordProsody(
+            word=word.get('Word', ''),
+            break_error_types=[
+                error for error in feedback.get('Break', {}).get('ErrorTypes', []) if error != 'None'
+            ],
+            intonation_error_types=[
+                error for error in feedback.get('Intonation', {}).get('ErrorTypes', []) if error != 'None'
+            ],
+            feedback=feedback
+        ))
+
+    return ProsodyDetailsResponse(
+        result_id=result_id,
+        available=prosody_score is not None or any(word.feedback for word in words),
+        prosody_score=prosody_score,
+        words=words
+    )
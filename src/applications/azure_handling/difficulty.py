@@ -0,0 +1,484 @@
+"""
+Агрегаты сложности слов и фраз.
+
+По каждой завершенной оценке обновляются агрегаты по ключам
+(язык, слово) и (язык, референсный текст): количество, среднее и дисперсия
+точности (accuracy_score) и частоты типов ошибок. Агрегаты хранятся в
+массивах numpy; события накапливаются в буфере и применяются пачкой
+(параллельная формула Чана для среднего и дисперсии), поэтому запрос top-N
+по сотням тысяч ключей выполняется векторно за миллисекунды.
+
+Буфер применяется фоновой задачей раз в APPLY_INTERVAL секунд в пуле потоков,
+поэтому он не растет на воркере, к которому нет запросов top-N, а цикл
+событий не занят вычислениями. Таблицы изменяются и читаются только под
+блокировкой экземпляра.
+
+Снимки периодически записываются в общий файл .npz. Воркер сливает в файл
+свой прирост с прошлого снимка (под файловой блокировкой) и получает
+объединенное состояние всех воркеров, поэтому агрегаты переживают перезапуски
+и согласованы между процессами с задержкой не больше интервала снимка.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .encoding import ERROR_TYPES
+from .events import AssessmentCompleted, get_event_bus
+from .text import normalize_word
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows: снимки без межпроцессной блокировки (один процесс)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_ERROR_CODES = {error_type: code for code, error_type in enumerate(ERROR_TYPES)}
+_NO_ERROR = _ERROR_CODES["None"]
+# Период применения буфера наблюдений к агрегатам в секундах
+APPLY_INTERVAL = 5.0
+
+
+class AggregateTable:
+    """
+    Агрегаты точности и типов ошибок по ключам (язык, элемент).
+
+    Строка таблицы соответствует ключу; массивы растут удвоением.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.keys: List[Tuple[str, str]] = []
+        self.index: Dict[Tuple[str, str], int] = {}
+        self.languages: List[str] = []
+        self._language_index: Dict[str, int] = {}
+        self.language_ids = np.zeros(capacity, dtype=np.int32)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.mean = np.zeros(capacity, dtype=np.float64)
+        self.m2 = np.zeros(capacity, dtype=np.float64)
+        self.errors = np.zeros((capacity, len(ERROR_TYPES)), dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self.count)
+        if size <= capacity:
+            return
+        new_capacity = max(size, capacity * 2)
+        for name in ("language_ids", "count", "mean", "m2", "errors"):
+            array = getattr(self, name)
+            grown = np.zeros((new_capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:capacity] = array
+            setattr(self, name, grown)
+
+    def rows(self, keys: List[Tuple[str, str]]) -> np.ndarray:
+        """Номера строк для ключей (новые ключи добавляются)."""
+        rows = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            row = self.index.get(key)
+            if row is None:
+                row = len(self.keys)
+                self._grow(row + 1)
+                self.index[key] = row
+                self.keys.append(key)
+                language = key[0]
+                language_id = self._language_index.get(language)
+                if language_id is None:
+                    language_id = self._language_index[language] = len(self.languages)
+                    self.languages.append(language)
+                self.language_ids[row] = language_id
+            rows[i] = row
+        return rows
+
+    def add(self, keys: List[Tuple[str, str]], values: np.ndarray, error_codes: np.ndarray) -> None:
+        """Добавление наблюдений: группировка по строкам и слияние (Чан)."""
+        if not keys:
+            return
+        rows = self.rows(keys)
+        unique, inverse = np.unique(rows, return_inverse=True)
+        count_b = np.bincount(inverse).astype(np.int64)
+        mean_b = np.bincount(inverse, weights=values) / count_b
+        m2_b = np.bincount(inverse, weights=(values - mean_b[inverse]) ** 2)
+        errors_b = np.zeros((len(unique), len(ERROR_TYPES)), dtype=np.int64)
+        valid = error_codes >= 0
+        np.add.at(errors_b, (inverse[valid], error_codes[valid]), 1)
+        self._merge(unique, count_b, mean_b, m2_b, errors_b)
+
+    def merge_table(self, other: "AggregateTable") -> None:
+        """Слияние агрегатов другой таблицы."""
+        if not len(other):
+            return
+        size = len(other)
+        rows = self.rows(other.keys)
+        self._merge(rows, other.count[:size], other.mean[:size], other.m2[:size], other.errors[:size])
+
+    def _merge(self, rows: np.ndarray, count_b, mean_b, m2_b, errors_b) -> None:
+        count_a = self.count[rows]
+        mean_a = self.mean[rows]
+        total = count_a + count_b
+        delta = mean_b - mean_a
+        self.mean[rows] = mean_a + delta * count_b / total
+        self.m2[rows] = self.m2[rows] + m2_b + delta ** 2 * count_a * count_b / total
+        self.count[rows] = total
+        self.errors[rows] += errors_b
+
+    def to_arrays(self, prefix: str) -> Dict[str, np.ndarray]:
+        size = len(self)
+        return {
+            f"{prefix}_languages": np.array([key[0] for key in self.keys], dtype=np.str_),
+            f"{prefix}_items": np.array([key[1] for key in self.keys], dtype=np.str_),
+            f"{prefix}_count": self.count[:size].copy(),
+            f"{prefix}_mean": self.mean[:size].copy(),
+            f"{prefix}_m2": self.m2[:size].copy(),
+            f"{prefix}_errors": self.errors[:size].copy(),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str) -> "AggregateTable":
+        table = cls(max(1024, len(arrays[f"{prefix}_count"])))
+        keys = list(zip(arrays[f"{prefix}_languages"].tolist(), arrays[f"{prefix}_items"].tolist()))
+        size = len(keys)
+        table.rows(keys)
+        table.count[:size] = arrays[f"{prefix}_count"]
+        table.mean[:size] = arrays[f"{prefix}_mean"]
+        table.m2[:size] = arrays[f"{prefix}_m2"]
+        errors = arrays[f"{prefix}_errors"]
+        # Таблица типов ошибок могла быть расширена после записи снимка
+        table.errors[:size, :errors.shape[1]] = errors
+        return table
+
+    def top(
+        self,
+        limit: int,
+        language: Optional[str] = None,
+        min_count: int = 1,
+        order_by: str = "accuracy"
+    ) -> List[int]:
+        """
+        Номера строк самых сложных элементов.
+
+        Args:
+            limit: Количество элементов
+            language: Только элементы этого языка
+            min_count: Минимальное количество наблюдений
+            order_by: accuracy (наименьшая средняя точность) или error_rate (наибольшая доля ошибок)
+        """
+        size = len(self)
+        mask = self.count[:size] >= min_count
+        if language is not None:
+            language_id = self._language_index.get(language)
+            if language_id is None:
+                return []
+            mask &= self.language_ids[:size] == language_id
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return []
+        if order_by == "error_rate":
+            # Больше ошибок — выше сложность: сортируем по убыванию доли ошибок
+            key = -self.error_rate(candidates)
+        else:
+            key = self.mean[candidates]
+        if len(candidates) > limit:
+            part = np.argpartition(key, limit - 1)[:limit]
+            candidates, key = candidates[part], key[part]
+        order = np.lexsort((-self.count[candidates], key))
+        return candidates[order].tolist()
+
+    def error_rate(self, rows) -> np.ndarray:
+        """Доля слов с ошибкой (для фраз — среди всех слов ее оценок)."""
+        errors = self.errors[rows]
+        return 1.0 - errors[:, _NO_ERROR] / np.maximum(errors.sum(axis=1), 1)
+
+    def std(self, rows) -> np.ndarray:
+        count = self.count[rows]
+        return np.sqrt(self.m2[rows] / np.maximum(count - 1, 1))
+
+
+@dataclass
+class _Observation:
+    """Наблюдение из завершенной оценки до применения к агрегатам."""
+    language: str
+    reference_text_hash: str
+    reference_text: str
+    accuracy: float
+    words: List[Tuple[str, float, int]]
+
+
+class DifficultyAggregates:
+    """
+    Агрегаты сложности слов и фраз с периодическими снимками.
+
+    Args:
+        snapshot_path: Файл снимков .npz (общий для воркеров)
+        snapshot_interval: Период записи снимков в секундах
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = None, snapshot_interval: float = 300.0):
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else None
+        self.snapshot_interval = snapshot_interval
+        self.words = AggregateTable()
+        self.phrases = AggregateTable()
+        self.phrase_texts: Dict[str, str] = {}
+        # Прирост с последнего снимка: сливается в общий файл
+        self._delta_words = AggregateTable()
+        self._delta_phrases = AggregateTable()
+        self._pending: List[_Observation] = []
+        # Таблицы изменяются в пуле потоков: применение буфера, снимки и запросы top-N
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def handle(self, event: AssessmentCompleted) -> None:
+        """Обработчик события оценки: только добавление в буфер."""
+        response = event.response
+        words = []
+        for word in response.words_analysis or []:
+            normalized = normalize_word(word.word)
+            if normalized:
+                words.append((normalized, word.accuracy_score, _ERROR_CODES.get(word.error_type, -1)))
+        self._pending.append(_Observation(
+            event.language, event.reference_text_hash, response.reference_text, response.scores.accuracy_score, words
+        ))
+
+    def apply_pending(self) -> None:
+        """Применение накопленных наблюдений к агрегатам (под блокировкой экземпляра)."""
+        with self._lock:
+            self._apply_pending()
+
+    def _apply_pending(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        started = time.perf_counter()
+
+        phrase_keys = [(obs.language, obs.reference_text_hash) for obs in pending]
+        phrase_values = np.array([obs.accuracy for obs in pending], dtype=np.float64)
+        # Ошибки фразы — частоты типов ошибок ее слов
+        phrase_errors_keys = []
+        word_keys = []
+        word_values = []
+        word_codes = []
+        for obs in pending:
+            self.phrase_texts[obs.reference_text_hash] = obs.reference_text
+            for word, accuracy, code in obs.words:
+                word_keys.append((obs.language, word))
+                word_values.append(accuracy)
+                word_codes.append(code)
+                phrase_errors_keys.append((obs.language, obs.reference_text_hash))
+        word_values = np.array(word_values, dtype=np.float64)
+        word_codes = np.array(word_codes, dtype=np.int64)
+
+        for words, phrases in ((self.words, self.phrases), (self._delta_words, self._delta_phrases)):
+            words.add(word_keys, word_values, word_codes)
+            phrases.add(phrase_keys, phrase_values, np.full(len(phrase_keys), -1, dtype=np.int64))
+            if phrase_errors_keys:
+                rows = phrases.rows(phrase_errors_keys)
+                valid = word_codes >= 0
+                np.add.at(phrases.errors, (rows[valid], word_codes[valid]), 1)
+
+        metrics = get_metrics()
+        metrics.observe("difficulty_apply_duration_seconds", time.perf_counter() - started)
+        metrics.set_gauge("difficulty_word_keys", len(self.words))
+        metrics.set_gauge("difficulty_phrase_keys", len(self.phrases))
+
+    def query(
+        self,
+        table_name: str,
+        limit: int,
+        language: Optional[str] = None,
+        min_count: int = 1,
+        order_by: str = "accuracy"
+    ) -> Tuple[List[Dict], int]:
+        """
+        Top-N самых сложных элементов с учетом буфера (выполняется в пуле потоков).
+
+        Returns:
+            Tuple[List[Dict], int]: Описания элементов и общее количество ключей таблицы
+        """
+        with self._lock:
+            self._apply_pending()
+            table: AggregateTable = getattr(self, table_name)
+            items = describe(table, table.top(limit, language, min_count, order_by))
+            if table_name == "phrases":
+                for item in items:
+                    item["reference_text_hash"] = item["item"]
+                    item["item"] = self.phrase_texts.get(item["item"], item["item"])
+            return items, len(table)
+
+    def start(self) -> None:
+        """Загрузка снимка, подписка на события и запуск фоновой задачи."""
+        if self.snapshot_path is not None and self.snapshot_path.exists():
+            try:
+                self.words, self.phrases, texts = _load_snapshot(self.snapshot_path)
+                self.phrase_texts.update(texts)
+            except Exception as e:
+                logger.error(f"Ошибка загрузки снимка агрегатов сложности: {str(e)}")
+        get_event_bus().subscribe(self.handle)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        get_event_bus().unsubscribe(self.handle)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.snapshot_path is not None:
+            await self.snapshot()
+        else:
+            await asyncio.to_thread(self.apply_pending)
+
+    async def _run(self) -> None:
+        """Применение буфера раз в APPLY_INTERVAL и снимки раз в snapshot_interval."""
+        last_snapshot = time.monotonic()
+        while True:
+            await asyncio.sleep(APPLY_INTERVAL)
+            try:
+                if self.snapshot_path is not None and time.monotonic() - last_snapshot >= self.snapshot_interval:
+                    last_snapshot = time.monotonic()
+                    await self.snapshot()
+                else:
+                    await asyncio.to_thread(self.apply_pending)
+            except Exception as e:
+                logger.error(f"Ошибка применения агрегатов сложности: {str(e)}")
+
+    async def snapshot(self) -> None:
+        """Слияние прироста в общий файл снимка вне цикла событий."""
+        await asyncio.to_thread(self._snapshot)
+
+    def _snapshot(self) -> None:
+        with self._lock:
+            self._apply_pending()
+            delta_words, delta_phrases = self._delta_words, self._delta_phrases
+            self._delta_words, self._delta_phrases = AggregateTable(), AggregateTable()
+            texts = dict(self.phrase_texts)
+        started = time.perf_counter()
+        try:
+            words, phrases, merged_texts = _merge_snapshot(self.snapshot_path, delta_words, delta_phrases, texts)
+        except Exception as e:
+            # Прирост возвращается и будет слит при следующем снимке
+            with self._lock:
+                delta_words.merge_table(self._delta_words)
+                delta_phrases.merge_table(self._delta_phrases)
+                self._delta_words, self._delta_phrases = delta_words, delta_phrases
+            get_metrics().increment("difficulty_snapshot_errors_total")
+            logger.error(f"Ошибка записи снимка агрегатов сложности: {str(e)}")
+            return
+        # Объединенное состояние воркеров плюс прирост за время записи снимка
+        with self._lock:
+            self._apply_pending()
+            words.merge_table(self._delta_words)
+            phrases.merge_table(self._delta_phrases)
+            self.words, self.phrases = words, phrases
+            self.phrase_texts.update(merged_texts)
+        get_metrics().observe("difficulty_snapshot_duration_seconds", time.perf_counter() - started)
+
+
+def _load_snapshot(path: Path) -> Tuple[AggregateTable, AggregateTable, Dict[str, str]]:
+    with np.load(path, allow_pickle=False) as data:
+        words = AggregateTable.from_arrays(data, "words")
+        phrases = AggregateTable.from_arrays(data, "phrases")
+        texts = dict(zip(data["text_hashes"].tolist(), data["texts"].tolist()))
+    return words, phrases, texts
+
+
+def _merge_snapshot(
+    path: Path,
+    delta_words: AggregateTable,
+    delta_phrases: AggregateTable,
+    texts: Dict[str, str]
+) -> Tuple[AggregateTable, AggregateTable, Dict[str, str]]:
+    """Слияние прироста воркера с общим снимком под файловой блокировкой."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(f"{path}.lock", "w") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        if path.exists():
+            words, phrases, stored_texts = _load_snapshot(path)
+        else:
+            words, phrases, stored_texts = AggregateTable(), AggregateTable(), {}
+        words.merge_table(delta_words)
+        phrases.merge_table(delta_phrases)
+        stored_texts.update(texts)
+        # Тексты нужны только для фраз из таблицы
+        phrase_hashes = {key[1] for key in phrases.keys}
+        stored_texts = {ref_hash: text for ref_hash, text in stored_texts.items() if ref_hash in phrase_hashes}
+
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                text_hashes=np.array(list(stored_texts), dtype=np.str_),
+                texts=np.array(list(stored_texts.values()), dtype=np.str_),
+                **words.to_arrays("words"),
+                **phrases.to_arrays("phrases")
+            )
+        os.replace(tmp_path, path)
+    return words, phrases, stored_texts
+
+
+def describe(table: AggregateTable, rows: List[int]) -> List[Dict]:
+    """Описание строк таблицы для ответа API."""
+    if not rows:
+        return []
+    error_rate = table.error_rate(rows)
+    std = table.std(rows)
+    items = []
+    for i, row in enumerate(rows):
+        language, item = table.keys[row]
+        items.append({
+            "language": language,
+            "item": item,
+            "count": int(table.count[row]),
+            "mean_accuracy": round(float(table.mean[row]), 2),
+            "std_accuracy": round(float(std[i]), 2),
+            "error_rate": round(float(error_rate[i]), 4),
+            "error_counts": {
+                ERROR_TYPES[code]: int(value)
+                for code, value in enumerate(table.errors[row])
+                if value and code != _NO_ERROR
+            },
+        })
+    return items
+
+
+_aggregates: Optional[DifficultyAggregates] = None
+
+
+def get_difficulty_aggregates() -> Optional[DifficultyAggregates]:
+    """Агрегаты сложности текущего воркера (None, если отключены)."""
+    return _aggregates
+
+
+def start_difficulty() -> Optional[DifficultyAggregates]:
+    """Запуск агрегатов сложности (вызывается при старте воркера)."""
+    global _aggregates
+    config = get_azure_config()
+    if not config.difficulty_enabled:
+        return None
+    if not config.difficulty_snapshot_path:
+        # Без снимков агрегаты теряются при каждом перезапуске и расходятся между воркерами
+        logger.error("Агрегаты сложности не запущены: не задан AZURE_DIFFICULTY_SNAPSHOT_PATH")
+        return None
+    _aggregates = DifficultyAggregates(config.difficulty_snapshot_path, config.difficulty_snapshot_interval)
+    _aggregates.start()
+    return _aggregates
+
+
+async def stop_difficulty() -> None:
+    """Запись снимка при остановке воркера."""
+    global _aggregates
+    if _aggregates is not None:
+        await _aggregates.stop()
+        _aggregates = None
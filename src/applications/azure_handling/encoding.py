@@ -0,0 +1,225 @@
+"""
+Согласование формата ответа для мобильных клиентов.
+
+Помимо JSON поддерживаются:
+- MessagePack (Accept: application/msgpack), если установлен пакет msgpack;
+- колоночная раскладка слов (Accept: application/vnd.pronunciation.columnar+json
+  или параметр layout=columnar): вместо списка объектов слов — параллельные
+  массивы слов, оценок и кодов ошибок, а типы ошибок передаются один раз
+  в таблице error_types;
+- проекция полей (параметр fields=scores,words_analysis.word).
+
+Раскладка и проекция применяются к каждому результату анализа, в том числе
+внутри пакетного ответа, и сочетаются с любым кодированием.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from ...metrics import get_metrics
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack необязателен
+    msgpack = None
+
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.pronunciation.columnar+json"
+
+_MEDIA_TYPES = {
+    JSON: (JSON, False),
+    "application/*": (JSON, False),
+    "*/*": (JSON, False),
+    COLUMNAR_JSON: (JSON, True),
+    MSGPACK: (MSGPACK, False),
+    "application/x-msgpack": (MSGPACK, False),
+    "application/vnd.msgpack": (MSGPACK, False),
+}
+
+# Базовая таблица кодов типов ошибок; неизвестные типы дописываются в конец
+ERROR_TYPES = (
+    "None",
+    "Mispronunciation",
+    "Omission",
+    "Insertion",
+    "UnexpectedBreak",
+    "MissingBreak",
+    "Monotone",
+)
+
+
+@dataclass(frozen=True)
+class ResponseFormat:
+    """Выбранный формат ответа."""
+    media_type: str = JSON
+    columnar: bool = False
+    fields: Optional[Dict[str, Any]] = None
+
+    @property
+    def name(self) -> str:
+        """Название формата для метрик."""
+        encoding = "msgpack" if self.media_type == MSGPACK else "json"
+        return f"{encoding}-columnar" if self.columnar else encoding
+
+
+def _parse_accept(accept: str) -> List[str]:
+    """Медиа-типы из заголовка Accept в порядке убывания q."""
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranked)]
+
+
+def _parse_fields(fields: str) -> Dict[str, Any]:
+    """
+    Дерево проекции из списка путей через запятую.
+    
+    `scores,words_analysis.word` -> {"scores": None, "words_analysis": {"word": None}};
+    None означает, что поле включается целиком.
+    """
+    tree: Dict[str, Any] = {}
+    for path in fields.split(","):
+        parts = [part for part in path.strip().split(".") if part]
+        if not parts:
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def negotiate(accept: Optional[str], fields: Optional[str] = None, layout: Optional[str] = None) -> ResponseFormat:
+    """
+    Выбор формата ответа по заголовку Accept и параметрам запроса.
+    
+    Если клиент не указал поддерживаемый тип, используется JSON.
+    
+    Raises:
+        HTTPException: 406, если приемлем только MessagePack, а пакет msgpack не установлен;
+            400 при неизвестной раскладке
+    """
+    if layout not in (None, "", "rows", "columnar"):
+        raise HTTPException(status_code=400, detail=f"Неизвестная раскладка ответа: {layout}")
+
+    media_type, columnar = JSON, False
+    msgpack_requested = False
+    for candidate in _parse_accept(accept or JSON):
+        if candidate not in _MEDIA_TYPES:
+            continue
+        media_type, columnar = _MEDIA_TYPES[candidate]
+        if media_type == MSGPACK and msgpack is None:
+            msgpack_requested = True
+            continue
+        break
+    else:
+        if msgpack_requested:
+            raise HTTPException(status_code=406, detail="Формат MessagePack недоступен на сервере")
+        media_type, columnar = JSON, False
+
+    return ResponseFormat(
+        media_type=media_type,
+        columnar=columnar or layout == "columnar",
+        fields=_parse_fields(fields) if fields else None
+    )
+
+
+def _project(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Проекция значения по дереву полей."""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [_project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: _project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def _to_columns(words: List[Dict[str, Any]], codes: Dict[str, int], used: set) -> Dict[str, List[Any]]:
+    """Список слов в параллельные массивы; error_type заменяется кодом из таблицы."""
+    keys = list(words[0]) if words else []
+    columns: Dict[str, List[Any]] = {key: [] for key in keys}
+    for word in words:
+        for key in keys:
+            value = word.get(key)
+            if key == "error_type":
+                value = codes.setdefault(value, len(codes))
+                used.add(value)
+            columns[key].append(value)
+    return columns
+
+
+def _shape_result(
+    result: Dict[str, Any],
+    response_format: ResponseFormat,
+    codes: Dict[str, int],
+    used: set
+) -> Dict[str, Any]:
+    """Применение проекции и раскладки к одному результату анализа."""
+    result = _project(result, response_format.fields)
+    if response_format.columnar:
+        if isinstance(result.get("words_analysis"), list):
+            result["words_analysis"] = _to_columns(result["words_analysis"], codes, used)
+    return result
+
+
+def render(payload: Dict[str, Any], response_format: ResponseFormat, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Кодирование ответа анализа в выбранном формате.
+    
+    Args:
+        payload: Ответ анализа (одиночный, пакетный или переоценка) в виде словаря
+        response_format: Формат, выбранный negotiate()
+        headers: Дополнительные заголовки ответа
+    
+    Returns:
+        Response: Закодированный ответ
+    """
+    codes = {error_type: code for code, error_type in enumerate(ERROR_TYPES)}
+    used: set = set()
+    if isinstance(payload.get("results"), list):
+        # Пакетный ответ и переоценка: поля обертки сохраняются, формат применяется к каждому результату
+        payload = {
+            **payload,
+            "results": [_shape_result(result, response_format, codes, used) for result in payload["results"]]
+        }
+    else:
+        payload = _shape_result(payload, response_format, codes, used)
+    if response_format.columnar:
+        # Коды стабильны между ответами; передается только используемая часть таблицы
+        payload["error_types"] = list(codes)[:max(used) + 1] if used else []
+
+    if response_format.media_type == MSGPACK:
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        body = orjson.dumps(payload)
+
+    get_metrics().increment("response_bytes_total", len(body), format=response_format.name)
+    get_metrics().increment("responses_total", format=response_format.name)
+
+    media_type = COLUMNAR_JSON if response_format.columnar and response_format.media_type == JSON else response_format.media_type
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"Vary": "Accept", **(headers or {})}
+    )
@@ -0,0 +1,69 @@
+"""
+События завершенных оценок произношения.
+
+Сервис публикует событие после каждой успешной оценки; подписчики
+(аналитика, агрегаты сложности, история пользователей) получают его
+синхронно в цикле событий. Обработчик должен только поставить данные в
+буфер — запись на диск и любая тяжелая работа выполняются подписчиком в
+фоне, вне пути запроса. Ошибка обработчика не влияет на ответ клиенту.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from .schemas import PronunciationResponse
+from .text import reference_text_hash
+from ...metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AssessmentCompleted:
+    """Завершенная оценка произношения."""
+    response: PronunciationResponse
+    language: str
+    profile: str
+    tenant: str = ""
+    user_id: Optional[str] = None
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def reference_text_hash(self) -> str:
+        return reference_text_hash(self.response.reference_text)
+
+
+Handler = Callable[[AssessmentCompleted], None]
+
+
+class EventBus:
+    """Синхронная публикация событий подписчикам."""
+
+    def __init__(self):
+        self._handlers: List[Handler] = []
+
+    def subscribe(self, handler: Handler) -> None:
+        self._handlers.append(handler)
+
+    def unsubscribe(self, handler: Handler) -> None:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+
+    def publish(self, event: AssessmentCompleted) -> None:
+        for handler in list(self._handlers):
+            try:
+                handler(event)
+            except Exception as e:
+                get_metrics().increment("event_handler_errors_total")
+                logger.error(f"Ошибка обработчика события оценки: {str(e)}")
+
+
+# Глобальная шина событий: подписчики регистрируются при запуске каждого воркера
+event_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    """Получить шину событий оценок."""
+    return event_bus
@@ -0,0 +1,344 @@
+"""
+Поиск почти одинаковых записей по акустическим отпечаткам.
+
+Клиенты часто повторяют запрос с той же записью, перекодированной или слегка
+обрезанной, поэтому хеш содержимого (audio_id) не совпадает. Для WAV (PCM)
+вычисляется отпечаток по энергиям частотных полос: сигнал сводится в моно,
+тишина по краям отбрасывается, для каждого кадра берутся энергии полос
+300-3400 Гц, а бит отпечатка — знак изменения разности энергий соседних полос
+между соседними кадрами. Такие биты не зависят от громкости и частоты
+дискретизации и устойчивы к повторному кодированию.
+
+Сходство — доля совпадающих бит при лучшем сдвиге в пределах MAX_SHIFT_SECONDS
+(компенсирует обрезку). Индекс хранит отпечатки и результаты последних оценок
+по ключу (референсный текст, язык, профиль, клиент, пользователь): результат
+одного клиента никогда не отдается другому. Запись со сходством не ниже
+порога получает сохраненный результат без распознавания. Доля совпадений
+проверяется повторным распознаванием в фоне (audit), расхождение считается
+ложным совпадением и удаляет запись из индекса.
+"""
+
+import logging
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from .schemas import PronunciationResponse
+from .text import normalize_word, reference_text_hash
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+FRAME_SECONDS = 0.128
+HOP_SECONDS = 0.016
+BAND_COUNT = 17  # 16 бит на кадр
+MIN_HZ, MAX_HZ = 300.0, 3400.0
+MAX_SHIFT_SECONDS = 0.5
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# Относительная энергия кадра, ниже которой кадр на краях считается тишиной
+SILENCE_RATIO = 1e-3
+
+_POPCOUNT = np.array([bin(value).count("1") for value in range(1 << 16)], dtype=np.uint8)
+
+
+def _wav_chunks(audio: memoryview) -> Optional[Tuple[memoryview, memoryview]]:
+    """Чанки fmt и data RIFF/WAVE (срезы без копирования); None для других форматов."""
+    if len(audio) < 12 or audio[:4] != b"RIFF" or audio[8:12] != b"WAVE":
+        return None
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(audio):
+        chunk_id = audio[offset:offset + 4].tobytes()
+        size, = struct.unpack_from("<I", audio, offset + 4)
+        body = audio[offset + 8:offset + 8 + size]
+        if chunk_id == b"fmt ":
+            fmt = body
+        elif chunk_id == b"data":
+            return (fmt, body) if fmt is not None else None
+        offset += 8 + size + (size & 1)
+    return None
+
+
+def decode_wav(audio: Union[bytes, memoryview]) -> Optional[Tuple[np.ndarray, int]]:
+    """
+    PCM WAV в моно float32; None для других форматов.
+
+    Принимает байты или отображение файла в память: отсчеты читаются из буфера
+    напрямую, копируется только результат преобразования в float32.
+    """
+    chunks = _wav_chunks(memoryview(audio).cast("B"))
+    if chunks is None:
+        return None
+    fmt, frames = chunks
+    if len(fmt) < 16:
+        return None
+    format_tag, channels, rate, _, _, bits = struct.unpack_from("<HHIIHH", fmt)
+    if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+        format_tag, = struct.unpack_from("<H", fmt, 24)
+    width = (bits + 7) // 8
+    if format_tag != WAVE_FORMAT_PCM or channels == 0 or rate == 0:
+        return None
+    frames = frames[:len(frames) - len(frames) % width]
+    if width == 1:
+        samples = np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128.0
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype="<i2").astype(np.float32)
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8)
+                   | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)).astype(np.float32)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype="<i4").astype(np.float32)
+    else:
+        return None
+    samples = samples[:len(samples) - len(samples) % channels]
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, rate
+
+
+def compute_fingerprint(samples: np.ndarray, rate: int) -> Optional[np.ndarray]:
+    """Отпечаток: по 16 бит (uint16) на кадр; None для слишком короткой записи."""
+    frame = int(FRAME_SECONDS * rate)
+    hop = max(1, int(HOP_SECONDS * rate))
+    if len(samples) < frame + 2 * hop:
+        return None
+    samples = samples - samples.mean()
+    frames = np.lib.stride_tricks.sliding_window_view(samples, frame)[::hop]
+    spectrum = np.abs(np.fft.rfft(frames * np.hanning(frame), axis=1)) ** 2
+
+    edges = np.geomspace(MIN_HZ, min(MAX_HZ, rate / 2), BAND_COUNT + 1)
+    bins = np.searchsorted(np.fft.rfftfreq(frame, 1.0 / rate), edges)
+    cumulative = np.concatenate([np.zeros((len(spectrum), 1)), np.cumsum(spectrum, axis=1)], axis=1)
+    energies = cumulative[:, bins[1:]] - cumulative[:, bins[:-1]]
+
+    # Тишина по краям не участвует: обрезанная и исходная записи выравниваются
+    loudness = energies.sum(axis=1)
+    voiced = np.flatnonzero(loudness > loudness.max() * SILENCE_RATIO)
+    if len(voiced) < 3:
+        return None
+    energies = energies[voiced[0]:voiced[-1] + 1]
+
+    band_delta = energies[:, :-1] - energies[:, 1:]
+    bits = (band_delta[1:] - band_delta[:-1]) > 0
+    weights = (1 << np.arange(BAND_COUNT - 1, dtype=np.uint32)).astype(np.uint16)
+    return (bits.astype(np.uint16) * weights).sum(axis=1, dtype=np.uint16)
+
+
+def audio_fingerprint(audio: Union[bytes, memoryview]) -> Optional[np.ndarray]:
+    """Отпечаток записи; None, если формат не поддерживается (не PCM WAV)."""
+    decoded = decode_wav(audio)
+    if decoded is None:
+        return None
+    return compute_fingerprint(*decoded)
+
+
+def similarity(first: np.ndarray, second: np.ndarray, max_shift: Optional[int] = None) -> float:
+    """Доля совпадающих бит (0-1) при лучшем сдвиге отпечатков."""
+    if max_shift is None:
+        max_shift = int(MAX_SHIFT_SECONDS / HOP_SECONDS)
+    shorter = min(len(first), len(second))
+    # Записи заметно разной длины не считаются одной и той же
+    if shorter < 0.8 * max(len(first), len(second)):
+        return 0.0
+    best = 0.0
+    for shift in range(-max_shift, max_shift + 1):
+        a = first[max(0, shift):]
+        b = second[max(0, -shift):]
+        length = min(len(a), len(b))
+        if length < 0.8 * shorter:
+            continue
+        errors = int(_POPCOUNT[np.bitwise_xor(a[:length], b[:length])].sum(dtype=np.int64))
+        best = max(best, 1.0 - errors / (length * (BAND_COUNT - 1)))
+    return best
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in map(normalize_word, text.split()) if word]
+
+
+@dataclass
+class _Entry:
+    fingerprint: np.ndarray
+    response: PronunciationResponse
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class NearDuplicateMatch:
+    """Найденная почти одинаковая запись."""
+    key: tuple
+    entry: _Entry
+    similarity: float
+
+    @property
+    def response(self) -> PronunciationResponse:
+        return self.entry.response
+
+
+class NearDuplicateIndex:
+    """
+    Отпечатки и результаты недавних оценок по ключу (текст, язык, профиль, клиент, пользователь).
+
+    Поиск выполняется в пуле потоков: состояние индекса защищено блокировкой,
+    а сравнение отпечатков идет вне ее.
+
+    Args:
+        threshold: Минимальное сходство (доля совпадающих бит) для повторного использования результата
+        ttl_seconds: Срок хранения записи индекса
+        max_entries: Предел записей в индексе (вытесняются давно не использованные ключи)
+        per_key: Предел записей на один ключ
+    """
+
+    def __init__(self, threshold: float, ttl_seconds: float, max_entries: int, per_key: int = 8):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.per_key = per_key
+        self._entries: "OrderedDict[tuple, List[_Entry]]" = OrderedDict()
+        self._size = 0
+        self._lookups = 0
+        self._hits = 0
+        self._audits = 0
+        self._mismatches = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(reference_text: str, language: str, profile: str, tenant: str, user_id: Optional[str]) -> tuple:
+        return reference_text_hash(reference_text), language, profile, tenant, user_id or ""
+
+    def _expire(self, key: tuple, entries: List[_Entry]) -> List[_Entry]:
+        now = time.monotonic()
+        alive = [entry for entry in entries if now - entry.created_at < self.ttl_seconds]
+        self._size -= len(entries) - len(alive)
+        if alive:
+            self._entries[key] = alive
+        else:
+            self._entries.pop(key, None)
+        return alive
+
+    def lookup(self, key: tuple, fingerprint: np.ndarray) -> Optional[NearDuplicateMatch]:
+        """Лучшая запись со сходством не ниже порога."""
+        started = time.perf_counter()
+        metrics = get_metrics()
+        with self._lock:
+            entries = self._entries.get(key)
+            candidates = []
+            if entries:
+                self._entries.move_to_end(key)
+                candidates = self._expire(key, entries)
+        best: Optional[NearDuplicateMatch] = None
+        for entry in candidates:
+            score = similarity(fingerprint, entry.fingerprint)
+            if best is None or score > best.similarity:
+                best = NearDuplicateMatch(key, entry, score)
+        metrics.observe("near_duplicate_lookup_seconds", time.perf_counter() - started)
+        if best is not None:
+            metrics.observe("near_duplicate_similarity", best.similarity)
+
+        if best is None or best.similarity < self.threshold:
+            best = None
+        with self._lock:
+            self._lookups += 1
+            if best is not None:
+                self._hits += 1
+            hit_rate = self._hits / self._lookups
+        metrics.increment("near_duplicate_lookups_total", result="miss" if best is None else "hit")
+        metrics.set_gauge("near_duplicate_hit_rate", round(hit_rate, 4))
+        return best
+
+    def add(self, key: tuple, fingerprint: np.ndarray, response: PronunciationResponse) -> None:
+        """Сохранение отпечатка и результата новой оценки."""
+        with self._lock:
+            entries = self._entries.setdefault(key, [])
+            self._entries.move_to_end(key)
+            entries.append(_Entry(fingerprint, response))
+            self._size += 1
+            if len(entries) > self.per_key:
+                entries.pop(0)
+                self._size -= 1
+            while self._size > self.max_entries and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+            size = self._size
+        get_metrics().set_gauge("near_duplicate_entries", size)
+
+    def discard(self, match: NearDuplicateMatch) -> None:
+        """Удаление записи, совпадение с которой оказалось ложным."""
+        with self._lock:
+            entries = self._entries.get(match.key)
+            if not entries or match.entry not in entries:
+                return
+            entries.remove(match.entry)
+            self._size -= 1
+            if not entries:
+                del self._entries[match.key]
+            size = self._size
+        get_metrics().set_gauge("near_duplicate_entries", size)
+
+    def record_audit(self, match: NearDuplicateMatch, fresh: PronunciationResponse, tolerance: float) -> bool:
+        """
+        Сравнение сохраненного результата с повторным распознаванием.
+
+        Совпадение ложное, если распознанный текст отличается или общая оценка
+        расходится больше чем на tolerance баллов. Returns: True при совпадении.
+        """
+        cached = match.response
+        matched = (
+            _words(cached.recognized_text) == _words(fresh.recognized_text)
+            and abs(cached.scores.pronunciation_score - fresh.scores.pronunciation_score) <= tolerance
+        )
+        with self._lock:
+            self._audits += 1
+            if not matched:
+                self._mismatches += 1
+            false_positive_rate = self._mismatches / self._audits
+        metrics = get_metrics()
+        metrics.increment("near_duplicate_audits_total", outcome="match" if matched else "mismatch")
+        if not matched:
+            self.discard(match)
+            logger.warning(
+                f"Ложное совпадение записи (сходство {match.similarity:.3f}): "
+                f"{cached.scores.pronunciation_score} vs {fresh.scores.pronunciation_score}"
+            )
+        metrics.set_gauge("near_duplicate_false_positive_rate", round(false_positive_rate, 4))
+        return matched
+
+    def __len__(self) -> int:
+        return self._size
+
+
+_index: Optional[NearDuplicateIndex] = None
+
+
+def _reset_after_fork() -> None:
+    """Индекс воркера строится заново из его собственных оценок."""
+    global _index
+    _index = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_near_duplicate_index() -> Optional[NearDuplicateIndex]:
+    """Индекс почти одинаковых записей (None, если отключен)."""
+    global _index
+    config = get_azure_config()
+    if not config.near_duplicate_enabled:
+        return None
+    if _index is None:
+        _index = NearDuplicateIndex(
+            config.near_duplicate_threshold,
+            config.near_duplicate_ttl,
+            config.near_duplicate_max_entries
+        )
+    return _index
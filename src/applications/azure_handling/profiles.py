@@ -0,0 +1,241 @@
+"""
+Профили оценки произношения.
+
+Профиль определяет объем анализа, который выполняет Azure: чем меньше
+анализа, тем быстрее ответ. Для каждого профиля один раз строится шаблон
+JSON конфигурации PronunciationAssessmentConfig; на запрос в шаблон
+подставляется только референсный текст. Готовые конфигурации для часто
+используемых фраз хранятся в ограниченном LRU кеше.
+
+- lite: детализация до слов, без miscue и просодии — для интерактивных упражнений
+- standard: детализация до слов, miscue и просодия (поведение по умолчанию)
+- full: детализация до фонем (фонемы и слоги доступны в деталях результата), miscue и просодия
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from .schemas import AssessmentProfile
+from .sdk import get_speechsdk
+from .text import normalize_reference_text
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+if TYPE_CHECKING:
+    import azure.cognitiveservices.speech as speechsdk
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ProfileSettings:
+    """Параметры оценки произношения для профиля."""
+    granularity: str  # Имя PronunciationAssessmentGranularity
+    enable_miscue: bool
+    enable_prosody: bool
+
+
+PROFILES: Dict[AssessmentProfile, ProfileSettings] = {
+    AssessmentProfile.LITE: ProfileSettings(
+        granularity="Word",
+        enable_miscue=False,
+        enable_prosody=False
+    ),
+    AssessmentProfile.STANDARD: ProfileSettings(
+        granularity="Word",
+        enable_miscue=True,
+        enable_prosody=True
+    ),
+    AssessmentProfile.FULL: ProfileSettings(
+        granularity="Phoneme",
+        enable_miscue=True,
+        enable_prosody=True
+    ),
+}
+
+
+@lru_cache(maxsize=None)
+def get_profile_template(profile: AssessmentProfile) -> Dict[str, Any]:
+    """
+    Шаблон JSON конфигурации для профиля (без референсного текста).
+    
+    Шаблон строится самим SDK, поэтому формат JSON всегда соответствует
+    установленной версии SDK.
+    """
+    speechsdk = get_speechsdk()
+    settings = PROFILES[profile]
+    config = speechsdk.PronunciationAssessmentConfig(
+        reference_text="",
+        grading_system=speechsdk.PronunciationAssessmentGradingSystem.HundredMark,
+        granularity=getattr(speechsdk.PronunciationAssessmentGranularity, settings.granularity),
+        enable_miscue=settings.enable_miscue
+    )
+    if settings.enable_prosody:
+        config.enable_prosody_assessment()
+    template = json.loads(config.to_json())
+    template.pop("referenceText", None)
+    return template
+
+
+def build_assessment_config(
+    profile: AssessmentProfile,
+    reference_text: str
+) -> "speechsdk.PronunciationAssessmentConfig":
+    """Построение конфигурации оценки произношения по шаблону профиля (без кеша)."""
+    config_json = json.dumps({**get_profile_template(profile), "referenceText": reference_text})
+    return get_speechsdk().PronunciationAssessmentConfig(json_string=config_json)
+
+
+CacheKey = Tuple[str, str, AssessmentProfile]
+
+
+class AssessmentConfigCache:
+    """
+    Ограниченный LRU кеш готовых конфигураций оценки произношения.
+    
+    Ключ — (нормализованный референсный текст, язык, профиль). Конфигурация
+    только читается при применении к распознавателю, поэтому один экземпляр
+    используется всеми запросами с той же фразой.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[CacheKey, speechsdk.PronunciationAssessmentConfig]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        profile: AssessmentProfile,
+        reference_text: str,
+        language: str
+    ) -> "speechsdk.PronunciationAssessmentConfig":
+        """
+        Конфигурация для фразы: из кеша или построенная и добавленная в кеш.
+        
+        Args:
+            profile: Профиль оценки
+            reference_text: Референсный текст
+            language: Язык анализа
+        
+        Returns:
+            PronunciationAssessmentConfig: Конфигурация для применения к распознавателю
+        """
+        text = normalize_reference_text(reference_text)
+        key = (text, language, profile)
+        metrics = get_metrics()
+
+        with self._lock:
+            config = self._entries.get(key)
+            if config is not None:
+                self._entries.move_to_end(key)
+                metrics.increment("assessment_config_cache_total", result="hit")
+                return config
+
+        metrics.increment("assessment_config_cache_total", result="miss")
+        config = build_assessment_config(profile, text)
+        if self.max_size <= 0:
+            return config
+
+        with self._lock:
+            self._entries[key] = config
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                metrics.increment("assessment_config_cache_evictions_total")
+            metrics.set_gauge("assessment_config_cache_size", len(self._entries))
+        return config
+
+    def warm_up(self, phrases_file: str, default_language: str) -> int:
+        """
+        Предварительное заполнение кеша фразами из файла.
+        
+        Формат файла: одна фраза в строке, опционально с языком через табуляцию
+        (`cs-CZ<TAB>jmenuji se`). Пустые строки и строки с # пропускаются.
+        Каждая фраза добавляется для всех профилей.
+        
+        Returns:
+            int: Количество добавленных конфигураций
+        """
+        count = 0
+        for line in Path(phrases_file).read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            language, _, phrase = line.rpartition("\t")
+            for profile in AssessmentProfile:
+                self.get(profile, phrase, language.strip() or default_language)
+                count += 1
+        return count
+
+    def clear(self) -> None:
+        """Очистка кеша."""
+        with self._lock:
+            self._entries.clear()
+        get_metrics().set_gauge("assessment_config_cache_size", 0)
+
+
+_config_cache: Optional[AssessmentConfigCache] = None
+
+
+def _reset_after_fork() -> None:
+    """
+    Сброс кеша в дочернем процессе.
+    
+    Конфигурации держат нативные handle SDK, которые нельзя использовать
+    после fork, поэтому каждый воркер строит (и прогревает) кеш заново.
+    """
+    global _config_cache
+    _config_cache = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_config_cache() -> AssessmentConfigCache:
+    """Получить кеш конфигураций оценки (создается при первом обращении)."""
+    global _config_cache
+    if _config_cache is None:
+        _config_cache = AssessmentConfigCache(get_azure_config().assessment_cache_size)
+    return _config_cache
+
+
+def create_assessment_config(
+    profile: AssessmentProfile,
+    reference_text: str,
+    language: str
+) -> "speechsdk.PronunciationAssessmentConfig":
+    """
+    Конфигурация оценки произношения по шаблону профиля с использованием кеша.
+    
+    Args:
+        profile: Профиль оценки
+        reference_text: Референсный текст
+        language: Язык анализа
+    
+    Returns:
+        PronunciationAssessmentConfig: Конфигурация для применения к распознавателю
+    """
+    return get_config_cache().get(profile, reference_text, language)
+
+
+def warm_up_config_cache() -> int:
+    """
+    Заполнение кеша конфигураций из файла AzureConfig.assessment_warmup_file.
+    
+    Returns:
+        int: Количество добавленных конфигураций (0, если файл не задан)
+    """
+    config = get_azure_config()
+    if not config.assessment_warmup_file:
+        return 0
+    count = get_config_cache().warm_up(config.assessment_warmup_file, config.default_language)
+    logger.info(f"Кеш конфигураций оценки заполнен: {count} конфигураций")
+    return count
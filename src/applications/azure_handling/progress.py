@@ -0,0 +1,413 @@
+"""
+История попыток пользователей.
+
+Завершенные оценки с идентификатором пользователя (поле user_id запроса или
+заголовок X-User-Id) сохраняются во встроенной базе SQLite в режиме WAL.
+Обработчик события только ставит строку в очередь; запись выполняет отдельный
+поток-писатель пачками в одной транзакции. Индекс (user_id,
+reference_text_hash, ts) обслуживает выборки "последние попытки фразы" с
+постраничной навигацией по курсору и динамику оценок по дням. Идентификатор
+пользователя не аутентифицирован, поэтому эндпоинты чтения требуют токен
+AZURE_PROGRESS_READ_TOKEN (их вызывает сервер приложения, а не клиент).
+
+Писатель сам управляет checkpoint WAL (TRUNCATE после накопления
+CHECKPOINT_PAGES страниц), поэтому объем физической записи известен: прирост
+WAL плюс перенесенные в основной файл страницы. Отношение к объему
+сохраненных данных экспортируется как progress_store_write_amplification
+(при нескольких воркерах, пишущих в один файл, — приблизительно).
+"""
+
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Header
+
+from .events import AssessmentCompleted, get_event_bus
+from ...auth import verify_token
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# Порог checkpoint WAL в страницах (как wal_autocheckpoint по умолчанию)
+CHECKPOINT_PAGES = 1000
+# Строк, удаляемых за одну транзакцию очистки по сроку хранения
+RETENTION_CHUNK = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    reference_text_hash TEXT NOT NULL,
+    reference_text TEXT NOT NULL,
+    language TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    ts REAL NOT NULL,
+    pronunciation_score REAL NOT NULL,
+    accuracy_score REAL NOT NULL,
+    fluency_score REAL NOT NULL,
+    completeness_score REAL NOT NULL,
+    prosody_score REAL,
+    result_id TEXT,
+    words BLOB
+);
+CREATE INDEX IF NOT EXISTS attempts_user_phrase_ts ON attempts (user_id, reference_text_hash, ts);
+CREATE INDEX IF NOT EXISTS attempts_ts ON attempts (ts);
+"""
+
+_INSERT = """
+INSERT INTO attempts (
+    user_id, reference_text_hash, reference_text, language, profile, ts,
+    pronunciation_score, accuracy_score, fluency_score, completeness_score, prosody_score,
+    result_id, words
+) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_current_user_id: ContextVar[Optional[str]] = ContextVar("current_user_id", default=None)
+
+
+async def bind_user_id(x_user_id: Optional[str] = Header(None, max_length=128)) -> None:
+    """Зависимость маршрутов: идентификатор пользователя из заголовка X-User-Id."""
+    _current_user_id.set(x_user_id)
+
+
+def get_current_user_id() -> Optional[str]:
+    """Идентификатор пользователя текущего запроса из заголовка X-User-Id."""
+    return _current_user_id.get()
+
+
+async def require_progress_token(x_progress_token: Optional[str] = Header(None)) -> None:
+    """
+    Зависимость маршрутов чтения истории: токен AZURE_PROGRESS_READ_TOKEN.
+
+    X-User-Id не аутентифицирован, поэтому историю читает только доверенный
+    сервер приложения, а не клиент по идентификатору в пути.
+    """
+    verify_token(x_progress_token, get_azure_config().progress_read_token, "Чтение истории попыток отключено")
+
+
+def _row_size(row: tuple) -> int:
+    """Объем данных строки в байтах (для оценки усиления записи)."""
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes)):
+            size += len(value)
+        elif value is not None:
+            size += 8
+    return size
+
+
+class ProgressStore:
+    """
+    Хранилище попыток в SQLite с фоновым пакетным писателем.
+
+    Args:
+        path: Файл базы данных
+        retention_days: Срок хранения попыток в днях (0 - без ограничения)
+        batch_size: Максимальное количество строк в одной транзакции
+        flush_interval: Максимальная задержка записи строки в секундах
+        max_queue: Предел очереди записи; при переполнении строки отбрасываются
+    """
+
+    def __init__(
+        self,
+        path: str,
+        retention_days: int = 365,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_queue: int = 100_000
+    ):
+        self.path = path
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._local = threading.local()
+        self._logical_bytes = 0
+        self._physical_bytes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # --- Запись ----------------------------------------------------------------
+
+    def handle(self, event: AssessmentCompleted) -> None:
+        """Обработчик события оценки: строка ставится в очередь писателя."""
+        if not event.user_id:
+            return
+        response = event.response
+        scores = response.scores
+        words = orjson.dumps([word.model_dump() for word in response.words_analysis or []])
+        row = (
+            event.user_id, event.reference_text_hash, response.reference_text, event.language, event.profile,
+            event.timestamp, scores.pronunciation_score, scores.accuracy_score, scores.fluency_score,
+            scores.completeness_score, scores.prosody_score, response.result_id, words,
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            get_metrics().increment("progress_store_dropped_total")
+
+    def start(self) -> None:
+        """Подписка на события и запуск потока-писателя."""
+        self._thread = threading.Thread(target=self._writer, name="progress-writer", daemon=True)
+        self._thread.start()
+        get_event_bus().subscribe(self.handle)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Отписка и запись оставшихся строк."""
+        get_event_bus().unsubscribe(self.handle)
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _writer(self) -> None:
+        connection = self._connect()
+        # Checkpoint выполняет писатель: так известен объем физической записи
+        connection.execute("PRAGMA wal_autocheckpoint=0")
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        last_retention = 0.0
+        stopping = False
+        while not stopping:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                first = ()
+            batch = []
+            if first is None:
+                stopping = True
+            elif first:
+                batch.append(first)
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        row = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if row is None:
+                        stopping = True
+                        break
+                    batch.append(row)
+            if stopping:
+                # Остаток очереди при остановке
+                while True:
+                    try:
+                        row = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if row is not None:
+                        batch.append(row)
+            try:
+                if batch:
+                    self._write_batch(connection, batch, page_size)
+                if self.retention_days and time.monotonic() - last_retention > 3600:
+                    last_retention = time.monotonic()
+                    self._apply_retention(connection)
+            except Exception as e:
+                get_metrics().increment("progress_store_write_errors_total")
+                logger.error(f"Ошибка записи истории попыток ({len(batch)} строк): {str(e)}")
+        connection.close()
+
+    def _wal_size(self) -> int:
+        try:
+            return os.path.getsize(f"{self.path}-wal")
+        except OSError:
+            return 0
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: List[tuple], page_size: int) -> None:
+        started = time.perf_counter()
+        wal_before = self._wal_size()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(_INSERT, batch)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        wal_after = self._wal_size()
+        physical = max(0, wal_after - wal_before)
+
+        if wal_after >= CHECKPOINT_PAGES * (page_size + 24):
+            busy, _, checkpointed = connection.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+            physical += max(0, checkpointed) * page_size
+
+        logical = sum(_row_size(row) for row in batch)
+        self._logical_bytes += logical
+        self._physical_bytes += physical
+        metrics = get_metrics()
+        metrics.increment("progress_store_rows_written_total", len(batch))
+        metrics.increment("progress_store_logical_bytes_total", logical)
+        metrics.increment("progress_store_physical_bytes_total", physical)
+        metrics.set_gauge(
+            "progress_store_write_amplification",
+            round(self._physical_bytes / self._logical_bytes, 3) if self._logical_bytes else 0.0
+        )
+        metrics.observe("progress_store_batch_rows", len(batch))
+        metrics.observe("progress_store_batch_seconds", time.perf_counter() - started)
+        metrics.set_gauge("progress_store_queue_size", self._queue.qsize())
+
+    def _apply_retention(self, connection: sqlite3.Connection) -> int:
+        """Удаление попыток старше срока хранения небольшими транзакциями."""
+        cutoff = time.time() - self.retention_days * 86400
+        removed = 0
+        while True:
+            cursor = connection.execute(
+                "DELETE FROM attempts WHERE id IN (SELECT id FROM attempts WHERE ts < ? LIMIT ?)",
+                (cutoff, RETENTION_CHUNK)
+            )
+            removed += cursor.rowcount
+            if cursor.rowcount < RETENTION_CHUNK:
+                break
+        if removed:
+            get_metrics().increment("progress_store_rows_expired_total", removed)
+            logger.info(f"История попыток: удалено устаревших записей: {removed}")
+        return removed
+
+    # --- Чтение ----------------------------------------------------------------
+
+    def _reader(self) -> sqlite3.Connection:
+        """Соединение для чтения, отдельное для каждого потока пула."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = self._connect()
+            connection.row_factory = sqlite3.Row
+        return connection
+
+    def _query(self, name: str, sql: str, params: tuple) -> List[sqlite3.Row]:
+        started = time.perf_counter()
+        rows = self._reader().execute(sql, params).fetchall()
+        get_metrics().observe("progress_store_query_seconds", time.perf_counter() - started, query=name)
+        return rows
+
+    def attempts(
+        self,
+        user_id: str,
+        reference_text_hash: str,
+        limit: int,
+        before: Optional[Tuple[float, int]] = None,
+        include_words: bool = False
+    ) -> List[Dict[str, Any]]:
+        """Попытки пользователя по фразе от новых к старым (курсор — (ts, id) последней полученной)."""
+        columns = (
+            "id, ts, language, profile, pronunciation_score, accuracy_score, fluency_score, "
+            "completeness_score, prosody_score, result_id"
+            + (", words" if include_words else "")
+        )
+        sql = f"SELECT {columns} FROM attempts WHERE user_id = ? AND reference_text_hash = ?"
+        params: tuple = (user_id, reference_text_hash)
+        if before is not None:
+            sql += " AND (ts, id) < (?, ?)"
+            params += before
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        rows = self._query("attempts", sql, params + (limit,))
+        items = []
+        for row in rows:
+            item = dict(row)
+            if include_words:
+                item["words"] = orjson.loads(item["words"]) if item["words"] else []
+            items.append(item)
+        return items
+
+    def trend(self, user_id: str, reference_text_hash: str, bucket: str, since: float) -> List[Dict[str, Any]]:
+        """Динамика оценок пользователя по фразе по дням или неделям."""
+        period = "%Y-%m-%d" if bucket == "day" else "%Y-W%W"
+        rows = self._query(
+            "trend",
+            f"""
+            SELECT strftime('{period}', ts, 'unixepoch') AS period,
+                   COUNT(*) AS attempts,
+                   AVG(pronunciation_score) AS mean_pronunciation_score,
+                   MAX(pronunciation_score) AS best_pronunciation_score,
+                   AVG(accuracy_score) AS mean_accuracy_score,
+                   AVG(fluency_score) AS mean_fluency_score,
+                   AVG(completeness_score) AS mean_completeness_score
+            FROM attempts
+            WHERE user_id = ? AND reference_text_hash = ? AND ts >= ?
+            GROUP BY period ORDER BY period
+            """,
+            (user_id, reference_text_hash, since)
+        )
+        return [dict(row) for row in rows]
+
+    def phrases(self, user_id: str, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Фразы пользователя с количеством попыток, от недавних к давним."""
+        rows = self._query(
+            "phrases",
+            """
+            SELECT reference_text_hash, reference_text, language,
+                   MAX(ts) AS last_ts,
+                   COUNT(*) AS attempts,
+                   MAX(pronunciation_score) AS best_pronunciation_score,
+                   AVG(pronunciation_score) AS mean_pronunciation_score
+            FROM attempts
+            WHERE user_id = ?
+            GROUP BY reference_text_hash
+            ORDER BY last_ts DESC
+            LIMIT ? OFFSET ?
+            """,
+            (user_id, limit, offset)
+        )
+        return [dict(row) for row in rows]
+
+    async def run_query(self, method: str, *args) -> List[Dict[str, Any]]:
+        """Выполнение запроса чтения вне цикла событий."""
+        return await asyncio.to_thread(getattr(self, method), *args)
+
+
+def encode_cursor(item: Dict[str, Any]) -> str:
+    """Курсор следующей страницы из последней попытки страницы."""
+    return f"{item['ts']!r}_{item['id']}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """Разбор курсора; ValueError при неверном формате."""
+    ts, _, attempt_id = cursor.partition("_")
+    return float(ts), int(attempt_id)
+
+
+_store: Optional[ProgressStore] = None
+
+
+def get_progress_store() -> Optional[ProgressStore]:
+    """Хранилище истории попыток (None, если отключено)."""
+    return _store
+
+
+def start_progress() -> Optional[ProgressStore]:
+    """Открытие хранилища и запуск писателя, если задан AZURE_PROGRESS_DB_PATH."""
+    global _store
+    config = get_azure_config()
+    if not config.progress_db_path:
+        return None
+    _store = ProgressStore(
+        config.progress_db_path,
+        config.progress_retention_days,
+        config.progress_batch_size,
+        config.progress_flush_interval
+    )
+    _store.start()
+    return _store
+
+
+async def stop_progress() -> None:
+    """Запись оставшихся строк при остановке воркера."""
+    global _store
+    if _store is not None:
+        await asyncio.to_thread(_store.stop)
+        _store = None
@@ -0,0 +1,106 @@
+"""
+Асинхронный мост к Azure Speech SDK.
+
+Вместо блокирующего вызова `recognize_once` в пуле потоков используются
+неблокирующие операции SDK: результат приходит через события
+`recognized`/`canceled` из нативных потоков SDK и передается в asyncio future
+через `loop.call_soon_threadsafe`. Поток на время распознавания не занимается.
+
+Распознавание запускается как непрерывное и останавливается после первого
+итогового результата — это эквивалентно `recognize_once`, но, в отличие от
+него, операцию можно прервать в любой момент (таймаут или отмена запроса).
+"""
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Callable, List, Optional
+
+from .sdk import get_speechsdk
+from ...metrics import get_metrics
+
+if TYPE_CHECKING:
+    import azure.cognitiveservices.speech as speechsdk
+
+logger = logging.getLogger(__name__)
+
+
+def _set_result(future: asyncio.Future, result) -> None:
+    """Установка результата, если future еще не завершен (например, отменен)."""
+    if not future.done():
+        future.set_result(result)
+
+
+def _dispose_recognizer(holder: List["speechsdk.SpeechRecognizer"], *sdk_futures) -> None:
+    """
+    Завершение операций SDK и освобождение распознавателя.
+
+    Вызывается в пуле потоков: ожидание остановки и освобождение нативного
+    handle распознавателя в SDK блокирующие и могут занимать до секунды и
+    более. Распознаватель передается в контейнере, чтобы последняя ссылка
+    гарантированно отпускалась здесь, а не в цикле событий.
+    """
+    for sdk_future in sdk_futures:
+        try:
+            sdk_future.get()
+        except Exception as e:
+            logger.debug(f"Ошибка завершения операции SDK: {str(e)}")
+    holder.clear()
+
+
+async def recognize_once(
+    recognizer_factory: Callable[[], "speechsdk.SpeechRecognizer"],
+    timeout: Optional[float] = None
+) -> "speechsdk.SpeechRecognitionResult":
+    """
+    Однократное распознавание без блокировки потока.
+
+    Распознаватель создается через фабрику, чтобы мост владел единственной
+    ссылкой на него и мог освободить его вне цикла событий.
+
+    Args:
+        recognizer_factory: Фабрика настроенного распознавателя SDK
+        timeout: Максимальное время ожидания результата в секундах
+
+    Returns:
+        SpeechRecognitionResult: Результат распознавания (RecognizedSpeech, NoMatch или Canceled)
+
+    Raises:
+        TimeoutError: Результат не получен за отведенное время
+        asyncio.CancelledError: Ожидающая корутина была отменена
+    """
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    metrics = get_metrics()
+
+    def on_result(evt) -> None:
+        # Вызывается в нативном потоке SDK
+        loop.call_soon_threadsafe(_set_result, done, evt.result)
+
+    recognizer = recognizer_factory()
+    recognizer.recognized.connect(on_result)
+    recognizer.canceled.connect(on_result)
+
+    sdk_futures = [recognizer.start_continuous_recognition_async()]
+    session_finished = False
+    metrics.add_gauge("azure_recognitions_in_flight", 1)
+    try:
+        result = await asyncio.wait_for(done, timeout)
+        # После отмены (ошибка, конец потока) сессия SDK уже завершена
+        session_finished = result.reason == get_speechsdk().ResultReason.Canceled
+        return result
+    except asyncio.TimeoutError:
+        metrics.increment("azure_recognitions_aborted_total", reason="timeout")
+        raise TimeoutError(f"Распознавание не завершилось за {timeout} секунд")
+    except asyncio.CancelledError:
+        metrics.increment("azure_recognitions_aborted_total", reason="cancelled")
+        raise
+    finally:
+        metrics.add_gauge("azure_recognitions_in_flight", -1)
+        recognizer.recognized.disconnect_all()
+        recognizer.canceled.disconnect_all()
+        if not session_finished:
+            # Остановка не блокирует цикл событий: ожидание операции — в пуле потоков
+            sdk_futures.append(recognizer.stop_continuous_recognition_async())
+        holder = [recognizer]
+        del recognizer
+        loop.run_in_executor(None, _dispose_recognizer, holder, *sdk_futures)
@@ -0,0 +1,199 @@
+"""
+Локальная переоценка сохраненного результата по другим референсным текстам.
+
+Распознанные слова сохраненного результата Azure (с их оценками точности)
+выравниваются по словам с новым референсным текстом по расстоянию
+Левенштейна. По выравниванию вычисляются метки ошибок (Omission, Insertion,
+Mispronunciation) и итоговые оценки — так же, как это делает Azure при
+включенном miscue, но за миллисекунды и без повторного распознавания.
+
+Беглость и просодия от референсного текста не зависят и берутся из исходного
+результата.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schemas import Scores, WordAnalysis
+from .text import normalize_reference_text, normalize_word, strip_punctuation
+from ...metrics import get_metrics
+
+# Порог Azure, ниже которого слово считается произнесенным неправильно
+MISPRONUNCIATION_THRESHOLD = 60.0
+
+
+@dataclass
+class RecognizedWord:
+    """Слово, фактически распознанное в записи."""
+    word: str
+    accuracy_score: float
+    offset: Optional[int] = None
+    duration: Optional[int] = None
+
+
+@dataclass
+class RescoredResult:
+    """Результат переоценки по одному референсному тексту."""
+    reference_text: str
+    scores: Scores
+    words_analysis: List[WordAnalysis]
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбиение референсного текста на слова."""
+    return [word for word in map(strip_punctuation, normalize_reference_text(text).split()) if word]
+
+
+def recognized_words(raw: Dict[str, Any]) -> List[RecognizedWord]:
+    """
+    Распознанные слова из JSON результата Azure.
+    
+    Слова с ErrorType=Omission отсутствуют в записи (это слова исходного
+    референсного текста) и в выравнивание не включаются.
+    """
+    nbest = (raw.get('NBest') or [{}])[0]
+    words = []
+    for word in nbest.get('Words', []):
+        assessment = word.get('PronunciationAssessment', {})
+        if assessment.get('ErrorType') == 'Omission':
+            continue
+        words.append(RecognizedWord(
+            word=word.get('Word', ''),
+            accuracy_score=assessment.get('AccuracyScore', 0.0),
+            offset=word.get('Offset'),
+            duration=word.get('Duration')
+        ))
+    return words
+
+
+def align(reference: List[str], hypothesis: List[str]) -> List[Tuple[Optional[int], Optional[int]]]:
+    """
+    Выравнивание слов по расстоянию Левенштейна.
+    
+    Замена слова представляется как пропуск референсного слова и вставка
+    распознанного (как в miscue-разметке Azure), поэтому допустимы только
+    совпадения, пропуски и вставки.
+    
+    Returns:
+        List[Tuple[Optional[int], Optional[int]]]: Пары индексов (референс, распознанное);
+            None на одной из сторон означает пропуск или вставку
+    """
+    n, m = len(reference), len(hypothesis)
+    # cost[i][j] — стоимость выравнивания reference[i:] и hypothesis[j:]
+    cost = [[0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n, -1, -1):
+        for j in range(m, -1, -1):
+            if i == n:
+                cost[i][j] = m - j
+            elif j == m:
+                cost[i][j] = n - i
+            elif reference[i] == hypothesis[j]:
+                cost[i][j] = cost[i + 1][j + 1]
+            else:
+                cost[i][j] = 1 + min(cost[i + 1][j], cost[i][j + 1])
+
+    pairs = []
+    i = j = 0
+    while i < n or j < m:
+        if i < n and j < m and reference[i] == hypothesis[j] and cost[i][j] == cost[i + 1][j + 1]:
+            pairs.append((i, j))
+            i += 1
+            j += 1
+        elif i < n and (j == m or cost[i][j] == 1 + cost[i + 1][j]):
+            pairs.append((i, None))
+            i += 1
+        else:
+            pairs.append((None, j))
+            j += 1
+    return pairs
+
+
+def pronunciation_score(
+    accuracy: float,
+    fluency: float,
+    completeness: float,
+    prosody: Optional[float] = None
+) -> float:
+    """
+    Общая оценка произношения по формуле Azure.
+    
+    Наименьшая из оценок берется с весом 0.4 (0.6 без просодии), остальные — по 0.2.
+    """
+    ordered = sorted(score for score in (accuracy, fluency, completeness, prosody) if score is not None)
+    if prosody is None:
+        return round(ordered[0] * 0.6 + ordered[1] * 0.2 + ordered[2] * 0.2, 1)
+    return round(ordered[0] * 0.4 + ordered[1] * 0.2 + ordered[2] * 0.2 + ordered[3] * 0.2, 1)
+
+
+def rescore(raw: Dict[str, Any], reference_text: str) -> RescoredResult:
+    """
+    Переоценка сохраненного результата Azure по референсному тексту.
+    
+    Args:
+        raw: Исходный JSON результата Azure
+        reference_text: Новый референсный текст
+    
+    Returns:
+        RescoredResult: Оценки и анализ слов относительно нового текста
+    """
+    nbest = (raw.get('NBest') or [{}])[0]
+    assessment = nbest.get('PronunciationAssessment', {})
+    fluency = assessment.get('FluencyScore', 0.0)
+    prosody = assessment.get('ProsodyScore')
+
+    spoken = recognized_words(raw)
+    reference = tokenize(reference_text)
+    pairs = align([normalize_word(word) for word in reference], [normalize_word(word.word) for word in spoken])
+
+    words_analysis = []
+    matched_scores = []
+    for ref_index, hyp_index in pairs:
+        if ref_index is not None and hyp_index is not None:
+            accuracy = spoken[hyp_index].accuracy_score
+            matched_scores.append(accuracy)
+            words_analysis.append(WordAnalysis(
+                word=reference[ref_index],
+                accuracy_score=accuracy,
+                error_type='Mispronunciation' if accuracy < MISPRONUNCIATION_THRESHOLD else 'None'
+            ))
+        elif ref_index is not None:
+            words_analysis.append(WordAnalysis(word=reference[ref_index], accuracy_score=0.0, error_type='Omission'))
+        else:
+            words_analysis.append(WordAnalysis(
+                word=spoken[hyp_index].word,
+                accuracy_score=spoken[hyp_index].accuracy_score,
+                error_type='Insertion'
+            ))
+
+    completeness = round(len(matched_scores) / len(reference) * 100, 1) if reference else 0.0
+    accuracy = round(sum(matched_scores) / len(matched_scores), 1) if matched_scores else 0.0
+
+    return RescoredResult(
+        reference_text=reference_text,
+        scores=Scores(
+            pronunciation_score=pronunciation_score(accuracy, fluency, completeness, prosody),
+            accuracy_score=accuracy,
+            fluency_score=fluency,
+            completeness_score=completeness,
+            prosody_score=prosody
+        ),
+        words_analysis=words_analysis
+    )
+
+
+def rescore_many(raw: Dict[str, Any], reference_texts: List[str]) -> List[RescoredResult]:
+    """Переоценка по нескольким референсным текстам с учетом времени в метриках."""
+    started = time.perf_counter()
+    results = [rescore(raw, reference_text) for reference_text in reference_texts]
+    metrics = get_metrics()
+    metrics.observe("rescore_duration_seconds", time.perf_counter() - started)
+    metrics.increment("rescore_references_total", len(reference_texts))
+    return results
+
+
+def best_match(results: List[RescoredResult]) -> Optional[RescoredResult]:
+    """Референсный текст, который вероятнее всего был произнесен."""
+    if not results:
+        return None
+    return max(results, key=lambda result: (result.scores.completeness_score, result.scores.pronunciation_score))
@@ -2,24 +2,74 @@
 Маршруты для Azure анализа произношения.
 """
 
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Request, Header, Query
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, ValidationError
+from typing import List, AsyncIterator, Optional, Union
+import asyncio
 import logging
+import time
 
 from .schemas import (
+    AssessmentProfile,
     PronunciationRequest,
     PronunciationResponse,
     BatchPronunciationRequest,
     BatchPronunciationResponse,
+    BatchStreamItem,
+    BatchStreamSummary,
+    AudioUploadRequest,
+    AudioUploadResponse,
+    PhonemeDetailsResponse,
+    SyllableDetailsResponse,
+    ProsodyDetailsResponse,
+    RescoreRequest,
+    RescoreResult,
+    RescoreResponse,
+    DifficultyItem,
+    DifficultyResponse,
+    ProgressAttempt,
+    ProgressAttemptsResponse,
+    ProgressTrendPoint,
+    ProgressTrendResponse,
+    ProgressPhrase,
+    ProgressPhrasesResponse,
+    Scores,
+    WordAnalysis,
     ErrorResponse
 )
 from .services import AzureSpeechService, AudioProcessingService
+from .details import extract_phonemes, extract_syllables, extract_prosody
+from .rescoring import rescore_many, best_match
+from .profiles import PROFILES
+from .storage import StoredResult
+from .difficulty import get_difficulty_aggregates
+from .progress import (
+    ProgressStore, bind_user_id, decode_cursor, encode_cursor, get_progress_store, require_progress_token
+)
+from .text import reference_text_hash
+from .deadline import Deadline
+from ...tracing import annotate, span
+from .scheduler import Priority
+from .encoding import ResponseFormat, negotiate, render
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
 # Создание роутера
-router = APIRouter(prefix="/azure", tags=["Azure Pronunciation"])
+router = APIRouter(prefix="/azure", tags=["Azure Pronunciation"], dependencies=[Depends(bind_user_id)])
+
+def _model_response(model: BaseModel, response_format: ResponseFormat) -> Response:
+    """
+    Ответ из модели, собранной сервисом из проверенных данных.
+    
+    Возврат Response напрямую исключает повторную валидацию и сериализацию
+    по response_model; response_model остается для документации OpenAPI.
+    """
+    annotate(response_format=response_format.media_type)
+    with span("serialize"):
+        return render(model.model_dump(), response_format)
+
 
 # Зависимости
 def get_azure_service() -> AzureSpeechService:
@@ -30,6 +80,20 @@ def get_audio_service() -> AudioProcessingService:
     """Получение экземпляра Audio Processing Service."""
     return AudioProcessingService()
 
+def get_response_format(
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(
+        None,
+        description="Проекция полей результата через запятую, например scores,words_analysis.word"
+    ),
+    layout: Optional[str] = Query(
+        None,
+        description="Раскладка слов: rows (по умолчанию) или columnar (параллельные массивы)"
+    )
+) -> ResponseFormat:
+    """Формат ответа по заголовку Accept и параметрам fields/layout."""
+    return negotiate(accept, fields, layout)
+
 
 @router.post(
     "/pronunciation-assessment",
@@ -40,7 +104,8 @@ def get_audio_service() -> AudioProcessingService:
 async def pronunciation_assessment(
     request: PronunciationRequest,
     azure_service: AzureSpeechService = Depends(get_azure_service),
-    audio_service: AudioProcessingService = Depends(get_audio_service)
+    audio_service: AudioProcessingService = Depends(get_audio_service),
+    response_format: ResponseFormat = Depends(get_response_format)
 ):
     """
     Анализ произношения речи через Azure.
@@ -53,32 +118,44 @@ async def pronunciation_assessment(
     Returns:
         PronunciationResponse: Результат анализа произношения
     """
+    # Крайний срок отсчитывается от получения запроса и действует на всех этапах
+    deadline = Deadline.after(azure_service.config.timeout)
+    
     try:
         logger.info(f"Начат анализ произношения для текста: '{request.reference_text}'")
         
-        # Валидация аудио данных
-        try:
-            import base64
-            audio_bytes = base64.b64decode(request.audio_data)
-            audio_info = audio_service.get_audio_info(audio_bytes)
-            
-            if not audio_info.valid:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"Неверный формат аудио: {audio_info.error or 'Неизвестная ошибка'}"
-                )
+        # Валидация аудио данных (загруженное ранее аудио уже провалидировано)
+        if request.audio_data is not None:
+            try:
+                import base64
+                with span("validate"):
+                    audio_bytes = base64.b64decode(request.audio_data)
+                    audio_info = audio_service.get_audio_info(audio_bytes)
                 
-            logger.info(f"Аудио файл валиден: {audio_info}")
-            
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Ошибка валидации аудио: {str(e)}")
+                if not audio_info.valid:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Неверный формат аудио: {audio_info.error or 'Неизвестная ошибка'}"
+                    )
+                    
+                logger.info(f"Аудио файл валиден: {audio_info}")
+                
+            except HTTPException:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=400, detail=f"Ошибка валидации аудио: {str(e)}")
         
         # Выполнение анализа
-        result = await azure_service.analyze_pronunciation(request)
+        result = await azure_service.analyze_pronunciation(request, deadline=deadline)
         
         logger.info(f"Анализ завершен успешно. Общая оценка: {result.scores.pronunciation_score}")
-        return result
+        return _model_response(result, response_format)
         
+    except HTTPException:
+        raise
+    except LookupError as e:
+        logger.error(f"Аудио не найдено: {str(e)}")
+        raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         logger.error(f"Ошибка валидации: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -93,6 +170,62 @@ async def pronunciation_assessment(
         raise HTTPException(status_code=500, detail=f"Внутренняя ошибка: {str(e)}")
 
 
+@router.post(
+    "/audio",
+    response_model=AudioUploadResponse,
+    summary="Загрузка аудио для повторного анализа",
+    description=(
+        "Аудио декодируется и валидируется один раз и сохраняется в локальном хранилище. "
+        "Возвращенный audio_id можно передавать вместо audio_data в запросы анализа, "
+        "в том числе пакетные, для оценки по разным референсным текстам и языкам."
+    )
+)
+async def upload_audio(
+    request: AudioUploadRequest,
+    azure_service: AzureSpeechService = Depends(get_azure_service),
+    audio_service: AudioProcessingService = Depends(get_audio_service)
+):
+    """
+    Загрузка аудио для повторного использования.
+    
+    Args:
+        request: Аудио данные в base64
+        azure_service: Сервис Azure Speech
+        audio_service: Сервис обработки аудио
+        
+    Returns:
+        AudioUploadResponse: Идентификатор сохраненного аудио
+    """
+    try:
+        import base64
+        audio_bytes = base64.b64decode(request.audio_data)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Ошибка декодирования аудио: {str(e)}")
+    
+    audio_info = audio_service.get_audio_info(audio_bytes)
+    if not audio_info.valid:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неверный формат аудио: {audio_info.error or 'Неизвестная ошибка'}"
+        )
+    
+    try:
+        stored = await azure_service.store_audio(audio_bytes)
+    except Exception as e:
+        logger.error(f"Ошибка сохранения аудио: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Ошибка сохранения аудио: {str(e)}")
+    
+    logger.info(f"Аудио сохранено: {stored.audio_id} ({stored.size} bytes)")
+    
+    return AudioUploadResponse(
+        status='success',
+        audio_id=stored.audio_id,
+        format=stored.format,
+        size=stored.size,
+        expires_in=azure_service.config.audio_store_ttl
+    )
+
+
 @router.post(
     "/pronunciation-assessment/batch",
     response_model=BatchPronunciationResponse,
@@ -101,7 +234,8 @@ async def pronunciation_assessment(
 )
 async def batch_pronunciation_assessment(
     request: BatchPronunciationRequest,
-    azure_service: AzureSpeechService = Depends(get_azure_service)
+    azure_service: AzureSpeechService = Depends(get_azure_service),
+    response_format: ResponseFormat = Depends(get_response_format)
 ):
     """
     Пакетный анализ произношения через Azure.
@@ -113,15 +247,24 @@ async def batch_pronunciation_assessment(
     Returns:
         BatchPronunciationResponse: Результаты пакетного анализа
     """
+    # Общий крайний срок пакета; каждый элемент получает бюджет не более AzureConfig.timeout
+    batch_deadline = Deadline.after(azure_service.config.batch_timeout)
+    
     try:
         logger.info(f"Начат пакетный анализ {len(request.requests)} запросов")
+        annotate(batch_items=len(request.requests))
         
         results = []
         failed_requests = []
         
         for i, req in enumerate(request.requests):
             try:
-                result = await azure_service.analyze_pronunciation(req)
+                batch_deadline.check("batch_queue")
+                item_deadline = batch_deadline.budget(azure_service.config.timeout)
+                with span("item", index=i):
+                    result = await azure_service.analyze_pronunciation(
+                        req, deadline=item_deadline, priority=Priority.BATCH
+                    )
                 results.append(result)
             except Exception as e:
                 logger.error(f"Ошибка в запросе {i}: {str(e)}")
@@ -133,20 +276,493 @@ async def batch_pronunciation_assessment(
         
         logger.info(f"Пакетный анализ завершен. Успешно: {len(results)}, Ошибок: {len(failed_requests)}")
         
-        return BatchPronunciationResponse(
+        return _model_response(BatchPronunciationResponse.model_construct(
             status='success',
             results=results,
             failed_requests=failed_requests,
             total_processed=len(request.requests),
             successful_count=len(results),
             failed_count=len(failed_requests)
-        )
+        ), response_format)
         
     except Exception as e:
         logger.error(f"Ошибка пакетного анализа: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка пакетного анализа: {str(e)}")
 
 
+def _format_stream_line(line: BaseModel, sse: bool) -> str:
+    """Сериализация строки потокового ответа в NDJSON или событие SSE."""
+    with span("serialize"):
+        payload = line.model_dump_json(exclude_none=True)
+    if sse:
+        return f"event: {line.type}\ndata: {payload}\n\n"
+    return payload + "\n"
+
+
+async def _stream_batch_results(
+    azure_service: AzureSpeechService,
+    requests,
+    batch_deadline: Deadline,
+    sse: bool
+) -> AsyncIterator[str]:
+    """Строки потокового ответа: элементы по мере готовности и итоговая сводка."""
+    successful_count = 0
+    failed_count = 0
+    
+    async for index, reference_text, outcome in azure_service.analyze_batch_as_completed(requests, batch_deadline):
+        if isinstance(outcome, Exception):
+            failed_count += 1
+            line = BatchStreamItem(
+                index=index,
+                status='error',
+                error=str(outcome),
+                reference_text=reference_text
+            )
+        else:
+            successful_count += 1
+            line = BatchStreamItem(index=index, status='success', result=outcome)
+        yield _format_stream_line(line, sse)
+    
+    logger.info(f"Потоковый пакетный анализ завершен. Успешно: {successful_count}, Ошибок: {failed_count}")
+    
+    yield _format_stream_line(
+        BatchStreamSummary(
+            status='success',
+            total_processed=successful_count + failed_count,
+            successful_count=successful_count,
+            failed_count=failed_count
+        ),
+        sse
+    )
+
+
+@router.post(
+    "/pronunciation-assessment/batch/stream",
+    summary="Потоковый пакетный анализ произношения через Azure",
+    description=(
+        "Элементы пакета обрабатываются конкурентно, результат каждого отправляется "
+        "отдельной строкой NDJSON (или событием SSE при Accept: text/event-stream) "
+        "сразу после завершения, с индексом исходного элемента. Последняя строка — "
+        "сводка с successful_count и failed_count."
+    ),
+    response_class=StreamingResponse
+)
+async def batch_pronunciation_assessment_stream(
+    request: BatchPronunciationRequest,
+    http_request: Request,
+    azure_service: AzureSpeechService = Depends(get_azure_service)
+):
+    """
+    Потоковый пакетный анализ произношения через Azure.
+    
+    Args:
+        request: Пакет запросов для анализа
+        http_request: HTTP запрос (для согласования формата потока)
+        azure_service: Сервис Azure Speech
+        
+    Returns:
+        StreamingResponse: Поток NDJSON строк или SSE событий
+    """
+    batch_deadline = Deadline.after(azure_service.config.batch_timeout)
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    
+    logger.info(f"Начат потоковый пакетный анализ {len(request.requests)} запросов")
+    
+    return StreamingResponse(
+        _stream_batch_results(azure_service, request.requests, batch_deadline, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        # Отключаем буферизацию в nginx, чтобы строки доходили до клиента сразу
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """
+    Потоковый ответ, который отправляется одновременно с чтением тела запроса.
+    
+    Стандартный StreamingResponse параллельно слушает receive() для отслеживания
+    отключения клиента и поглощает сообщения с телом запроса. Здесь отключение
+    обнаруживается при чтении тела (ClientDisconnect).
+    """
+    
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def _iter_ndjson_requests(
+    http_request: Request,
+    max_item_bytes: int
+) -> AsyncIterator[Union[PronunciationRequest, Exception]]:
+    """
+    Инкрементальный разбор тела NDJSON: по одному PronunciationRequest на строку.
+    
+    Тело читается частями по мере запроса следующего элемента, поэтому в памяти
+    находится не больше одной недочитанной строки. Ошибка разбора строки
+    возвращается как исключение и не прерывает пакет.
+    """
+    buffer = bytearray()
+    skipping = False
+    
+    async for chunk in http_request.stream():
+        buffer.extend(chunk)
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line = bytes(buffer[:newline]).strip()
+            del buffer[:newline + 1]
+            if skipping:
+                # Конец слишком длинной строки, о которой уже сообщено
+                skipping = False
+                continue
+            if line:
+                yield _parse_ndjson_line(line)
+        if len(buffer) > max_item_bytes and not skipping:
+            skipping = True
+            yield ValueError(f"Элемент пакета превышает {max_item_bytes} байт")
+        if skipping:
+            buffer.clear()
+    
+    line = bytes(buffer).strip()
+    if line and not skipping:
+        yield _parse_ndjson_line(line)
+
+
+def _parse_ndjson_line(line: bytes) -> Union[PronunciationRequest, Exception]:
+    """Валидация одной строки NDJSON как PronunciationRequest."""
+    try:
+        return PronunciationRequest.model_validate_json(line)
+    except ValidationError as e:
+        return ValueError(f"Неверный элемент пакета: {e.errors()[0].get('msg', str(e))}")
+
+
+@router.post(
+    "/pronunciation-assessment/batch/ndjson",
+    summary="Пакетный анализ произношения с потоковым разбором запроса",
+    description=(
+        "Тело запроса — NDJSON (Content-Type: application/x-ndjson), по одному объекту "
+        "PronunciationRequest на строку. Анализ каждого элемента начинается сразу после "
+        "получения его строки; одновременно в памяти находится не больше "
+        "AZURE_BATCH_CONCURRENCY элементов. Ответ — поток NDJSON как у /batch/stream."
+    ),
+    response_class=StreamingResponse
+)
+async def batch_pronunciation_assessment_ndjson(
+    http_request: Request,
+    azure_service: AzureSpeechService = Depends(get_azure_service)
+):
+    """
+    Пакетный анализ произношения с потоковым разбором тела запроса.
+    
+    Args:
+        http_request: HTTP запрос с телом NDJSON
+        azure_service: Сервис Azure Speech
+        
+    Returns:
+        StreamingResponse: Поток NDJSON строк или SSE событий
+    """
+    batch_deadline = Deadline.after(azure_service.config.batch_timeout)
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    source = _iter_ndjson_requests(http_request, azure_service.config.stream_max_item_bytes)
+    
+    logger.info("Начат пакетный анализ с потоковым разбором запроса")
+    
+    return _DuplexStreamingResponse(
+        _stream_batch_results(azure_service, source, batch_deadline, sse),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"}
+    )
+
+
+async def _load_result(azure_service: AzureSpeechService, result_id: str) -> StoredResult:
+    """Загрузка сохраненного результата Azure или 404."""
+    stored = await azure_service.get_result_details(result_id)
+    if stored is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Результат {result_id} не найден или срок хранения истек"
+        )
+    return stored
+
+
+@router.get(
+    "/results/{result_id}/phonemes",
+    response_model=PhonemeDetailsResponse,
+    summary="Фонемы результата анализа",
+    description=(
+        "Оценки фонем по каждому слову из сохраненного результата Azure. "
+        "Данные есть только у анализов с детализацией до фонем."
+    )
+)
+async def result_phonemes(
+    result_id: str,
+    azure_service: AzureSpeechService = Depends(get_azure_service)
+):
+    """Фонемы сохраненного результата."""
+    stored = await _load_result(azure_service, result_id)
+    return extract_phonemes(result_id, stored.raw)
+
+
+@router.get(
+    "/results/{result_id}/syllables",
+    response_model=SyllableDetailsResponse,
+    summary="Слоги результата анализа",
+    description=(
+        "Оценки слогов по каждому слову из сохраненного результата Azure. "
+        "Данные есть только у анализов с детализацией до фонем."
+    )
+)
+async def result_syllables(
+    result_id: str,
+    azure_service: AzureSpeechService = Depends(get_azure_service)
+):
+    """Слоги сохраненного результата."""
+    stored = await _load_result(azure_service, result_id)
+    return extract_syllables(result_id, stored.raw)
+
+
+@router.get(
+    "/results/{result_id}/prosody",
+    response_model=ProsodyDetailsResponse,
+    summary="Просодия результата анализа",
+    description="Общая оценка просодии и ошибки пауз/интонации по словам из сохраненного результата Azure"
+)
+async def result_prosody(
+    result_id: str,
+    azure_service: AzureSpeechService = Depends(get_azure_service)
+):
+    """Просодия сохраненного результата."""
+    stored = await _load_result(azure_service, result_id)
+    return extract_prosody(result_id, stored.raw)
+
+
+@router.post(
+    "/results/{result_id}/rescore",
+    response_model=RescoreResponse,
+    summary="Переоценка результата по другим референсным текстам",
+    description=(
+        "Сохраненный результат распознавания выравнивается по словам с каждым из "
+        "переданных текстов без повторного обращения к Azure. Подходит для "
+        "определения произнесенной фразы и оценки по нескольким эталонам. "
+        "Беглость и просодия берутся из исходного результата. "
+        "Результаты профиля без miscue (lite) переоценить нельзя (422): в них нет произнесенных слов."
+    )
+)
+async def rescore_result(
+    result_id: str,
+    request: RescoreRequest,
+    azure_service: AzureSpeechService = Depends(get_azure_service),
+    response_format: ResponseFormat = Depends(get_response_format)
+):
+    """Переоценка сохраненного результата."""
+    stored = await _load_result(azure_service, result_id)
+    if stored.profile is not None and not PROFILES[AssessmentProfile(stored.profile)].enable_miscue:
+        # Без miscue массив Words содержит референсные слова, а не произнесенные
+        raise HTTPException(
+            status_code=422,
+            detail=f"Результат {result_id} получен профилем {stored.profile} без miscue и не может быть переоценен"
+        )
+    raw = stored.raw
+    rescored = rescore_many(raw, request.reference_texts)
+    
+    return _model_response(RescoreResponse.model_construct(
+        status='success',
+        result_id=result_id,
+        recognized_text=raw.get('DisplayText', '').strip(),
+        best_reference_text=best_match(rescored).reference_text,
+        results=[
+            RescoreResult.model_construct(
+                reference_text=result.reference_text,
+                scores=result.scores,
+                words_analysis=result.words_analysis
+            )
+            for result in rescored
+        ]
+    ), response_format)
+
+
+async def _difficulty_response(
+    table_name: str,
+    language: Optional[str],
+    limit: int,
+    min_count: int,
+    order_by: str
+) -> DifficultyResponse:
+    """Top-N самых сложных элементов агрегатов текущего воркера."""
+    aggregates = get_difficulty_aggregates()
+    if aggregates is None:
+        raise HTTPException(status_code=503, detail="Агрегаты сложности отключены")
+    items, total_keys = await asyncio.to_thread(aggregates.query, table_name, limit, language, min_count, order_by)
+    return DifficultyResponse.model_construct(
+        status='success',
+        order_by=order_by,
+        total_keys=total_keys,
+        items=[DifficultyItem.model_construct(**item) for item in items]
+    )
+
+
+@router.get(
+    "/difficulty/words",
+    response_model=DifficultyResponse,
+    summary="Самые сложные слова",
+    description=(
+        "Слова с наименьшей средней точностью (order_by=accuracy) или наибольшей долей "
+        "ошибок (order_by=error_rate) по всем завершенным оценкам. Агрегаты воркера: оценки, "
+        "обработанные другими воркерами, учитываются после их очередного снимка "
+        "(AZURE_DIFFICULTY_SNAPSHOT_INTERVAL), поэтому ответы разных воркеров могут различаться"
+    )
+)
+async def difficult_words(
+    language: Optional[str] = Query(None, description="Язык (по умолчанию все)"),
+    limit: int = Query(20, ge=1, le=1000, description="Количество слов"),
+    min_count: int = Query(5, ge=1, description="Минимальное количество оценок слова"),
+    order_by: str = Query("accuracy", pattern="^(accuracy|error_rate)$", description="Критерий сложности")
+):
+    """Самые сложные слова."""
+    return await _difficulty_response("words", language, limit, min_count, order_by)
+
+
+@router.get(
+    "/difficulty/phrases",
+    response_model=DifficultyResponse,
+    summary="Самые сложные фразы",
+    description=(
+        "Референсные тексты с наименьшей средней точностью (order_by=accuracy) или "
+        "наибольшей долей слов с ошибкой (order_by=error_rate). Агрегаты воркера: оценки, "
+        "обработанные другими воркерами, учитываются после их очередного снимка "
+        "(AZURE_DIFFICULTY_SNAPSHOT_INTERVAL), поэтому ответы разных воркеров могут различаться"
+    )
+)
+async def difficult_phrases(
+    language: Optional[str] = Query(None, description="Язык (по умолчанию все)"),
+    limit: int = Query(20, ge=1, le=1000, description="Количество фраз"),
+    min_count: int = Query(5, ge=1, description="Минимальное количество оценок фразы"),
+    order_by: str = Query("accuracy", pattern="^(accuracy|error_rate)$", description="Критерий сложности")
+):
+    """Самые сложные фразы."""
+    return await _difficulty_response("phrases", language, limit, min_count, order_by)
+
+
+def _progress_store() -> ProgressStore:
+    store = get_progress_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="История попыток отключена")
+    return store
+
+
+def _phrase_hash(reference_text: Optional[str], phrase_hash: Optional[str]) -> str:
+    """Хеш фразы из reference_text или готового reference_text_hash."""
+    if phrase_hash:
+        return phrase_hash
+    if reference_text:
+        return reference_text_hash(reference_text)
+    raise HTTPException(status_code=422, detail="Укажите reference_text или reference_text_hash")
+
+
+@router.get(
+    "/progress/{user_id}/attempts",
+    response_model=ProgressAttemptsResponse,
+    summary="Попытки пользователя по фразе",
+    description="Последние попытки пользователя по референсному тексту от новых к старым с курсором следующей страницы",
+    dependencies=[Depends(require_progress_token)]
+)
+async def progress_attempts(
+    user_id: str,
+    reference_text: Optional[str] = Query(None, description="Референсный текст"),
+    reference_text_hash: Optional[str] = Query(None, description="Хеш референсного текста (вместо reference_text)"),
+    limit: int = Query(50, ge=1, le=500, description="Количество попыток на странице"),
+    cursor: Optional[str] = Query(None, description="Курсор из next_cursor предыдущей страницы"),
+    include_words: bool = Query(False, description="Включить анализ слов")
+):
+    """Попытки пользователя по фразе."""
+    store = _progress_store()
+    phrase_hash = _phrase_hash(reference_text, reference_text_hash)
+    try:
+        before = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Неверный курсор")
+    rows = await store.run_query("attempts", user_id, phrase_hash, limit, before, include_words)
+    items = [
+        ProgressAttempt.model_construct(
+            id=row["id"],
+            timestamp=row["ts"],
+            language=row["language"],
+            profile=row["profile"],
+            scores=Scores.model_construct(
+                pronunciation_score=row["pronunciation_score"],
+                accuracy_score=row["accuracy_score"],
+                fluency_score=row["fluency_score"],
+                completeness_score=row["completeness_score"],
+                prosody_score=row["prosody_score"]
+            ),
+            result_id=row["result_id"],
+            words_analysis=[WordAnalysis.model_validate(word) for word in row["words"]] if include_words else None
+        )
+        for row in rows
+    ]
+    return ProgressAttemptsResponse.model_construct(
+        status='success',
+        user_id=user_id,
+        reference_text_hash=phrase_hash,
+        items=items,
+        next_cursor=encode_cursor(rows[-1]) if len(rows) == limit else None
+    )
+
+
+@router.get(
+    "/progress/{user_id}/trend",
+    response_model=ProgressTrendResponse,
+    summary="Динамика оценок пользователя",
+    description="Средние и лучшие оценки пользователя по референсному тексту по дням или неделям",
+    dependencies=[Depends(require_progress_token)]
+)
+async def progress_trend(
+    user_id: str,
+    reference_text: Optional[str] = Query(None, description="Референсный текст"),
+    reference_text_hash: Optional[str] = Query(None, description="Хеш референсного текста (вместо reference_text)"),
+    bucket: str = Query("day", pattern="^(day|week)$", description="Период группировки"),
+    days: int = Query(90, ge=1, le=3650, description="Глубина истории в днях")
+):
+    """Динамика оценок пользователя по фразе."""
+    store = _progress_store()
+    phrase_hash = _phrase_hash(reference_text, reference_text_hash)
+    rows = await store.run_query("trend", user_id, phrase_hash, bucket, time.time() - days * 86400)
+    return ProgressTrendResponse.model_construct(
+        status='success',
+        user_id=user_id,
+        reference_text_hash=phrase_hash,
+        bucket=bucket,
+        points=[ProgressTrendPoint.model_construct(**row) for row in rows]
+    )
+
+
+@router.get(
+    "/progress/{user_id}/phrases",
+    response_model=ProgressPhrasesResponse,
+    summary="Фразы пользователя",
+    description="Референсные тексты, которые оценивал пользователь, с количеством попыток и лучшей оценкой",
+    dependencies=[Depends(require_progress_token)]
+)
+async def progress_phrases(
+    user_id: str,
+    limit: int = Query(50, ge=1, le=500, description="Количество фраз"),
+    offset: int = Query(0, ge=0, description="Смещение")
+):
+    """Фразы пользователя."""
+    store = _progress_store()
+    rows = await store.run_query("phrases", user_id, limit, offset)
+    return ProgressPhrasesResponse.model_construct(
+        status='success',
+        user_id=user_id,
+        items=[
+            ProgressPhrase.model_construct(last_timestamp=row.pop("last_ts"), **row)
+            for row in rows
+        ]
+    )
+
+
 @router.get(
     "/health",
     summary="Проверка здоровья Azure сервиса",
@@ -0,0 +1,253 @@
+"""
+Планировщик распознаваний с приоритетами.
+
+Количество одновременных распознаваний в процессе ограничено, и слоты
+выдаются по классам приоритета:
+
+- interactive: одиночные запросы, пользователь ждет результат на экране
+- batch: элементы пакетных запросов (проверка уроков)
+- background: прогрев и фоновые задачи
+
+Часть слотов зарезервирована за interactive: пакеты и фоновые задачи не
+могут занять всю емкость. Среди ожидающих слот получает запрос с наименьшим
+эффективным рангом: ранг класса минус время ожидания / aging_seconds. Так
+запросы младших классов со временем догоняют interactive и не голодают.
+
+Внутри класса запросы разных клиентов обслуживаются по взвешенной
+справедливой очереди (start-time fair queuing): клиент с большим количеством
+запросов в очереди не задерживает остальных, а доля слотов клиента
+пропорциональна его весу.
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Deque, Dict, Optional
+
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+
+class Priority(str, Enum):
+    """Класс приоритета распознавания."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+    BACKGROUND = "background"
+
+
+_RANK = {Priority.INTERACTIVE: 0, Priority.BATCH: 1, Priority.BACKGROUND: 2}
+
+
+@dataclass(eq=False)
+class _Waiter:
+    """Запрос слота в очереди."""
+    priority: Priority
+    future: asyncio.Future
+    tenant: str = ""
+    start: float = 0.0
+    finish: float = 0.0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    seq: int = 0
+
+
+class _FairQueue:
+    """Очередь класса: взвешенная справедливая очередь по клиентам."""
+
+    def __init__(self):
+        self.tenants: Dict[str, Deque[_Waiter]] = {}
+        self.last_finish: Dict[str, float] = {}
+        self.virtual_time = 0.0
+        self.size = 0
+
+    def push(self, waiter: _Waiter, weight: float) -> None:
+        waiter.start = max(self.virtual_time, self.last_finish.get(waiter.tenant, 0.0))
+        waiter.finish = waiter.start + 1.0 / weight
+        self.last_finish[waiter.tenant] = waiter.finish
+        self.tenants.setdefault(waiter.tenant, deque()).append(waiter)
+        self.size += 1
+        if len(self.last_finish) > 4 * len(self.tenants) + 64:
+            # Клиенты без запросов в очереди, отставшие от виртуального времени, не влияют на порядок
+            self.last_finish = {
+                tenant: finish for tenant, finish in self.last_finish.items()
+                if tenant in self.tenants or finish > self.virtual_time
+            }
+
+    def head(self) -> Optional[_Waiter]:
+        """Запрос с наименьшей виртуальной меткой окончания."""
+        return min((queue[0] for queue in self.tenants.values()), key=lambda w: (w.finish, w.seq), default=None)
+
+    def remove(self, waiter: _Waiter) -> bool:
+        queue = self.tenants.get(waiter.tenant)
+        if queue is None or waiter not in queue:
+            return False
+        queue.remove(waiter)
+        if not queue:
+            del self.tenants[waiter.tenant]
+        self.size -= 1
+        return True
+
+    def pop(self, waiter: _Waiter) -> None:
+        """Извлечение выбранного запроса с продвижением виртуального времени."""
+        self.remove(waiter)
+        self.virtual_time = max(self.virtual_time, waiter.start)
+
+
+class RecognitionScheduler:
+    """
+    Выдача слотов распознавания по приоритетам.
+
+    Args:
+        capacity: Максимальное количество одновременных распознаваний
+        interactive_reserved: Слоты, доступные только классу interactive
+        aging_seconds: Время ожидания, за которое запрос повышается на один класс
+        tenant_weights: Веса клиентов в справедливой очереди (по умолчанию 1)
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        interactive_reserved: int,
+        aging_seconds: float,
+        tenant_weights: Optional[Dict[str, float]] = None
+    ):
+        self.capacity = max(1, capacity)
+        # Младшим классам остается хотя бы один слот
+        self.interactive_reserved = max(0, min(interactive_reserved, self.capacity - 1))
+        self.aging_seconds = aging_seconds
+        self.tenant_weights = tenant_weights or {}
+        self._in_use: Dict[Priority, int] = {priority: 0 for priority in Priority}
+        self._queues: Dict[Priority, _FairQueue] = {priority: _FairQueue() for priority in Priority}
+        self._seq = itertools.count()
+
+    @property
+    def in_use(self) -> int:
+        """Количество занятых слотов."""
+        return sum(self._in_use.values())
+
+    def limit(self, priority: Priority) -> int:
+        """Максимальное количество одновременных распознаваний класса."""
+        if priority is Priority.INTERACTIVE:
+            return self.capacity
+        return self.capacity - self.interactive_reserved
+
+    def _effective_rank(self, waiter: _Waiter, now: float) -> float:
+        if self.aging_seconds <= 0:
+            return _RANK[waiter.priority]
+        return _RANK[waiter.priority] - (now - waiter.enqueued_at) / self.aging_seconds
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Ожидающий запрос, которому можно выдать слот сейчас."""
+        now = time.monotonic()
+        best = None
+        best_key = None
+        for priority, queue in self._queues.items():
+            if not queue.size or self.in_use >= self.limit(priority):
+                continue
+            head = queue.head()
+            key = (self._effective_rank(head, now), head.seq)
+            if best_key is None or key < best_key:
+                best, best_key = head, key
+        return best
+
+    def _dispatch(self) -> None:
+        """Выдача свободных слотов ожидающим запросам."""
+        while True:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            self._queues[waiter.priority].pop(waiter)
+            if waiter.future.done():
+                # Ожидание уже отменено, запрос убирается из очереди без слота
+                continue
+            self._in_use[waiter.priority] += 1
+            waiter.future.set_result(None)
+        self._report()
+
+    async def acquire(self, priority: Priority, timeout: Optional[float] = None, tenant: str = "") -> None:
+        """
+        Ожидание слота распознавания.
+
+        Args:
+            priority: Класс приоритета
+            timeout: Максимальное время ожидания в секундах
+            tenant: Идентификатор клиента для справедливой очереди
+
+        Raises:
+            TimeoutError: Слот не получен за отведенное время
+        """
+        waiter = _Waiter(
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+            tenant=tenant,
+            seq=next(self._seq)
+        )
+        self._queues[priority].push(waiter, self.tenant_weights.get(tenant, 1.0))
+        self._dispatch()
+
+        metrics = get_metrics()
+        try:
+            if not waiter.future.done():
+                await asyncio.wait_for(waiter.future, timeout)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Слот выдан одновременно с отменой: возвращаем его
+                self.release(priority)
+            elif self._queues[priority].remove(waiter):
+                self._report()
+            if isinstance(e, asyncio.TimeoutError):
+                metrics.increment("scheduler_queue_timeouts_total", priority=priority.value)
+                raise TimeoutError(f"Слот распознавания не получен за {timeout} секунд")
+            raise
+        metrics.observe("scheduler_queue_wait_seconds", time.monotonic() - waiter.enqueued_at, priority=priority.value)
+
+    def release(self, priority: Priority) -> None:
+        """Освобождение слота распознавания."""
+        self._in_use[priority] -= 1
+        self._dispatch()
+
+    def _report(self) -> None:
+        metrics = get_metrics()
+        for priority in Priority:
+            metrics.set_gauge("scheduler_in_use", self._in_use[priority], priority=priority.value)
+            metrics.set_gauge("scheduler_queue_depth", self._queues[priority].size, priority=priority.value)
+
+
+def parse_tenant_weights(value: str) -> Dict[str, float]:
+    """Разбор весов клиентов вида "client:ios=2,key:3fa1...=0.5"."""
+    weights = {}
+    for item in value.split(","):
+        tenant, sep, weight = item.strip().rpartition("=")
+        if sep and tenant and float(weight) > 0:
+            weights[tenant] = float(weight)
+    return weights
+
+
+_scheduler: Optional[RecognitionScheduler] = None
+
+
+def _reset_after_fork() -> None:
+    """Планировщик создается заново в каждом процессе-воркере."""
+    global _scheduler
+    _scheduler = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_scheduler() -> RecognitionScheduler:
+    """Получить планировщик распознаваний (создается при первом обращении)."""
+    global _scheduler
+    if _scheduler is None:
+        config = get_azure_config()
+        _scheduler = RecognitionScheduler(
+            config.scheduler_capacity,
+            config.scheduler_interactive_reserved,
+            config.scheduler_aging_seconds,
+            parse_tenant_weights(config.scheduler_tenant_weights)
+        )
+    return _scheduler
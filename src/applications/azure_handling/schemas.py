@@ -2,15 +2,57 @@
 Схемы данных для Azure анализа произношения.
 """
 
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from enum import Enum
+
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Optional, Dict, Any
+
+# Код языка BCP 47 (cs-CZ, en-US, zh-Hans-CN): язык попадает в пути файлов и ключи агрегатов
+LANGUAGE_PATTERN = r"^[A-Za-z]{2,3}(-[A-Za-z0-9]{2,8})*$"
+
+class AssessmentProfile(str, Enum):
+    """Профиль оценки произношения (объем анализа)."""
+    LITE = "lite"
+    STANDARD = "standard"
+    FULL = "full"
 
 
 class PronunciationRequest(BaseModel):
     """Запрос на анализ произношения."""
-    audio_data: str = Field(..., description="Аудио данные в base64")
+    audio_data: Optional[str] = Field(None, description="Аудио данные в base64")
+    audio_id: Optional[str] = Field(None, description="Идентификатор ранее загруженного аудио (вместо audio_data)")
     reference_text: str = Field(..., description="Референсный текст для сравнения")
-    language: Optional[str] = Field(default="cs-CZ", description="Язык анализа")
+    language: Optional[str] = Field(default="cs-CZ", pattern=LANGUAGE_PATTERN, description="Язык анализа")
+    profile: AssessmentProfile = Field(
+        default=AssessmentProfile.STANDARD,
+        description="Профиль оценки: lite (быстрый, без просодии и miscue), standard, full (детализация до фонем)"
+    )
+    user_id: Optional[str] = Field(
+        None,
+        max_length=128,
+        description="Идентификатор пользователя для истории попыток (по умолчанию заголовок X-User-Id)"
+    )
+    
+    @model_validator(mode="after")
+    def check_audio_source(self) -> "PronunciationRequest":
+        """Должен быть указан ровно один источник аудио."""
+        if (self.audio_data is None) == (self.audio_id is None):
+            raise ValueError("Укажите либо audio_data, либо audio_id")
+        return self
+
+
+class AudioUploadRequest(BaseModel):
+    """Запрос на загрузку аудио для повторного использования."""
+    audio_data: str = Field(..., description="Аудио данные в base64")
+
+
+class AudioUploadResponse(BaseModel):
+    """Ответ загрузки аудио."""
+    status: str = Field(..., description="Статус обработки")
+    audio_id: str = Field(..., description="Идентификатор аудио для поля audio_id запросов анализа")
+    format: str = Field(..., description="Формат аудио")
+    size: int = Field(..., description="Размер декодированного аудио в байтах")
+    expires_in: int = Field(..., description="Срок хранения с момента последнего обращения в секундах")
 
 
 class Scores(BaseModel):
@@ -19,6 +61,7 @@ class Scores(BaseModel):
     accuracy_score: float = Field(..., description="Точность произношения (0-100)")
     fluency_score: float = Field(..., description="Беглость речи (0-100)")
     completeness_score: float = Field(..., description="Полнота произношения (0-100)")
+    prosody_score: Optional[float] = Field(None, description="Просодия (0-100), если оценивалась профилем")
 
 
 class WordAnalysis(BaseModel):
@@ -35,6 +78,7 @@ class PronunciationResponse(BaseModel):
     reference_text: str = Field(..., description="Референсный текст")
     scores: Scores = Field(..., description="Оценки произношения")
     words_analysis: List[WordAnalysis] = Field(..., description="Анализ слов")
+    result_id: Optional[str] = Field(None, description="Идентификатор результата для получения деталей (/azure/results/{result_id}/...)")
 
 
 class BatchPronunciationRequest(BaseModel):
@@ -52,6 +96,181 @@ class BatchPronunciationResponse(BaseModel):
     failed_count: int = Field(..., description="Количество неудачных")
 
 
+class BatchStreamItem(BaseModel):
+    """Строка потокового ответа пакетного анализа: результат одного элемента."""
+    type: str = Field(default="item", description="Тип строки (item)")
+    index: int = Field(..., description="Индекс элемента в исходном пакете")
+    status: str = Field(..., description="Статус обработки элемента (success/error)")
+    result: Optional[PronunciationResponse] = Field(None, description="Результат анализа")
+    error: Optional[str] = Field(None, description="Описание ошибки")
+    reference_text: Optional[str] = Field(None, description="Референсный текст неудачного элемента")
+
+
+class BatchStreamSummary(BaseModel):
+    """Итоговая строка потокового ответа пакетного анализа."""
+    type: str = Field(default="summary", description="Тип строки (summary)")
+    status: str = Field(..., description="Статус обработки")
+    total_processed: int = Field(..., description="Общее количество обработанных")
+    successful_count: int = Field(..., description="Количество успешных")
+    failed_count: int = Field(..., description="Количество неудачных")
+
+
+class PhonemeDetail(BaseModel):
+    """Оценка отдельной фонемы."""
+    phoneme: str = Field(..., description="Фонема")
+    accuracy_score: float = Field(..., description="Точность произношения фонемы")
+    offset: Optional[int] = Field(None, description="Смещение от начала аудио (в тиках по 100 нс)")
+    duration: Optional[int] = Field(None, description="Длительность (в тиках по 100 нс)")
+    nbest_phonemes: Optional[List[Dict[str, Any]]] = Field(None, description="Наиболее вероятные фактически произнесенные фонемы")
+
+
+class SyllableDetail(BaseModel):
+    """Оценка отдельного слога."""
+    syllable: str = Field(..., description="Слог")
+    grapheme: Optional[str] = Field(None, description="Написание слога")
+    accuracy_score: float = Field(..., description="Точность произношения слога")
+    offset: Optional[int] = Field(None, description="Смещение от начала аудио (в тиках по 100 нс)")
+    duration: Optional[int] = Field(None, description="Длительность (в тиках по 100 нс)")
+
+
+class WordProsody(BaseModel):
+    """Просодическая обратная связь по слову."""
+    word: str = Field(..., description="Слово")
+    break_error_types: List[str] = Field(default_factory=list, description="Ошибки пауз (UnexpectedBreak, MissingBreak)")
+    intonation_error_types: List[str] = Field(default_factory=list, description="Ошибки интонации (Monotone)")
+    feedback: Dict[str, Any] = Field(default_factory=dict, description="Исходная просодическая обратная связь Azure")
+
+
+class WordDetails(BaseModel):
+    """Детали по слову: фонемы и слоги."""
+    word: str = Field(..., description="Слово")
+    accuracy_score: float = Field(..., description="Точность произношения слова")
+    error_type: str = Field(..., description="Тип ошибки")
+    phonemes: List[PhonemeDetail] = Field(default_factory=list, description="Фонемы")
+    syllables: List[SyllableDetail] = Field(default_factory=list, description="Слоги")
+
+
+class PhonemeDetailsResponse(BaseModel):
+    """Детализация результата до фонем."""
+    result_id: str = Field(..., description="Идентификатор результата")
+    available: bool = Field(..., description="Есть ли данные фонем (анализ с детализацией Phoneme)")
+    words: List[WordDetails] = Field(..., description="Слова с фонемами")
+
+
+class SyllableDetailsResponse(BaseModel):
+    """Детализация результата до слогов."""
+    result_id: str = Field(..., description="Идентификатор результата")
+    available: bool = Field(..., description="Есть ли данные слогов (анализ с детализацией Phoneme)")
+    words: List[WordDetails] = Field(..., description="Слова со слогами")
+
+
+class ProsodyDetailsResponse(BaseModel):
+    """Просодическая оценка результата."""
+    result_id: str = Field(..., description="Идентификатор результата")
+    available: bool = Field(..., description="Есть ли данные просодии")
+    prosody_score: Optional[float] = Field(None, description="Общая оценка просодии (0-100)")
+    words: List[WordProsody] = Field(..., description="Просодическая обратная связь по словам")
+
+
+class RescoreRequest(BaseModel):
+    """Запрос на переоценку сохраненного результата по другим референсным текстам."""
+    reference_texts: List[str] = Field(..., min_length=1, max_length=100, description="Референсные тексты для сравнения")
+
+
+class RescoreResult(BaseModel):
+    """Переоценка по одному референсному тексту."""
+    reference_text: str = Field(..., description="Референсный текст")
+    scores: Scores = Field(..., description="Оценки произношения относительно текста")
+    words_analysis: List[WordAnalysis] = Field(..., description="Анализ слов относительно текста")
+
+
+class RescoreResponse(BaseModel):
+    """Ответ переоценки сохраненного результата."""
+    status: str = Field(..., description="Статус обработки")
+    result_id: str = Field(..., description="Идентификатор исходного результата")
+    recognized_text: str = Field(..., description="Распознанный текст")
+    best_reference_text: str = Field(..., description="Наиболее вероятно произнесенный текст")
+    results: List[RescoreResult] = Field(..., description="Результаты по каждому референсному тексту в порядке запроса")
+
+
+class DifficultyItem(BaseModel):
+    """Агрегаты сложности слова или фразы."""
+    language: str = Field(..., description="Язык")
+    item: str = Field(..., description="Слово (нормализованное) или референсный текст")
+    reference_text_hash: Optional[str] = Field(None, description="Хеш референсного текста (для фраз)")
+    count: int = Field(..., description="Количество оценок")
+    mean_accuracy: float = Field(..., description="Средняя точность (0-100)")
+    std_accuracy: float = Field(..., description="Стандартное отклонение точности")
+    error_rate: float = Field(..., description="Доля слов с ошибкой (0-1)")
+    error_counts: Dict[str, int] = Field(..., description="Количество ошибок по типам")
+
+
+class DifficultyResponse(BaseModel):
+    """Самые сложные слова или фразы."""
+    status: str = Field(..., description="Статус обработки")
+    order_by: str = Field(..., description="Критерий сложности: accuracy или error_rate")
+    total_keys: int = Field(..., description="Всего элементов в агрегатах")
+    items: List[DifficultyItem] = Field(..., description="Элементы по убыванию сложности")
+
+
+class ProgressAttempt(BaseModel):
+    """Попытка пользователя по фразе."""
+    id: int = Field(..., description="Идентификатор попытки")
+    timestamp: float = Field(..., description="Время оценки (Unix, секунды)")
+    language: str = Field(..., description="Язык")
+    profile: str = Field(..., description="Профиль оценки")
+    scores: Scores = Field(..., description="Оценки произношения")
+    result_id: Optional[str] = Field(None, description="Идентификатор сохраненного результата")
+    words_analysis: Optional[List[WordAnalysis]] = Field(None, description="Анализ слов (при include_words=true)")
+
+
+class ProgressAttemptsResponse(BaseModel):
+    """Страница попыток пользователя по фразе."""
+    status: str = Field(..., description="Статус обработки")
+    user_id: str = Field(..., description="Идентификатор пользователя")
+    reference_text_hash: str = Field(..., description="Хеш референсного текста")
+    items: List[ProgressAttempt] = Field(..., description="Попытки от новых к старым")
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (нет - страница последняя)")
+
+
+class ProgressTrendPoint(BaseModel):
+    """Оценки пользователя по фразе за период."""
+    period: str = Field(..., description="День (ГГГГ-ММ-ДД) или неделя (ГГГГ-Wнн)")
+    attempts: int = Field(..., description="Количество попыток")
+    mean_pronunciation_score: float = Field(..., description="Средняя общая оценка")
+    best_pronunciation_score: float = Field(..., description="Лучшая общая оценка")
+    mean_accuracy_score: float = Field(..., description="Средняя точность")
+    mean_fluency_score: float = Field(..., description="Средняя беглость")
+    mean_completeness_score: float = Field(..., description="Средняя полнота")
+
+
+class ProgressTrendResponse(BaseModel):
+    """Динамика оценок пользователя по фразе."""
+    status: str = Field(..., description="Статус обработки")
+    user_id: str = Field(..., description="Идентификатор пользователя")
+    reference_text_hash: str = Field(..., description="Хеш референсного текста")
+    bucket: str = Field(..., description="Период группировки: day или week")
+    points: List[ProgressTrendPoint] = Field(..., description="Периоды по возрастанию")
+
+
+class ProgressPhrase(BaseModel):
+    """Фраза, которую пользователь оценивал."""
+    reference_text_hash: str = Field(..., description="Хеш референсного текста")
+    reference_text: str = Field(..., description="Референсный текст")
+    language: str = Field(..., description="Язык последней попытки")
+    last_timestamp: float = Field(..., description="Время последней попытки (Unix, секунды)")
+    attempts: int = Field(..., description="Количество попыток")
+    best_pronunciation_score: float = Field(..., description="Лучшая общая оценка")
+    mean_pronunciation_score: float = Field(..., description="Средняя общая оценка")
+
+
+class ProgressPhrasesResponse(BaseModel):
+    """Фразы пользователя от недавних к давним."""
+    status: str = Field(..., description="Статус обработки")
+    user_id: str = Field(..., description="Идентификатор пользователя")
+    items: List[ProgressPhrase] = Field(..., description="Фразы")
+
+
 class ErrorResponse(BaseModel):
     """Ответ с ошибкой."""
     status: str = Field(default="error", description="Статус ошибки")
@@ -0,0 +1,87 @@
+"""
+Отложенная загрузка Azure Speech SDK и общие объекты SDK.
+
+azure.cognitiveservices.speech загружает большую нативную библиотеку, поэтому
+SDK не импортируется при импорте приложения: при запуске он загружается
+в фоне уже после начала приема соединений (см. warmup.py), а код, которому
+SDK нужен раньше, загружает его синхронно через get_speechsdk().
+
+SpeechConfig для каждого языка создается один раз: распознаватель копирует
+настройки при создании, поэтому конфигурация используется всеми запросами.
+"""
+
+import os
+import threading
+import time
+from types import ModuleType
+from typing import TYPE_CHECKING, Dict, Optional
+
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+if TYPE_CHECKING:
+    import azure.cognitiveservices.speech as speechsdk
+
+_sdk: Optional[ModuleType] = None
+_lock = threading.Lock()
+_speech_configs: Dict[str, "speechsdk.SpeechConfig"] = {}
+
+
+def get_speechsdk() -> ModuleType:
+    """Модуль azure.cognitiveservices.speech (загружается при первом обращении)."""
+    if _sdk is not None:
+        return _sdk
+    return _load()
+
+
+def _load() -> ModuleType:
+    """Импорт SDK с учетом времени загрузки в метриках."""
+    global _sdk
+    with _lock:
+        if _sdk is None:
+            started = time.perf_counter()
+            import azure.cognitiveservices.speech as speechsdk
+            get_metrics().set_gauge("startup_sdk_import_seconds", round(time.perf_counter() - started, 6))
+            _sdk = speechsdk
+    return _sdk
+
+
+def is_sdk_loaded() -> bool:
+    """Загружен ли SDK."""
+    return _sdk is not None
+
+
+def get_speech_config(language: str) -> "speechsdk.SpeechConfig":
+    """
+    SpeechConfig для языка распознавания (создается при первом обращении).
+    
+    Args:
+        language: Язык распознавания (например, cs-CZ)
+    
+    Returns:
+        SpeechConfig: Общая конфигурация; изменять ее после создания нельзя
+    """
+    speech_config = _speech_configs.get(language)
+    if speech_config is not None:
+        return speech_config
+
+    speechsdk = get_speechsdk()
+    config = get_azure_config()
+    with _lock:
+        speech_config = _speech_configs.get(language)
+        if speech_config is None:
+            speech_config = speechsdk.SpeechConfig(subscription=config.speech_key, region=config.speech_region)
+            speech_config.speech_recognition_language = language
+            _speech_configs[language] = speech_config
+    return speech_config
+
+
+def _reset_after_fork() -> None:
+    """Нативные объекты SDK нельзя использовать после fork: создаются заново в воркере."""
+    global _lock
+    _lock = threading.Lock()
+    _speech_configs.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -3,23 +3,39 @@ Azure Cognitive Services для анализа произношения.
 """
 
 import base64
-import json
 import os
+import random
 import tempfile
+import time
 import asyncio
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterable, AsyncIterator, Iterable, Tuple, Union
 from dataclasses import dataclass
 
-import httpx
-import azure.cognitiveservices.speech as speechsdk
+import numpy as np
+import orjson
 
 from .schemas import PronunciationRequest, PronunciationResponse, Scores, WordAnalysis
+from .recognition import recognize_once
+from .sdk import get_speechsdk, get_speech_config
+from .profiles import create_assessment_config
+from .deadline import Deadline
+from .scheduler import Priority, get_scheduler
+from .events import AssessmentCompleted, get_event_bus
+from .progress import get_current_user_id
+from .fingerprint import NearDuplicateIndex, NearDuplicateMatch, audio_fingerprint, get_near_duplicate_index
+from .storage import StoredAudio, StoredResult, get_audio_store, get_result_store
 from ...config import get_azure_config
+from ...metrics import get_metrics
+from ...rate_limit import get_current_tenant, record_audio_seconds
+from ...tracing import annotate, span
 # Настройка логирования
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Фоновые проверки совпадений почти одинаковых записей (ссылки до завершения)
+_audit_tasks = set()
+
 
 @dataclass
 class AzureRequestConfig:
@@ -40,6 +56,7 @@ class AzureResponse:
     fluency_score: float
     completeness_score: float
     words_analysis: list
+    prosody_score: Optional[float] = None
     raw_response: dict = None
 
 
@@ -52,6 +69,46 @@ class AudioInfo:
     error: str = None
 
 
+def _optional_float(value: Any) -> Optional[float]:
+    """Приведение необязательного числа из JSON к float."""
+    return None if value is None else float(value)
+
+
+def _audio_duration(json_result: Dict[str, Any]) -> Optional[float]:
+    """Длительность распознанного аудио в секундах (Offset + Duration в тиках по 100 нс)."""
+    ticks = json_result.get("Offset", 0) + json_result.get("Duration", 0)
+    if not ticks:
+        words = (json_result.get("NBest") or [{}])[0].get("Words") or []
+        ticks = max((word.get("Offset", 0) + word.get("Duration", 0) for word in words), default=0)
+    return ticks / 10_000_000 if ticks else None
+
+
+async def _iterate(items: Iterable) -> AsyncIterator:
+    """Асинхронный итератор по обычной коллекции."""
+    for item in items:
+        yield item
+
+
+async def _after_acquire(semaphore: asyncio.Semaphore, source: AsyncIterable) -> AsyncIterator:
+    """
+    Чтение элементов источника только после захвата слота семафора.
+    
+    Слот передается потребителю вместе с элементом и освобождается им.
+    """
+    iterator = source.__aiter__()
+    while True:
+        await semaphore.acquire()
+        try:
+            item = await iterator.__anext__()
+        except StopAsyncIteration:
+            semaphore.release()
+            return
+        except BaseException:
+            semaphore.release()
+            raise
+        yield item
+
+
 class AzureSpeechService:
     """Azure Speech Service для анализа произношения (SDK)."""
     
@@ -73,7 +130,12 @@ class AzureSpeechService:
             return ".wav"
     
     def _parse_sdk_json(self, json_result: Dict[str, Any], reference_text: str) -> AzureResponse:
-        """Парсинг JSON результата из SDK (SpeechServiceResponse_JsonResult)."""
+        """
+        Парсинг JSON результата из SDK (SpeechServiceResponse_JsonResult).
+        
+        Модели слов строятся через model_construct без повторной валидации:
+        данные получены от SDK и приводятся к нужным типам здесь.
+        """
         try:
             # Извлечение основных данных
             recognized_text = json_result.get('DisplayText', '').strip()
@@ -85,9 +147,9 @@ class AzureSpeechService:
             words = nb_result.get('Words', [])
             for word in words:
                 word_assessment = word.get('PronunciationAssessment', {})
-                word_analysis = WordAnalysis(
+                word_analysis = WordAnalysis.model_construct(
                     word=word.get('Word', ''),
-                    accuracy_score=word_assessment.get('AccuracyScore', 0.0),
+                    accuracy_score=float(word_assessment.get('AccuracyScore', 0.0)),
                     error_type=word_assessment.get('ErrorType', 'None')
                 )
                 words_analysis.append(word_analysis)
@@ -95,68 +157,149 @@ class AzureSpeechService:
             return AzureResponse(
                 recognized_text=recognized_text,
                 reference_text=reference_text,
-                pronunciation_score=pronunciation_assessment.get('PronScore', 0.0),
-                accuracy_score=pronunciation_assessment.get('AccuracyScore', 0.0),
-                fluency_score=pronunciation_assessment.get('FluencyScore', 0.0),
-                completeness_score=pronunciation_assessment.get('CompletenessScore', 0.0),
+                pronunciation_score=float(pronunciation_assessment.get('PronScore', 0.0)),
+                accuracy_score=float(pronunciation_assessment.get('AccuracyScore', 0.0)),
+                fluency_score=float(pronunciation_assessment.get('FluencyScore', 0.0)),
+                completeness_score=float(pronunciation_assessment.get('CompletenessScore', 0.0)),
                 words_analysis=words_analysis,
+                prosody_score=_optional_float(pronunciation_assessment.get('ProsodyScore')),
                 raw_response=json_result
             )
         except Exception as e:
             raise Exception(f"Ошибка парсинга ответа Azure SDK: {str(e)}")
     
-    async def analyze_pronunciation(self, request: PronunciationRequest) -> PronunciationResponse:
+    async def analyze_pronunciation(
+        self,
+        request: PronunciationRequest,
+        deadline: Optional[Deadline] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        audit: bool = False,
+        use_cache: bool = True
+    ) -> PronunciationResponse:
         """
         Анализ произношения через Azure Speech SDK.
         
+        Почти одинаковая запись того же клиента и пользователя с тем же
+        референсным текстом, языком и профилем (повтор перекодированной или
+        обрезанной записи) получает сохраненный результат без распознавания,
+        если включен AZURE_NEAR_DUPLICATE_ENABLED.
+        
         Args:
             request: Запрос на анализ произношения
+            deadline: Крайний срок обработки (по умолчанию AzureConfig.timeout от текущего момента)
+            priority: Класс приоритета в планировщике распознаваний
+            audit: Проверочное распознавание совпадения: без индекса записей и без публикации события
+            use_cache: Использовать индекс почти одинаковых записей (False — всегда распознавать)
         
         Returns:
             PronunciationResponse: Результат анализа
+        
+        Raises:
+            TimeoutError: Крайний срок истек; распознавание остановлено
         """
+        if deadline is None:
+            deadline = Deadline.after(self.config.timeout)
+        started = time.perf_counter()
+        
         try:
-            # Декодирование аудио данных
-            audio_bytes = base64.b64decode(request.audio_data)
-            ext = self._detect_audio_extension(audio_bytes)
+            logger.info(f"Подготовка анализа через Azure Speech SDK (профиль: {request.profile.value})")
+            language = request.language or self.config.default_language
+            annotate(language=language, profile=request.profile.value, reference_words=len(request.reference_text.split()))
+            near_duplicates = get_near_duplicate_index() if use_cache and not audit else None
+            user_id = request.user_id or get_current_user_id()
+            fingerprint = None
+            
+            if request.audio_id is not None:
+                # Ранее загруженное аудио: без декодирования, валидации и временного файла
+                # (проверка и продление срока хранения — файловые операции, вне цикла событий)
+                stored_audio = await asyncio.to_thread(get_audio_store().get, request.audio_id)
+                if stored_audio is None:
+                    raise LookupError(f"Аудио {request.audio_id} не найдено или срок хранения истек")
+                audio_path = str(stored_audio.path)
+                is_temporary = False
+                logger.info(f"Audio id: {request.audio_id}, size: {stored_audio.size} bytes")
+                annotate(audio_bytes=stored_audio.size, audio_format=stored_audio.format)
+            else:
+                # Декодирование аудио данных
+                deadline.check("decode")
+                with span("decode"):
+                    audio_bytes = base64.b64decode(request.audio_data)
+                ext = self._detect_audio_extension(audio_bytes)
+                logger.info(f"Audio size: {len(audio_bytes)} bytes, detected ext: {ext}")
+                annotate(audio_bytes=len(audio_bytes), audio_format=ext.lstrip("."))
+            
+            if near_duplicates is not None:
+                deadline.check("cache")
+                near_duplicate_key = near_duplicates.key(
+                    request.reference_text, language, request.profile.value, get_current_tenant(), user_id
+                )
+                with span("cache") as cache_span:
+                    # Отпечаток и сравнение с индексом — вычисления на numpy, вне цикла событий
+                    fingerprint, match = await asyncio.to_thread(
+                        self._find_near_duplicate,
+                        near_duplicates,
+                        near_duplicate_key,
+                        stored_audio if request.audio_id is not None else audio_bytes
+                    )
+                    if cache_span is not None:
+                        cache_span.attributes["cache.hit"] = match is not None
+                if match is not None:
+                    logger.info(f"Почти одинаковая запись (сходство {match.similarity:.3f}): сохраненный результат")
+                    self._maybe_audit(request, match, near_duplicates)
+                    # Попытка учитывается как новая: свой result_id, событие с текущим временем
+                    response = match.response.model_copy(
+                        update={"result_id": await self._copy_result(match.response.result_id)}
+                    )
+                    self._publish(response, language, request.profile.value, user_id)
+                    return response
+            
+            if request.audio_id is None:
+                # Записываем во временный файл, чтобы SDK корректно определил формат
+                with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
+                    tmp.write(audio_bytes)
+                    audio_path = tmp.name
+                is_temporary = True
             
             # Логирование для отладки
-            logger.info("Подготовка анализа через Azure Speech SDK")
-            logger.info(f"Audio size: {len(audio_bytes)} bytes, detected ext: {ext}")
             logger.info(f"Reference text: '{request.reference_text}'")
             logger.info(f"Language: {request.language or self.config.default_language}")
             
-            # Записываем во временный файл, чтобы SDK корректно определил формат
-            with tempfile.NamedTemporaryFile(delete=False, suffix=ext) as tmp:
-                tmp.write(audio_bytes)
-                tmp_path = tmp.name
-            
             try:
                 # Настройка SDK
-                speech_config = speechsdk.SpeechConfig(
-                    subscription=self.config.speech_key,
-                    region=self.config.speech_region
-                )
-                speech_config.speech_recognition_language = request.language or self.config.default_language
+                deadline.check("sdk_setup")
+                with span("sdk_setup"):
+                    speechsdk = get_speechsdk()
+                    speech_config = get_speech_config(language)
+                    
+                    audio_config = speechsdk.audio.AudioConfig(filename=audio_path)
+                    
+                    pronunciation_config = create_assessment_config(request.profile, request.reference_text, language)
                 
-                audio_config = speechsdk.audio.AudioConfig(filename=tmp_path)
-                
-                pronunciation_config = speechsdk.PronunciationAssessmentConfig(
-                    reference_text=request.reference_text,
-                    grading_system=speechsdk.PronunciationAssessmentGradingSystem.HundredMark,
-                    granularity=speechsdk.PronunciationAssessmentGranularity.Word,
-                    enable_miscue=True
-                )
-                pronunciation_config.enable_prosody_assessment()
+                def create_recognizer() -> "speechsdk.SpeechRecognizer":
+                    speech_recognizer = speechsdk.SpeechRecognizer(
+                        speech_config=speech_config,
+                        audio_config=audio_config
+                    )
+                    pronunciation_config.apply_to(speech_recognizer)
+                    return speech_recognizer
                 
-                speech_recognizer = speechsdk.SpeechRecognizer(
-                    speech_config=speech_config,
-                    audio_config=audio_config
-                )
-                pronunciation_config.apply_to(speech_recognizer)
+                # Слот распознавания выдается планировщиком по классу приоритета
+                scheduler = get_scheduler()
+                deadline.check("scheduler_queue")
+                try:
+                    with span("queue", priority=priority.value):
+                        await scheduler.acquire(priority, timeout=deadline.remaining(), tenant=get_current_tenant())
+                except TimeoutError:
+                    raise deadline.exceeded("scheduler_queue")
                 
-                # Выполняем распознавание в пуле потоков, т.к. метод синхронный
-                result = await asyncio.to_thread(speech_recognizer.recognize_once)
+                # Неблокирующее распознавание: результат приходит через события SDK
+                try:
+                    with span("recognition", language=language, profile=request.profile.value):
+                        result = await recognize_once(create_recognizer, timeout=deadline.remaining())
+                except TimeoutError:
+                    raise deadline.exceeded("recognition")
+                finally:
+                    scheduler.release(priority)
                 
                 if result.reason == speechsdk.ResultReason.RecognizedSpeech:
                     json_str = result.properties.get(
@@ -164,8 +307,17 @@ class AzureSpeechService:
                     )
                     if not json_str:
                         raise Exception("JSON результат от Azure SDK недоступен")
-                    parsed = json.loads(json_str)
-                    azure_response = self._parse_sdk_json(parsed, request.reference_text)
+                    with span("parse"):
+                        parsed = orjson.loads(json_str)
+                        azure_response = self._parse_sdk_json(parsed, request.reference_text)
+                    # Лимит аудио клиента учитывает фактическую длительность, а не оценку по размеру тела
+                    # (фоновая проверка совпадения — не работа клиента)
+                    duration = None if audit else _audio_duration(parsed)
+                    if duration is not None:
+                        record_audio_seconds(duration)
+                    # Исходный JSON сохраняется для получения деталей без повторного распознавания
+                    with span("store"):
+                        result_id = await self._store_result(json_str, request.profile.value)
                 elif result.reason == speechsdk.ResultReason.NoMatch:
                     raise Exception("Речь не распознана (NoMatch)")
                 elif result.reason == speechsdk.ResultReason.Canceled:
@@ -177,34 +329,236 @@ class AzureSpeechService:
             
             finally:
                 # Удаляем временный файл
-                try:
-                    os.unlink(tmp_path)
-                except Exception:
-                    pass
+                if is_temporary:
+                    try:
+                        os.unlink(audio_path)
+                    except Exception:
+                        pass
             
-            # Формируем ответ
-            scores = Scores(
+            # Формируем ответ (данные уже приведены к типам схемы, повторная валидация не нужна)
+            scores = Scores.model_construct(
                 pronunciation_score=azure_response.pronunciation_score,
                 accuracy_score=azure_response.accuracy_score,
                 fluency_score=azure_response.fluency_score,
-                completeness_score=azure_response.completeness_score
+                completeness_score=azure_response.completeness_score,
+                prosody_score=azure_response.prosody_score
             )
             
-            return PronunciationResponse(
+            get_metrics().observe(
+                "azure_assessment_duration_seconds",
+                time.perf_counter() - started,
+                profile=request.profile.value
+            )
+            
+            response = PronunciationResponse.model_construct(
                 status='success',
                 recognized_text=azure_response.recognized_text,
                 reference_text=azure_response.reference_text,
                 scores=scores,
-                words_analysis=azure_response.words_analysis
+                words_analysis=azure_response.words_analysis,
+                result_id=result_id
             )
+            if audit:
+                return response
+            if fingerprint is not None:
+                near_duplicates.add(near_duplicate_key, fingerprint, response)
+            self._publish(response, language, request.profile.value, user_id)
+            return response
+        except (TimeoutError, LookupError):
+            raise
         except Exception as e:
             raise Exception(f"Ошибка анализа произношения через SDK: {str(e)}")
     
+    @staticmethod
+    def _publish(response: PronunciationResponse, language: str, profile: str, user_id: Optional[str]) -> None:
+        """Публикация завершенной оценки; подписчики (аналитика и т.п.) только буферизуют событие."""
+        get_event_bus().publish(AssessmentCompleted(
+            response=response,
+            language=language,
+            profile=profile,
+            tenant=get_current_tenant(),
+            user_id=user_id
+        ))
+    
+    @staticmethod
+    def _stored_fingerprint(stored_audio: StoredAudio) -> Optional[np.ndarray]:
+        """Отпечаток сохраненного аудио по отображению файла в память."""
+        with get_audio_store().open_mapped(stored_audio) as audio:
+            return audio_fingerprint(audio) if audio is not None else None
+    
+    @classmethod
+    def _find_near_duplicate(
+        cls,
+        index: NearDuplicateIndex,
+        key: tuple,
+        audio: Union[bytes, StoredAudio]
+    ) -> Tuple[Optional[np.ndarray], Optional[NearDuplicateMatch]]:
+        """Отпечаток записи и поиск почти одинаковой в индексе (выполняется в пуле потоков)."""
+        if isinstance(audio, StoredAudio):
+            fingerprint = cls._stored_fingerprint(audio)
+        else:
+            fingerprint = audio_fingerprint(audio)
+        if fingerprint is None:
+            return None, None
+        return fingerprint, index.lookup(key, fingerprint)
+    
+    async def _copy_result(self, result_id: Optional[str]) -> Optional[str]:
+        """Копия исходного результата для повторной записи (ошибка не мешает ответу)."""
+        if result_id is None:
+            return None
+        try:
+            return await asyncio.to_thread(get_result_store().copy, result_id)
+        except Exception as e:
+            logger.error(f"Ошибка копирования результата Azure: {str(e)}")
+            return None
+    
+    def _maybe_audit(
+        self,
+        request: PronunciationRequest,
+        match: NearDuplicateMatch,
+        index: NearDuplicateIndex
+    ) -> None:
+        """Выборочная фоновая проверка совпадения повторным распознаванием."""
+        if random.random() >= self.config.near_duplicate_audit_rate:
+            return
+        
+        async def audit() -> None:
+            try:
+                fresh = await self.analyze_pronunciation(request, priority=Priority.BACKGROUND, audit=True)
+            except Exception as e:
+                get_metrics().increment("near_duplicate_audits_total", outcome="error")
+                logger.warning(f"Проверка совпадения записи не выполнена: {str(e)}")
+                return
+            index.record_audit(match, fresh, self.config.near_duplicate_audit_tolerance)
+        
+        task = asyncio.create_task(audit())
+        _audit_tasks.add(task)
+        task.add_done_callback(_audit_tasks.discard)
+    
+    async def _store_result(self, json_str: str, profile: str) -> Optional[str]:
+        """
+        Сохранение исходного JSON результата Azure.
+        
+        Ошибка сохранения не должна приводить к потере уже полученной оценки,
+        поэтому в этом случае возвращается None.
+        """
+        try:
+            # Сжатие и запись файла выполняются вне цикла событий
+            return await asyncio.to_thread(get_result_store().put, json_str, profile)
+        except Exception as e:
+            logger.error(f"Ошибка сохранения результата Azure: {str(e)}")
+            return None
+    
+    async def get_result_details(self, result_id: str) -> Optional[StoredResult]:
+        """
+        Получение исходного JSON результата Azure по идентификатору.
+        
+        Returns:
+            Optional[StoredResult]: JSON результата с профилем оценки или None, если не найден или срок истек
+        """
+        return await asyncio.to_thread(get_result_store().get, result_id)
+    
+    async def store_audio(self, audio_bytes: bytes) -> StoredAudio:
+        """
+        Сохранение декодированного аудио для повторного использования по audio_id.
+        
+        Args:
+            audio_bytes: Декодированные и провалидированные аудио данные
+        
+        Returns:
+            StoredAudio: Информация о сохраненном аудио
+        """
+        ext = self._detect_audio_extension(audio_bytes)
+        # Хеширование и запись файла выполняются вне цикла событий
+        return await asyncio.to_thread(get_audio_store().put, audio_bytes, ext)
+    
+    async def analyze_batch_as_completed(
+        self,
+        requests: Union[Iterable[PronunciationRequest], AsyncIterable[Union[PronunciationRequest, Exception]]],
+        deadline: Deadline,
+        concurrency: Optional[int] = None,
+        use_cache: bool = True
+    ) -> AsyncIterator[Tuple[int, Optional[str], Union[PronunciationResponse, Exception]]]:
+        """
+        Конкурентный анализ пакета с выдачей результатов по мере готовности.
+        
+        Следующий элемент берется из источника только при наличии свободного
+        слота, поэтому для потокового источника в памяти одновременно находится
+        не больше concurrency элементов независимо от размера пакета.
+        
+        Args:
+            requests: Элементы пакета — список или асинхронный источник; исключение
+                в источнике означает ошибку разбора соответствующего элемента
+            deadline: Общий крайний срок пакета; каждый элемент получает бюджет не более AzureConfig.timeout
+            concurrency: Количество одновременно обрабатываемых элементов (по умолчанию AzureConfig.batch_concurrency)
+            use_cache: Использовать индекс почти одинаковых записей
+        
+        Yields:
+            Tuple[int, Optional[str], Union[PronunciationResponse, Exception]]:
+                Индекс элемента, референсный текст и результат или ошибка
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.config.batch_concurrency)
+        completed: asyncio.Queue = asyncio.Queue()
+        tasks = set()
+        
+        async def run(index: int, request: PronunciationRequest) -> None:
+            try:
+                deadline.check("batch_queue")
+                item_deadline = deadline.budget(self.config.timeout)
+                with span("item", index=index):
+                    outcome = await self.analyze_pronunciation(
+                        request, deadline=item_deadline, priority=Priority.BATCH, use_cache=use_cache
+                    )
+            except Exception as e:
+                logger.error(f"Ошибка в запросе {index}: {str(e)}")
+                outcome = e
+            finally:
+                semaphore.release()
+            completed.put_nowait((index, request.reference_text, outcome))
+        
+        async def feed() -> None:
+            try:
+                source = requests if hasattr(requests, "__aiter__") else _iterate(requests)
+                index = 0
+                async for item in _after_acquire(semaphore, source):
+                    if isinstance(item, Exception):
+                        semaphore.release()
+                        completed.put_nowait((index, None, item))
+                    else:
+                        task = asyncio.create_task(run(index, item))
+                        tasks.add(task)
+                        task.add_done_callback(tasks.discard)
+                    index += 1
+                if tasks:
+                    await asyncio.wait(set(tasks))
+                completed.put_nowait(None)
+            except Exception as e:
+                # Ошибка источника (например, клиент отключился) прерывает весь пакет
+                completed.put_nowait(e)
+        
+        feeder = asyncio.create_task(feed())
+        try:
+            while True:
+                entry = await completed.get()
+                if entry is None:
+                    break
+                if isinstance(entry, Exception):
+                    raise entry
+                yield entry
+        finally:
+            # Клиент отключился или генератор закрыт: останавливаем незавершенные распознавания
+            feeder.cancel()
+            for task in list(tasks):
+                task.cancel()
+    
     async def check_connection(self) -> bool:
         """Проверка базовой готовности Azure Speech SDK и сетевого доступа."""
         try:
+            # httpx нужен только здесь: не загружаем его при старте приложения
+            import httpx
+            
             # Проверяем возможность создать конфигурацию и выполнить простой HEAD до STT endpoint
-            _ = speechsdk.SpeechConfig(
+            _ = get_speechsdk().SpeechConfig(
                 subscription=self.config.speech_key,
                 region=self.config.speech_region
             )
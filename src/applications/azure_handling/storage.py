@@ -0,0 +1,339 @@
+"""
+Локальные файловые хранилища с вытеснением по TTL.
+
+AudioStore хранит декодированное аудио, адресуемое по содержимому (SHA-256),
+чтобы одну запись можно было многократно оценивать по разным референсным
+текстам без повторной загрузки, декодирования и валидации. Содержимое читается
+через отображение файла в память (open_mapped), а не копируется в кучу.
+
+ResultStore хранит сжатый исходный JSON результата Azure, чтобы детали
+(фонемы, слоги, просодия) можно было получить без повторного распознавания.
+"""
+
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, Optional
+
+import orjson
+
+from ...config import get_azure_config
+from ...metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class LocalTTLStore:
+    """
+    Базовое локальное хранилище файлов с вытеснением по TTL.
+
+    Время последнего доступа хранится в mtime файла: чтение продлевает срок
+    хранения, а просроченные файлы удаляются периодической очисткой.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: int, sweep_interval: float = 60.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def _is_expired(self, path: Path, now: Optional[float] = None) -> bool:
+        """Проверка истечения срока хранения файла."""
+        try:
+            return path.stat().st_mtime + self.ttl_seconds < (now or time.time())
+        except FileNotFoundError:
+            return True
+
+    def _touch(self, path: Path) -> bool:
+        """Продление срока хранения файла; False если файл уже удален."""
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """Атомарная запись файла через временный файл в том же каталоге."""
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def sweep(self) -> int:
+        """
+        Удаление просроченных файлов.
+
+        Returns:
+            int: Количество удаленных файлов
+        """
+        now = time.time()
+        removed = 0
+        for path in self.directory.iterdir():
+            if path.name.startswith(".tmp-") or not path.is_file():
+                continue
+            if self._is_expired(path, now):
+                try:
+                    path.unlink()
+                    removed += 1
+                except FileNotFoundError:
+                    pass
+        self._last_sweep = now
+        return removed
+
+    def maybe_sweep(self) -> None:
+        """Очистка, если с предыдущей прошло больше sweep_interval секунд."""
+        if time.time() - self._last_sweep < self.sweep_interval:
+            return
+        with self._lock:
+            if time.time() - self._last_sweep < self.sweep_interval:
+                return
+            removed = self.sweep()
+        if removed:
+            logger.info(f"{type(self).__name__}: удалено просроченных файлов: {removed}")
+
+
+@dataclass
+class StoredAudio:
+    """Аудио в локальном хранилище."""
+    audio_id: str
+    path: Path
+    size: int
+    format: str
+
+
+class AudioStore(LocalTTLStore):
+    """Хранилище декодированного аудио, адресуемого по содержимому."""
+
+    EXTENSIONS = (".wav", ".mp3")
+
+    @staticmethod
+    def compute_id(audio_bytes: bytes) -> str:
+        """Идентификатор аудио: SHA-256 содержимого."""
+        return hashlib.sha256(audio_bytes).hexdigest()
+
+    @staticmethod
+    def is_valid_id(audio_id: str) -> bool:
+        """Проверка формата идентификатора (защита от обхода путей)."""
+        return len(audio_id) == 64 and all(c in "0123456789abcdef" for c in audio_id)
+
+    def put(self, audio_bytes: bytes, extension: str) -> StoredAudio:
+        """
+        Сохранение аудио. Повторная загрузка того же содержимого только продлевает срок хранения.
+
+        Args:
+            audio_bytes: Декодированные аудио данные
+            extension: Расширение файла (.wav/.mp3), по которому SDK определяет формат
+
+        Returns:
+            StoredAudio: Информация о сохраненном аудио
+        """
+        self.maybe_sweep()
+        audio_id = self.compute_id(audio_bytes)
+        path = self.directory / f"{audio_id}{extension}"
+
+        if self._touch(path):
+            get_metrics().increment("audio_store_uploads_total", result="deduplicated")
+        else:
+            self._write_atomic(path, audio_bytes)
+            get_metrics().increment("audio_store_uploads_total", result="stored")
+
+        return StoredAudio(
+            audio_id=audio_id,
+            path=path,
+            size=len(audio_bytes),
+            format=extension.lstrip(".").upper()
+        )
+
+    def get(self, audio_id: str) -> Optional[StoredAudio]:
+        """
+        Получение аудио по идентификатору с продлением срока хранения.
+
+        Returns:
+            Optional[StoredAudio]: Аудио или None, если не найдено или срок истек
+        """
+        if not self.is_valid_id(audio_id):
+            return None
+
+        for extension in self.EXTENSIONS:
+            path = self.directory / f"{audio_id}{extension}"
+            if self._is_expired(path):
+                continue
+            if self._touch(path):
+                get_metrics().increment("audio_store_lookups_total", result="hit")
+                return StoredAudio(
+                    audio_id=audio_id,
+                    path=path,
+                    size=path.stat().st_size,
+                    format=extension.lstrip(".").upper()
+                )
+
+        get_metrics().increment("audio_store_lookups_total", result="miss")
+        return None
+
+    @contextmanager
+    def open_mapped(self, stored: StoredAudio) -> Iterator[Optional[memoryview]]:
+        """
+        Отображение аудио в память без копирования в кучу процесса.
+
+        SDK читает сохраненное аудио сам по пути файла; отображение используется
+        там, где содержимое разбирается в Python (акустический отпечаток).
+
+        Yields:
+            Optional[memoryview]: Содержимое файла или None, если файл удален или пуст
+        """
+        try:
+            f = open(stored.path, "rb")
+        except FileNotFoundError:
+            yield None
+            return
+
+        with f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield None
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    yield view
+                finally:
+                    view.release()
+
+
+@dataclass
+class StoredResult:
+    """Исходный результат Azure с профилем оценки, которым он получен."""
+    raw: dict
+    profile: Optional[str] = None
+
+
+class ResultStore(LocalTTLStore):
+    """
+    Хранилище исходных JSON результатов Azure в сжатом виде.
+
+    Результат хранится вместе с профилем оценки: от профиля зависит, что
+    означает массив Words (без miscue в нем референсные, а не произнесенные слова).
+    """
+
+    SUFFIX = ".json.z"
+
+    @staticmethod
+    def is_valid_id(result_id: str) -> bool:
+        """Проверка формата идентификатора результата (uuid4 hex)."""
+        return len(result_id) == 32 and all(c in "0123456789abcdef" for c in result_id)
+
+    def put(self, raw_json: str, profile: Optional[str] = None) -> str:
+        """
+        Сохранение исходного JSON результата.
+
+        Args:
+            raw_json: JSON результата SDK (SpeechServiceResponse_JsonResult)
+            profile: Профиль оценки, которым получен результат
+
+        Returns:
+            str: Идентификатор результата
+        """
+        self.maybe_sweep()
+        result_id = uuid.uuid4().hex
+        # Конверт собирается без повторного разбора исходного JSON
+        payload = b'{"profile":' + orjson.dumps(profile) + b',"result":' + raw_json.encode("utf-8") + b"}"
+        compressed = zlib.compress(payload, 6)
+        self._write_atomic(self.directory / f"{result_id}{self.SUFFIX}", compressed)
+
+        metrics = get_metrics()
+        metrics.increment("result_store_raw_bytes_total", len(payload))
+        metrics.increment("result_store_stored_bytes_total", len(compressed))
+        return result_id
+
+    def copy(self, result_id: str) -> Optional[str]:
+        """
+        Копия сохраненного результата под новым идентификатором (без распаковки).
+
+        Returns:
+            Optional[str]: Идентификатор копии или None, если результат не найден
+        """
+        if not self.is_valid_id(result_id):
+            return None
+        path = self.directory / f"{result_id}{self.SUFFIX}"
+        if self._is_expired(path):
+            return None
+        try:
+            compressed = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        copy_id = uuid.uuid4().hex
+        self._write_atomic(self.directory / f"{copy_id}{self.SUFFIX}", compressed)
+        return copy_id
+
+    def get(self, result_id: str) -> Optional[StoredResult]:
+        """
+        Получение исходного JSON результата.
+
+        Returns:
+            Optional[StoredResult]: Результат или None, если не найден или срок истек
+        """
+        if not self.is_valid_id(result_id):
+            return None
+
+        path = self.directory / f"{result_id}{self.SUFFIX}"
+        if self._is_expired(path):
+            return None
+        try:
+            compressed = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        stored = orjson.loads(zlib.decompress(compressed))
+        if "result" not in stored:
+            # Результат, сохраненный без профиля
+            return StoredResult(raw=stored)
+        return StoredResult(raw=stored["result"], profile=stored["profile"])
+
+
+_audio_store: Optional[AudioStore] = None
+_result_store: Optional[ResultStore] = None
+
+
+def _reset_after_fork() -> None:
+    """Хранилища (и их блокировки) создаются заново в каждом процессе-воркере."""
+    global _audio_store, _result_store
+    _audio_store = None
+    _result_store = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_audio_store() -> AudioStore:
+    """Получить хранилище аудио (создается при первом обращении)."""
+    global _audio_store
+    if _audio_store is None:
+        config = get_azure_config()
+        _audio_store = AudioStore(config.audio_store_dir, config.audio_store_ttl)
+    return _audio_store
+
+
+def get_result_store() -> ResultStore:
+    """Получить хранилище результатов (создается при первом обращении)."""
+    global _result_store
+    if _result_store is None:
+        config = get_azure_config()
+        _result_store = ResultStore(config.result_store_dir, config.result_store_ttl)
+    return _result_store
@@ -0,0 +1,53 @@
+"""
+Нормализация референсных текстов.
+
+Единые правила используются для ключей кеша конфигураций оценки и для
+сравнения слов при локальной переоценке результатов, чтобы варианты одной
+фразы (лишние пробелы, разные формы Unicode, типографская пунктуация)
+считались одним текстом.
+"""
+
+import hashlib
+import re
+import unicodedata
+
+# Типографская пунктуация, заменяемая на ASCII-аналоги
+_PUNCTUATION_MAP = str.maketrans({
+    "‘": "'", "’": "'", "‚": "'", "‛": "'",
+    "“": '"', "”": '"', "„": '"', "«": '"', "»": '"',
+    "‐": "-", "‑": "-", "‒": "-", "–": "-", "—": "-",
+    "…": "...", " ": " ",
+})
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_reference_text(text: str) -> str:
+    """
+    Нормализация референсного текста: Unicode NFC, типографская пунктуация, пробелы.
+    
+    Регистр и сама пунктуация сохраняются: текст в таком виде передается в Azure.
+    """
+    text = unicodedata.normalize("NFC", text).translate(_PUNCTUATION_MAP)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def strip_punctuation(word: str) -> str:
+    """Удаление пунктуации по краям слова (как в словах результата Azure)."""
+    start, end = 0, len(word)
+    while start < end and unicodedata.category(word[start]).startswith("P"):
+        start += 1
+    while end > start and unicodedata.category(word[end - 1]).startswith("P"):
+        end -= 1
+    return word[start:end]
+
+
+def normalize_word(word: str) -> str:
+    """Нормализация слова для сравнения: Unicode NFC, регистр, без пунктуации."""
+    word = unicodedata.normalize("NFC", word).casefold()
+    return "".join(c for c in word if not unicodedata.category(c).startswith("P"))
+
+
+def reference_text_hash(text: str) -> str:
+    """Стабильный ключ референсного текста для аналитики и истории (без учета регистра)."""
+    return hashlib.sha1(normalize_reference_text(text).casefold().encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,235 @@
+"""
+Прогрев движка распознавания при запуске.
+
+Первый анализ после развертывания или масштабирования платит за загрузку
+нативной библиотеки SDK, создание потоков, DNS и TLS до
+{region}.stt.speech.microsoft.com и первый проход по коду. Прогрев выполняет
+все это заранее, в фоне после начала приема соединений:
+
+1. создает потоки пула, в котором освобождаются распознаватели;
+2. загружает SDK и заполняет кеш конфигураций оценки;
+3. создает SpeechConfig для языков прогрева;
+4. открывает и сразу закрывает соединение с сервисом (Connection.open) для
+   каждого языка (AZURE_WARMUP_NETWORK);
+5. анализирует сгенерированный тихий WAV, проходя весь путь запроса
+   (AZURE_WARMUP_RECOGNITION, по умолчанию выключено: это тарифицируемое
+   распознавание при каждом запуске и перезапуске воркера).
+
+Соединение шага 4 не переиспользуется: каждый запрос создает собственный
+распознаватель со своим соединением. Шаг прогревает только то, что общее для
+процесса: разрешение имени в DNS и инициализацию сетевого стека нативной
+библиотеки SDK (TLS, загрузка корневых сертификатов).
+
+Готовность (/api/v1/ready) наступает после завершения прогрева. Ошибки
+шагов 4-5 (например, нет сети) только логируются: прогрев ускоряет первый
+запрос, но не является условием работы сервиса.
+"""
+
+import asyncio
+import base64
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .profiles import warm_up_config_cache
+from .recognition import _dispose_recognizer, _set_result
+from .deadline import Deadline
+from .scheduler import Priority
+from .schemas import AssessmentProfile, PronunciationRequest
+from .sdk import get_speechsdk, get_speech_config
+from ...config import get_azure_config
+from ...metrics import get_metrics
+from ...startup import StartupTracker
+
+logger = logging.getLogger(__name__)
+
+WARMUP_REFERENCE_TEXT = "warm up"
+
+
+def silent_wav(duration: float = 0.5, sample_rate: int = 16000) -> bytes:
+    """WAV (PCM 16 бит, моно) с тишиной заданной длительности."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * int(duration * sample_rate))
+    return buffer.getvalue()
+
+
+def warmup_languages() -> List[str]:
+    """Языки прогрева: AZURE_WARMUP_LANGUAGES или язык по умолчанию."""
+    config = get_azure_config()
+    languages = [language.strip() for language in config.warmup_languages.split(",") if language.strip()]
+    return languages or [config.default_language]
+
+
+async def _timed(step: str, coroutine) -> None:
+    """Выполнение шага прогрева с учетом времени; ошибка шага не прерывает прогрев."""
+    started = time.perf_counter()
+    try:
+        await coroutine
+        result = "success"
+    except Exception as e:
+        result = "error"
+        logger.warning(f"Прогрев: шаг {step} завершился ошибкой: {str(e) or type(e).__name__}")
+    elapsed = time.perf_counter() - started
+    metrics = get_metrics()
+    metrics.set_gauge("warmup_step_seconds", round(elapsed, 6), step=step)
+    metrics.increment("warmup_steps_total", step=step, result=result)
+    logger.info(f"Прогрев: {step} за {elapsed:.3f} с ({result})")
+
+
+async def warm_executor_threads(count: int) -> None:
+    """
+    Создание потоков пула заранее.
+    
+    Задачи ждут друг друга на барьере, поэтому каждая занимает отдельный поток.
+    """
+    if count <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    barrier = threading.Barrier(count)
+    await asyncio.gather(*(loop.run_in_executor(None, barrier.wait, 10) for _ in range(count)))
+
+
+async def prime_network(language: str, audio_path: str, timeout: float) -> None:
+    """
+    Пробное соединение с сервисом распознавания для языка.
+    
+    Соединение закрывается сразу: распознаватели запросов открывают свои, а
+    прогреваются DNS и сетевой стек SDK. Аудио не отправляется.
+    """
+    speechsdk = get_speechsdk()
+    loop = asyncio.get_running_loop()
+    opened = loop.create_future()
+
+    def finish(error: Optional[str]) -> None:
+        # Вызывается в нативном потоке SDK
+        loop.call_soon_threadsafe(_set_result, opened, error)
+
+    recognizer = speechsdk.SpeechRecognizer(
+        speech_config=get_speech_config(language),
+        audio_config=speechsdk.audio.AudioConfig(filename=audio_path)
+    )
+    connection = speechsdk.Connection.from_recognizer(recognizer)
+    connection.connected.connect(lambda evt: finish(None))
+    connection.disconnected.connect(lambda evt: finish("соединение закрыто сервисом"))
+    recognizer.canceled.connect(lambda evt: finish(f"отменено: {evt.cancellation_details.error_details}"))
+    try:
+        connection.open(True)
+        try:
+            error = await asyncio.wait_for(opened, timeout)
+        except asyncio.TimeoutError:
+            error = f"соединение не открыто за {timeout} с"
+        if error is not None:
+            raise ConnectionError(error)
+    finally:
+        connection.connected.disconnect_all()
+        connection.disconnected.disconnect_all()
+        recognizer.canceled.disconnect_all()
+        connection.close()
+        del connection
+        # Освобождение нативного распознавателя блокирующее — в пуле потоков
+        holder = [recognizer]
+        del recognizer
+        loop.run_in_executor(None, _dispose_recognizer, holder)
+
+
+async def analyze_silence(service, language: str, audio_data: str, timeout: float) -> None:
+    """Анализ тихой записи: прогрев всего пути запроса (декодирование, SDK, разбор)."""
+    request = PronunciationRequest(
+        audio_data=audio_data,
+        reference_text=WARMUP_REFERENCE_TEXT,
+        language=language,
+        profile=AssessmentProfile.LITE
+    )
+    try:
+        await service.analyze_pronunciation(
+            request, deadline=Deadline.after(timeout), priority=Priority.BACKGROUND
+        )
+    except Exception as e:
+        # Для тишины ожидаем NoMatch: важен проход по коду, а не результат
+        logger.debug(f"Прогрев анализа ({language}): {str(e)}")
+
+
+def install_executor() -> None:
+    """
+    Установка пула потоков цикла событий по умолчанию.
+
+    Вызывается синхронно в начале обработчика запуска, до любого
+    asyncio.to_thread / run_in_executor(None, ...): иначе цикл успеет создать
+    собственный пул, и его потоки останутся после замены.
+    """
+    config = get_azure_config()
+    # Пул потоков для освобождения распознавателей и блокирующих операций
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(
+        max_workers=config.executor_workers,
+        thread_name_prefix="azure-worker"
+    ))
+
+
+async def prepare_engine(service, startup: StartupTracker) -> None:
+    """
+    Загрузка и прогрев движка распознавания; по завершении приложение готово.
+
+    Пул потоков по умолчанию к этому моменту установлен install_executor().
+    
+    Args:
+        service: Экземпляр AzureSpeechService
+        startup: Состояние запуска, в котором отмечается компонент engine
+    """
+    config = get_azure_config()
+    loop = asyncio.get_running_loop()
+
+    try:
+        await _timed("executor_threads", warm_executor_threads(min(config.warmup_threads, config.executor_workers)))
+        await loop.run_in_executor(None, get_speechsdk)
+        await _timed("config_cache", loop.run_in_executor(None, warm_up_config_cache))
+    except Exception as e:
+        logger.error(f"Ошибка загрузки Azure Speech SDK: {str(e)}")
+        startup.complete("engine", error=str(e))
+        return
+
+    if config.warmup_enabled:
+        started = time.perf_counter()
+        languages = warmup_languages()
+        await _timed("speech_configs", loop.run_in_executor(None, lambda: [get_speech_config(l) for l in languages]))
+
+        if config.warmup_network or config.warmup_recognition:
+            audio_bytes = silent_wav()
+            audio_data = base64.b64encode(audio_bytes).decode()
+            audio_path = await loop.run_in_executor(None, _write_temp_wav, audio_bytes)
+            try:
+                for language in languages:
+                    if config.warmup_network:
+                        await _timed(f"network_{language}", prime_network(language, audio_path, config.warmup_timeout))
+                    if config.warmup_recognition:
+                        await _timed(f"recognition_{language}", analyze_silence(service, language, audio_data, config.warmup_timeout))
+            finally:
+                await loop.run_in_executor(None, _remove_file, audio_path)
+
+        logger.info(f"Прогрев завершен за {time.perf_counter() - started:.3f} с")
+
+    startup.complete("engine")
+
+
+def _write_temp_wav(audio_bytes: bytes) -> str:
+    """Запись WAV во временный файл (SDK читает аудио из файла)."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
+        tmp.write(audio_bytes)
+        return tmp.name
+
+
+def _remove_file(path: str) -> None:
+    """Удаление временного файла."""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
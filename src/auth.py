@@ -0,0 +1,32 @@
+"""
+Проверка служебных токенов эндпоинтов.
+
+Эндпоинты, раскрывающие данные других клиентов (отчеты о медленных
+запросах, история попыток пользователей), доступны только по токену из
+конфигурации. Если токен не задан, эндпоинт отключен (404).
+"""
+
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from .config import get_app_config
+
+
+def verify_token(provided: Optional[str], expected: Optional[str], disabled_detail: str) -> None:
+    """
+    Сравнение токена запроса с токеном из конфигурации за постоянное время.
+
+    Raises:
+        HTTPException: 404, если токен не задан в конфигурации; 403 при неверном токене
+    """
+    if not expected:
+        raise HTTPException(status_code=404, detail=disabled_detail)
+    if not provided or not secrets.compare_digest(provided.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Неверный токен")
+
+
+async def require_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Проверка токена административных эндпоинтов (APP_ADMIN_TOKEN)."""
+    verify_token(x_admin_token, get_app_config().admin_token, "Административные эндпоинты отключены")
@@ -0,0 +1,389 @@
+#!/usr/bin/env python3
+"""
+Пакетная переоценка архива записей.
+
+Записи берутся из каталога (аудио *.wav/*.mp3 с референсным текстом в файле
+<имя>.txt рядом) или из манифеста JSONL/CSV с полями audio, reference_text,
+language и необязательным id. Каждая запись проходит тот же путь, что и
+запрос к API (AzureSpeechService), в пуле процессов; в каждом процессе
+одновременно выполняется не больше --concurrency распознаваний (но не больше
+слотов планировщика для пакетных запросов: AZURE_SCHEDULER_CAPACITY -
+AZURE_SCHEDULER_INTERACTIVE_RESERVED; большее значение снижается с
+предупреждением).
+
+Результаты записываются по мере готовности: в JSONL (одна строка на запись)
+или в каталог Parquet (файлы part-*.parquet, требуется pyarrow). Выходные
+данные одновременно служат контрольной точкой: при повторном запуске с тем же
+--output уже обработанные записи пропускаются (--retry-errors обрабатывает
+заново записи с ошибкой; в JSONL актуальна последняя строка записи).
+
+Запуск:
+    python -m src.bulk_rescore --manifest archive.jsonl --output results.jsonl
+    python -m src.bulk_rescore --input recordings/ --language cs-CZ --output results.parquet -p 4 -c 8
+"""
+
+import argparse
+import asyncio
+import base64
+import csv
+import hashlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import orjson
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet опционален: без pyarrow доступен только JSONL
+    pa = None
+    pq = None
+
+AUDIO_EXTENSIONS = (".wav", ".mp3")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Entry:
+    """Запись архива для переоценки."""
+    id: str
+    audio: str
+    reference_text: str
+    language: Optional[str] = None
+
+
+def _entry_id(audio: str, reference_text: str, language: Optional[str]) -> str:
+    """Идентификатор записи: путь к аудио и хеш текста (одно аудио может оцениваться по разным текстам)."""
+    digest = hashlib.sha1(f"{reference_text}\t{language or ''}".encode("utf-8")).hexdigest()[:10]
+    return f"{audio}#{digest}"
+
+
+def iter_directory(directory: Path, language: Optional[str]) -> Iterator[Entry]:
+    """Записи каталога: аудио с референсным текстом в <имя>.txt."""
+    for path in sorted(directory.rglob("*")):
+        if path.suffix.lower() not in AUDIO_EXTENSIONS:
+            continue
+        text_path = path.with_suffix(".txt")
+        if not text_path.is_file():
+            logger.warning(f"Пропуск {path}: нет файла {text_path.name} с референсным текстом")
+            continue
+        reference_text = text_path.read_text(encoding="utf-8").strip()
+        audio = str(path.relative_to(directory))
+        yield Entry(_entry_id(audio, reference_text, language), str(path), reference_text, language)
+
+
+def iter_manifest(manifest: Path, language: Optional[str]) -> Iterator[Entry]:
+    """Записи манифеста JSONL или CSV; пути к аудио относительно каталога манифеста."""
+    with open(manifest, encoding="utf-8", newline="") as f:
+        if manifest.suffix.lower() == ".csv":
+            rows: Iterator[Dict[str, Any]] = csv.DictReader(f)
+        else:
+            rows = (orjson.loads(line) for line in f if line.strip())
+        for row in rows:
+            audio = row["audio"]
+            row_language = row.get("language") or language
+            path = Path(audio)
+            if not path.is_absolute():
+                path = manifest.parent / path
+            yield Entry(
+                row.get("id") or _entry_id(audio, row["reference_text"], row_language),
+                str(path),
+                row["reference_text"],
+                row_language
+            )
+
+
+class JsonlSink:
+    """Результаты в JSONL; уже записанные строки — контрольная точка."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._file = None
+
+    def completed(self, retry_errors: bool) -> Set[str]:
+        """Идентификаторы обработанных записей; незавершенная последняя строка отбрасывается."""
+        if not self.path.exists():
+            return set()
+        data = self.path.read_bytes()
+        if data and not data.endswith(b"\n"):
+            # Запуск прерван во время записи строки
+            data = data[:data.rfind(b"\n") + 1]
+            with open(self.path, "r+b") as f:
+                f.truncate(len(data))
+        done = set()
+        for line in data.splitlines():
+            record = orjson.loads(line)
+            if not (retry_errors and record["status"] == "error"):
+                done.add(record["id"])
+        return done
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(b"".join(orjson.dumps(record) + b"\n" for record in records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+
+class ParquetSink:
+    """Результаты в каталоге Parquet: файлы part-*.parquet записываются атомарно."""
+
+    COLUMNS = (
+        "id", "audio", "reference_text", "language", "profile", "status", "error",
+        "recognized_text", "pronunciation_score", "accuracy_score", "fluency_score",
+        "completeness_score", "prosody_score", "result_id", "words_analysis",
+    )
+
+    def __init__(self, path: Path, flush_rows: int):
+        if pa is None:
+            raise SystemExit("Для вывода в Parquet установите pyarrow: pip install pyarrow")
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.flush_rows = flush_rows
+        self._pending: List[Dict[str, Any]] = []
+        self._part = max((int(part.stem[len("part-"):]) + 1 for part in self.path.glob("part-*.parquet")), default=0)
+
+    def completed(self, retry_errors: bool) -> Set[str]:
+        done = set()
+        for part in self.path.glob("part-*.parquet"):
+            table = pq.read_table(part, columns=["id", "status"])
+            for record_id, status in zip(table.column("id").to_pylist(), table.column("status").to_pylist()):
+                if not (retry_errors and status == "error"):
+                    done.add(record_id)
+        return done
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        for record in records:
+            record = dict(record)
+            # Слова хранятся JSON строкой: схема таблицы остается плоской
+            record["words_analysis"] = orjson.dumps(record.get("words_analysis") or []).decode()
+            self._pending.append(record)
+        if len(self._pending) >= self.flush_rows:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        table = pa.Table.from_pylist([{column: record.get(column) for column in self.COLUMNS} for record in self._pending])
+        final = self.path / f"part-{self._part:05d}.parquet"
+        tmp = self.path / f".{final.name}.tmp"
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, final)
+        self._part += 1
+        self._pending.clear()
+
+    def close(self) -> None:
+        self._flush()
+
+
+# --- Процесс-воркер -------------------------------------------------------------
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+_worker_service = None
+
+
+def _init_worker() -> None:
+    """Цикл событий и сервис создаются один раз на процесс: соединения и конфигурации SDK переиспользуются."""
+    global _worker_loop, _worker_service
+    from .applications.azure_handling.services import AzureSpeechService
+
+    logging.basicConfig(level=logging.WARNING)
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+    _worker_service = AzureSpeechService()
+
+
+def _assess_chunk(entries: List[Entry], profile: str, concurrency: int) -> List[Dict[str, Any]]:
+    """Оценка части записей в процессе-воркере."""
+    return _worker_loop.run_until_complete(_assess_entries(entries, profile, concurrency))
+
+
+async def _assess_entries(entries: List[Entry], profile: str, concurrency: int) -> List[Dict[str, Any]]:
+    from .applications.azure_handling.deadline import Deadline
+    from .applications.azure_handling.schemas import AssessmentProfile, PronunciationRequest
+
+    service = _worker_service
+    records: Dict[int, Dict[str, Any]] = {}
+    requests: List[Any] = []
+    for index, entry in enumerate(entries):
+        language = entry.language or service.config.default_language
+        records[index] = {**asdict(entry), "language": language, "profile": profile, "status": "error", "error": None}
+        try:
+            audio_data = base64.b64encode(Path(entry.audio).read_bytes()).decode("ascii")
+            requests.append(PronunciationRequest(
+                audio_data=audio_data,
+                reference_text=entry.reference_text,
+                language=language,
+                profile=AssessmentProfile(profile)
+            ))
+        except Exception as e:
+            # Ошибка чтения файла передается как ошибка элемента пакета
+            requests.append(e)
+
+    # Бюджет части: каждое распознавание не дольше AzureConfig.timeout
+    waves = -(-len(entries) // concurrency)
+    deadline = Deadline.after(service.config.timeout * waves + service.config.timeout)
+
+    async def source():
+        for request in requests:
+            yield request
+
+    # Переоценка архива всегда распознает заново: без результатов почти одинаковых записей
+    async for index, _, outcome in service.analyze_batch_as_completed(
+        source(), deadline, concurrency=concurrency, use_cache=False
+    ):
+        record = records[index]
+        if isinstance(outcome, Exception):
+            record["error"] = str(outcome)
+            continue
+        record.update(
+            status="success",
+            recognized_text=outcome.recognized_text,
+            result_id=outcome.result_id,
+            words_analysis=[word.model_dump() for word in outcome.words_analysis],
+            **outcome.scores.model_dump()
+        )
+    return [records[index] for index in range(len(entries))]
+
+
+# --- Координатор ------------------------------------------------------------------
+
+class Progress:
+    """Отчет о пропускной способности."""
+
+    def __init__(self, total: int, skipped: int, interval: float):
+        self.total = total
+        self.skipped = skipped
+        self.interval = interval
+        self.done = 0
+        self.errors = 0
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def update(self, records: List[Dict[str, Any]]) -> None:
+        self.done += len(records)
+        self.errors += sum(record["status"] == "error" for record in records)
+        if time.perf_counter() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self, final: bool = False) -> None:
+        now = time.perf_counter()
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        left = self.total - self.done
+        eta = f"{left / rate:.0f} с" if rate > 0 and not final else "-"
+        print(
+            f"[{elapsed:7.1f} с] {self.done}/{self.total} записей, ошибок: {self.errors}, "
+            f"{rate:.2f} зап/с, осталось: {eta}"
+            + (f" (пропущено ранее обработанных: {self.skipped})" if final and self.skipped else ""),
+            file=sys.stderr,
+            flush=True
+        )
+
+
+def _chunks(entries: Iterator[Entry], size: int) -> Iterator[List[Entry]]:
+    chunk: List[Entry] = []
+    for entry in entries:
+        chunk.append(entry)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run(args: argparse.Namespace) -> int:
+    output = Path(args.output)
+    if output.suffix.lower() == ".parquet":
+        sink = ParquetSink(output, args.flush_rows)
+    else:
+        sink = JsonlSink(output)
+
+    if args.manifest:
+        entries = list(iter_manifest(Path(args.manifest), args.language))
+    else:
+        entries = list(iter_directory(Path(args.input), args.language))
+
+    # Распознавания пакета ограничены слотами планировщика класса batch
+    from .applications.azure_handling.scheduler import Priority, get_scheduler
+    batch_limit = get_scheduler().limit(Priority.BATCH)
+    if args.concurrency > batch_limit:
+        print(
+            f"Предупреждение: --concurrency {args.concurrency} больше лимита пакетных распознаваний "
+            f"планировщика ({batch_limit} = AZURE_SCHEDULER_CAPACITY - AZURE_SCHEDULER_INTERACTIVE_RESERVED); "
+            f"используется {batch_limit}",
+            file=sys.stderr
+        )
+        args.concurrency = batch_limit
+
+    completed = sink.completed(args.retry_errors)
+    pending = [entry for entry in entries if entry.id not in completed]
+    progress = Progress(len(pending), len(entries) - len(pending), args.report_interval)
+    print(
+        f"Записей: {len(entries)}, к обработке: {len(pending)}, процессов: {args.processes}, "
+        f"распознаваний на процесс: {args.concurrency}",
+        file=sys.stderr
+    )
+
+    chunk_size = args.concurrency * 2
+    chunks = _chunks(iter(pending), chunk_size)
+    try:
+        with ProcessPoolExecutor(max_workers=args.processes, initializer=_init_worker) as pool:
+            in_flight = set()
+            while True:
+                # Не больше двух частей на процесс: память координатора ограничена
+                while len(in_flight) < args.processes * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    in_flight.add(pool.submit(_assess_chunk, chunk, args.profile, args.concurrency))
+                if not in_flight:
+                    break
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    records = future.result()
+                    sink.write(records)
+                    progress.update(records)
+    except KeyboardInterrupt:
+        print("Прервано: при повторном запуске обработка продолжится с места остановки", file=sys.stderr)
+        return 130
+    finally:
+        sink.close()
+
+    progress.report(final=True)
+    return 1 if progress.errors else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Пакетная переоценка архива записей через Azure Speech")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="Каталог с аудио и файлами <имя>.txt с референсным текстом")
+    source.add_argument("--manifest", help="Манифест JSONL или CSV с полями audio, reference_text, language, id")
+    parser.add_argument("--output", required=True, help="Файл .jsonl или каталог .parquet для результатов")
+    parser.add_argument("--language", default=None, help="Язык записей без указанного языка (по умолчанию AZURE_DEFAULT_LANGUAGE)")
+    parser.add_argument("--profile", default="standard", choices=["lite", "standard", "full"], help="Профиль оценки")
+    parser.add_argument("-p", "--processes", type=int, default=os.cpu_count() or 1, help="Количество процессов")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Одновременных распознаваний в процессе")
+    parser.add_argument("--flush-rows", type=int, default=1000, help="Строк в одном файле Parquet")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Интервал отчета о прогрессе в секундах")
+    parser.add_argument("--retry-errors", action="store_true", help="Повторно обработать записи, завершившиеся ошибкой")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Сжатие ответов API.
+
+ASGI middleware сжимает ответы с согласованием по Accept-Encoding:
+zstd и brotli (пакеты zstandard/Brotli из requirements.txt; в окружении
+без них остается только gzip) и gzip из стандартной библиотеки. Сжимаются только ответы известных текстовых
+и JSON типов не меньше порогового размера; потоковые ответы (NDJSON/SSE
+пакетного анализа) передаются без изменений, чтобы не задерживать строки.
+Большие тела сжимаются в пуле потоков, чтобы не блокировать цикл событий.
+"""
+
+import asyncio
+import gzip
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import get_metrics
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstandard необязателен
+    zstandard = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/vnd.pronunciation.columnar+json",
+    "application/msgpack",
+    "application/x-ndjson",
+    "text/",
+)
+
+
+def _compressors(level: int) -> Dict[str, Callable[[bytes], bytes]]:
+    """Доступные алгоритмы сжатия в порядке предпочтения сервера."""
+    compressors: Dict[str, Callable[[bytes], bytes]] = {}
+    if zstandard is not None:
+        compressors["zstd"] = zstandard.ZstdCompressor(level=min(level, 19)).compress
+    if brotli is not None:
+        # Уровни brotli выше 5 слишком медленные для ответов API
+        compressors["br"] = lambda data: brotli.compress(data, quality=min(level, 5))
+    compressors["gzip"] = lambda data: gzip.compress(data, compresslevel=min(level, 9), mtime=0)
+    return compressors
+
+
+def choose_encoding(accept_encoding: str, available: List[str]) -> Optional[str]:
+    """
+    Выбор алгоритма по заголовку Accept-Encoding.
+    
+    Из приемлемых клиенту алгоритмов с наибольшим q выбирается первый
+    в порядке предпочтения сервера.
+    """
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+
+    best: Tuple[float, Optional[str]] = (0.0, None)
+    for encoding in available:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > best[0]:
+            best = (quality, encoding)
+    return best[1]
+
+
+class CompressionMiddleware:
+    """
+    Middleware сжатия ответов.
+    
+    Args:
+        app: ASGI приложение
+        minimum_size: Минимальный размер тела для сжатия в байтах
+        offload_size: Размер тела, начиная с которого сжатие выполняется в пуле потоков
+        level: Уровень сжатия (ограничивается максимумом для каждого алгоритма)
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, offload_size: int = 256 * 1024, level: int = 5):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.offload_size = offload_size
+        self.compressors = _compressors(level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""), list(self.compressors))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Обертка send одного ответа: буферизует начало ответа до первого фрагмента тела."""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+
+    def _skip_reason(self, message: Message) -> Optional[str]:
+        """Причина не сжимать ответ или None."""
+        headers = Headers(raw=self.start_message["headers"])
+        if "content-encoding" in headers:
+            return "encoded"
+        if self.start_message["status"] < 200 or self.start_message["status"] in (204, 304):
+            return "status"
+        if message.get("more_body", False):
+            return "streaming"
+        content_type = headers.get("content-type", "").lower()
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return "content_type"
+        if len(message.get("body", b"")) < self.middleware.minimum_size:
+            return "small"
+        return None
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.start_message is None:
+            await self.downstream(message)
+            return
+
+        metrics = get_metrics()
+        reason = self._skip_reason(message)
+        if reason is not None:
+            metrics.increment("compression_skipped_total", reason=reason)
+            self.passthrough = True
+            await self.downstream(self.start_message)
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        compress = self.middleware.compressors[self.encoding]
+        started = time.perf_counter()
+        if len(body) >= self.middleware.offload_size:
+            compressed = await asyncio.to_thread(compress, body)
+        else:
+            compressed = compress(body)
+        metrics.observe("compression_duration_seconds", time.perf_counter() - started, encoding=self.encoding)
+
+        if len(compressed) >= len(body):
+            metrics.increment("compression_skipped_total", reason="incompressible")
+            compressed_message = message
+        else:
+            headers = MutableHeaders(raw=list(self.start_message["headers"]))
+            headers["Content-Encoding"] = self.encoding
+            headers["Content-Length"] = str(len(compressed))
+            headers.add_vary_header("Accept-Encoding")
+            self.start_message = {**self.start_message, "headers": headers.raw}
+            compressed_message = {"type": "http.response.body", "body": compressed, "more_body": False}
+            metrics.increment("compression_responses_total", encoding=self.encoding)
+            metrics.increment("compression_bytes_in_total", len(body), encoding=self.encoding)
+            metrics.increment("compression_bytes_saved_total", len(body) - len(compressed), encoding=self.encoding)
+
+        self.passthrough = True
+        await self.downstream(self.start_message)
+        await self.downstream(compressed_message)
@@ -6,6 +6,7 @@
 
 import os
 import json
+import tempfile
 from typing import Optional, List
 from pydantic_settings import BaseSettings
 
@@ -18,12 +19,108 @@ class AzureConfig(BaseSettings):
         speech_key (str): Ключ API для Azure Speech Service.
         speech_region (str): Регион Azure для Speech Service.
         default_language (str): Язык по умолчанию для анализа.
-        timeout (int): Таймаут для запросов к Azure API в секундах.
+        timeout (int): Крайний срок обработки одного запроса анализа в секундах.
+        batch_timeout (int): Общий крайний срок обработки пакетного запроса в секундах.
+        batch_concurrency (int): Количество одновременно обрабатываемых элементов потокового пакета.
+        stream_max_item_bytes (int): Максимальный размер одного элемента NDJSON пакета в байтах.
+        audio_store_dir (str): Каталог локального хранилища загруженного аудио.
+        audio_store_ttl (int): Срок хранения загруженного аудио с момента последнего обращения в секундах.
+        result_store_dir (str): Каталог локального хранилища исходных результатов Azure.
+        result_store_ttl (int): Срок хранения исходных результатов в секундах.
+        assessment_cache_size (int): Максимальное количество готовых конфигураций оценки в LRU кеше.
+        assessment_warmup_file (str): Файл фраз для заполнения кеша конфигураций при запуске.
+        admission_max_requests (int): Максимальное количество запросов анализа в обработке в процессе.
+        admission_max_audio_bytes (int): Бюджет декодированного аудио в обработке в байтах.
+        admission_retry_after (int): Значение Retry-After в ответах 503 при перегрузке в секундах.
+        scheduler_capacity (int): Максимальное количество одновременных распознаваний в процессе.
+        scheduler_interactive_reserved (int): Слоты распознавания, зарезервированные за одиночными запросами.
+        scheduler_aging_seconds (float): Время ожидания, за которое запрос младшего класса повышается на один класс.
+        scheduler_tenant_weights (str): Веса клиентов в справедливой очереди распознаваний вида "client:ios=2,ip:10.0.0.5=0.5".
+        rate_limit_enabled (bool): Ограничение частоты запросов анализа по клиентам.
+        rate_limit_rps (float): Запросов в секунду на клиента.
+        rate_limit_burst (int): Допустимый всплеск запросов на клиента.
+        rate_limit_audio_seconds_per_minute (float): Секунд аудио в минуту на клиента (0 - без ограничения).
+        rate_limit_trusted_proxies (str): Адреса и подсети прокси через запятую, от которых принимаются X-Forwarded-For/X-Real-IP.
+        rate_limit_trust_client_id (bool): Определять клиента по X-Client-Id без API ключа (заголовок не аутентифицирован).
+        analytics_dir (Optional[str]): Каталог выгрузки истории оценок в Parquet/Arrow (не задан - выгрузка отключена).
+        analytics_format (str): Формат файлов аналитики: parquet или arrow.
+        analytics_flush_interval (float): Период записи буфера аналитики в секундах.
+        analytics_flush_rows (int): Количество строк, при котором буфер аналитики записывается досрочно.
+        analytics_max_buffer_rows (int): Предел буфера аналитики в строках.
+        difficulty_enabled (bool): Агрегаты сложности слов и фраз по завершенным оценкам (требует difficulty_snapshot_path).
+        difficulty_snapshot_path (Optional[str]): Файл снимков агрегатов сложности, общий для воркеров, на постоянном томе.
+        difficulty_snapshot_interval (float): Период записи снимков агрегатов сложности в секундах.
+        progress_db_path (Optional[str]): Файл SQLite истории попыток пользователей (не задан - история отключена).
+        progress_read_token (Optional[str]): Токен чтения истории попыток (заголовок X-Progress-Token; не задан - чтение отключено).
+        progress_retention_days (int): Срок хранения попыток пользователей в днях (0 - без ограничения).
+        progress_batch_size (int): Максимальное количество строк истории в одной транзакции записи.
+        progress_flush_interval (float): Максимальная задержка записи попытки в историю в секундах.
+        near_duplicate_enabled (bool): Повторное использование результата для почти одинаковых записей (WAV).
+        near_duplicate_threshold (float): Минимальное сходство акустических отпечатков (доля совпадающих бит, 0-1).
+        near_duplicate_ttl (int): Срок хранения отпечатков и результатов в индексе в секундах.
+        near_duplicate_max_entries (int): Предел записей в индексе почти одинаковых записей.
+        near_duplicate_audit_rate (float): Доля совпадений, проверяемых повторным распознаванием в фоне.
+        near_duplicate_audit_tolerance (float): Допустимое расхождение общей оценки при проверке совпадения.
+        executor_workers (int): Размер пула потоков для освобождения распознавателей и блокирующих операций.
+        warmup_enabled (bool): Прогрев движка распознавания при запуске.
+        warmup_languages (str): Языки прогрева через запятую (по умолчанию default_language).
+        warmup_threads (int): Количество потоков пула, создаваемых при прогреве.
+        warmup_network (bool): Открывать и сразу закрывать соединение с сервисом при прогреве (DNS и сетевой стек SDK; не тарифицируется).
+        warmup_recognition (bool): Анализировать тихую запись при прогреве (тарифицируемое распознавание на каждый язык при каждом запуске воркера).
+        warmup_timeout (int): Максимальное время одного сетевого шага прогрева в секундах.
     """
     speech_key: str
     speech_region: str = "eastus"
     default_language: str = "cs-CZ"
     timeout: int = 30
+    batch_timeout: int = 120
+    batch_concurrency: int = 4
+    stream_max_item_bytes: int = 16 * 1024 * 1024
+    audio_store_dir: str = os.path.join(tempfile.gettempdir(), "pronunciation-audio")
+    audio_store_ttl: int = 3600
+    result_store_dir: str = os.path.join(tempfile.gettempdir(), "pronunciation-results")
+    result_store_ttl: int = 7 * 24 * 3600
+    assessment_cache_size: int = 4096
+    assessment_warmup_file: Optional[str] = None
+    admission_max_requests: int = 64
+    admission_max_audio_bytes: int = 256 * 1024 * 1024
+    admission_retry_after: int = 2
+    scheduler_capacity: int = 16
+    scheduler_interactive_reserved: int = 4
+    scheduler_aging_seconds: float = 5.0
+    scheduler_tenant_weights: str = ""
+    rate_limit_enabled: bool = False
+    rate_limit_rps: float = 5.0
+    rate_limit_burst: int = 20
+    rate_limit_audio_seconds_per_minute: float = 600.0
+    rate_limit_trusted_proxies: str = ""
+    rate_limit_trust_client_id: bool = False
+    analytics_dir: Optional[str] = None
+    analytics_format: str = "parquet"
+    analytics_flush_interval: float = 60.0
+    analytics_flush_rows: int = 50_000
+    analytics_max_buffer_rows: int = 500_000
+    difficulty_enabled: bool = False
+    difficulty_snapshot_path: Optional[str] = None
+    difficulty_snapshot_interval: float = 300.0
+    progress_db_path: Optional[str] = None
+    progress_read_token: Optional[str] = None
+    progress_retention_days: int = 365
+    progress_batch_size: int = 500
+    progress_flush_interval: float = 1.0
+    near_duplicate_enabled: bool = False
+    near_duplicate_threshold: float = 0.9
+    near_duplicate_ttl: int = 3600
+    near_duplicate_max_entries: int = 10_000
+    near_duplicate_audit_rate: float = 0.05
+    near_duplicate_audit_tolerance: float = 5.0
+    executor_workers: int = 32
+    warmup_enabled: bool = True
+    warmup_languages: str = ""
+    warmup_threads: int = 8
+    warmup_network: bool = True
+    warmup_recognition: bool = False
+    warmup_timeout: int = 10
     
     class Config:
         env_prefix = "AZURE_"
@@ -41,6 +138,28 @@ class AppConfig(BaseSettings):
         host (str): Хост для запуска сервера.
         port (int): Порт для запуска сервера.
         cors_origins (list): Разрешенные CORS origins для мобильного приложения.
+        compression_min_size (int): Минимальный размер ответа для сжатия в байтах (0 - сжатие отключено).
+        compression_offload_size (int): Размер ответа, начиная с которого сжатие выполняется в пуле потоков.
+        compression_level (int): Уровень сжатия ответов.
+        server_mode (str): Режим запуска: development (uvicorn) или production (gunicorn с воркерами uvicorn).
+        workers (int): Количество процессов-воркеров в продакшен режиме (0 - по числу доступных ядер).
+        max_requests (int): Количество запросов, после которого воркер перезапускается (0 - без перезапуска).
+        max_requests_jitter (int): Случайный разброс max_requests, чтобы воркеры не перезапускались одновременно.
+        worker_timeout (int): Время без ответа воркера, после которого он перезапускается, в секундах.
+        preload_app (bool): Загружать приложение до fork воркеров.
+        startup_budget (float): Бюджет времени от начала импорта до первого ответа в секундах.
+        cache_backend (str): Хранилище общего состояния (лимитов частоты): memory или redis.
+        redis_url (str): Адрес Redis для cache_backend=redis.
+        tracing_enabled (bool): Трассировка этапов запросов анализа и заголовок Server-Timing.
+        tracing_sample_rate (float): Доля запросов, трассы которых выгружаются в OTLP/JSON (0-1).
+        tracing_export_file (Optional[str]): Файл выгрузки трасс OTLP/JSON (строка на пакет).
+        tracing_export_endpoint (Optional[str]): Адрес OTLP/HTTP коллектора, например http://collector:4318/v1/traces.
+        tracing_flush_interval (float): Период выгрузки трасс в секундах.
+        slow_request_threshold (float): Длительность запроса, после которой снимается профиль, в секундах (0 - отключено).
+        slow_request_samples (int): Количество снимков стеков в профиле медленного запроса.
+        slow_request_sample_interval (float): Интервал между снимками стеков в секундах.
+        slow_request_reports (int): Количество хранимых отчетов о медленных запросах.
+        admin_token (Optional[str]): Токен административных эндпоинтов (заголовок X-Admin-Token; не задан - эндпоинты отключены).
     """
     app_name: str = "Pronunciation Assessment API"
     version: str = "1.0.0"
@@ -48,6 +167,28 @@ class AppConfig(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 10000
     cors_origins: str = '["*"]'
+    compression_min_size: int = 1024
+    compression_offload_size: int = 256 * 1024
+    compression_level: int = 5
+    server_mode: str = "development"
+    workers: int = 0
+    max_requests: int = 2000
+    max_requests_jitter: int = 200
+    worker_timeout: int = 180
+    preload_app: bool = False
+    startup_budget: float = 5.0
+    cache_backend: str = "memory"
+    redis_url: str = "redis://redis:6379/0"
+    tracing_enabled: bool = True
+    tracing_sample_rate: float = 0.0
+    tracing_export_file: Optional[str] = None
+    tracing_export_endpoint: Optional[str] = None
+    tracing_flush_interval: float = 5.0
+    slow_request_threshold: float = 10.0
+    slow_request_samples: int = 20
+    slow_request_sample_interval: float = 0.01
+    slow_request_reports: int = 50
+    admin_token: Optional[str] = None
     
     class Config:
         env_prefix = "APP_"
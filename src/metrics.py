@@ -0,0 +1,151 @@
+"""
+Метрики приложения.
+
+Простой потокобезопасный реестр счетчиков, gauge-значений и распределений
+(например, времени выполнения), доступный через эндпоинт /metrics.
+"""
+
+import math
+import os
+import threading
+from collections import deque
+from typing import Dict, Any, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _format_key(name: str, labels: LabelKey) -> str:
+    """Формирование ключа метрики в стиле Prometheus: name{label=value}."""
+    if not labels:
+        return name
+    rendered = ",".join(f"{key}={value}" for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+
+class _Distribution:
+    """Распределение наблюдаемых значений с ограниченной выборкой для перцентилей."""
+
+    __slots__ = ("count", "total", "min", "max", "samples")
+
+    def __init__(self, reservoir_size: int = 1024):
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.samples = deque(maxlen=reservoir_size)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.samples.append(value)
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+
+        def percentile(q: float) -> float:
+            if not ordered:
+                return 0.0
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "min": round(self.min, 6) if self.count else 0.0,
+            "max": round(self.max, 6) if self.count else 0.0,
+            "mean": round(self.total / self.count, 6) if self.count else 0.0,
+            "p50": round(percentile(0.50), 6),
+            "p95": round(percentile(0.95), 6),
+            "p99": round(percentile(0.99), 6),
+        }
+
+
+class MetricsRegistry:
+    """Реестр метрик процесса."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._gauges: Dict[Tuple[str, LabelKey], float] = {}
+        self._distributions: Dict[Tuple[str, LabelKey], _Distribution] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> Tuple[str, LabelKey]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1.0, **labels) -> None:
+        """Увеличить счетчик."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Установить текущее значение gauge."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name: str, delta: float, **labels) -> None:
+        """Изменить значение gauge на delta (например, число запросов в работе)."""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Добавить наблюдение в распределение (например, длительность в секундах)."""
+        key = self._key(name, labels)
+        with self._lock:
+            distribution = self._distributions.get(key)
+            if distribution is None:
+                distribution = self._distributions[key] = _Distribution()
+            distribution.observe(value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Снимок всех метрик в виде словаря."""
+        self._update_process_gauges()
+        with self._lock:
+            return {
+                # Метрики ведутся отдельно в каждом процессе-воркере
+                "process": {"pid": os.getpid()},
+                "counters": {_format_key(*key): value for key, value in sorted(self._counters.items())},
+                "gauges": {_format_key(*key): value for key, value in sorted(self._gauges.items())},
+                "distributions": {
+                    _format_key(*key): distribution.summary()
+                    for key, distribution in sorted(self._distributions.items())
+                },
+            }
+
+    def reset(self) -> None:
+        """Сброс всех метрик."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._distributions.clear()
+
+    def _after_fork(self) -> None:
+        """Сброс в дочернем процессе: блокировка могла быть захвачена в момент fork."""
+        self._lock = threading.Lock()
+        self.reset()
+
+    def _update_process_gauges(self) -> None:
+        """Обновление gauge-значений процесса (количество потоков)."""
+        self.set_gauge("python_threads", threading.active_count())
+        try:
+            # Учитываем и нативные потоки (в т.ч. потоки Azure Speech SDK)
+            self.set_gauge("process_threads", len(os.listdir("/proc/self/task")))
+        except OSError:
+            pass
+
+
+# Глобальный реестр метрик
+metrics = MetricsRegistry()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=metrics._after_fork)
+
+
+def get_metrics() -> MetricsRegistry:
+    """Получить реестр метрик."""
+    return metrics
@@ -0,0 +1,431 @@
+"""
+Ограничение частоты запросов по клиентам.
+
+Клиент (tenant) определяется по X-API-Key (хранится только хеш ключа) или
+IP адресу. Адрес берется из X-Forwarded-For/X-Real-IP, только если запрос
+пришел от доверенного прокси (AZURE_RATE_LIMIT_TRUSTED_PROXIES), иначе за
+nginx все клиенты имели бы адрес прокси. X-Client-Id не аутентифицирован
+(клиент может менять его и получать новый bucket), поэтому учитывается только
+при AZURE_RATE_LIMIT_TRUST_CLIENT_ID (его выставляет доверенный шлюз).
+
+Для каждого клиента ведутся два token bucket:
+
+- requests: запросы в секунду с допустимым всплеском
+- audio: секунды аудио в минуту. До чтения тела списывается оценка по
+  Content-Length (как PCM 16 кГц, 16 бит, моно — для сжатых форматов
+  завышена), после обработки списание исправляется на фактическую
+  длительность распознанного аудио из результатов Azure (record_audio_seconds).
+  Если длительность неизвестна (ошибка, повторная запись), остается оценка;
+  тело без Content-Length учитывается после обработки.
+
+Состояние хранится в памяти процесса или в Redis (общее для воркеров).
+При недоступности Redis используется память процесса. Ответы содержат
+заголовки RateLimit-Limit/RateLimit-Remaining/RateLimit-Reset, отказ — 429
+с Retry-After. Идентификатор клиента доступен обработчикам через
+get_current_tenant() (например, для справедливой очереди распознаваний).
+"""
+
+import hashlib
+import ipaddress
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple, Union
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_app_config
+from .metrics import get_metrics
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Redis опционален: без него состояние хранится в памяти процесса
+    redis_asyncio = None
+
+logger = logging.getLogger(__name__)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+# Байт декодированного аудио в секунду: PCM 16 кГц, 16 бит, моно
+AUDIO_BYTES_PER_SECOND = 16000 * 2
+
+_current_tenant: ContextVar[str] = ContextVar("current_tenant", default="")
+# Фактическая длительность аудио, распознанного в текущем запросе (секунды)
+_audio_usage: ContextVar[Optional[List[float]]] = ContextVar("audio_usage", default=None)
+
+
+def get_current_tenant() -> str:
+    """Идентификатор клиента текущего запроса (пустая строка вне запроса)."""
+    return _current_tenant.get()
+
+
+def record_audio_seconds(seconds: float) -> None:
+    """Учет фактической длительности распознанного аудио в лимите клиента текущего запроса."""
+    usage = _audio_usage.get()
+    if usage is not None:
+        usage.append(seconds)
+
+
+@lru_cache(maxsize=16)
+def parse_networks(value: str) -> Tuple[Network, ...]:
+    """Список адресов и подсетей через запятую (например "172.16.0.0/12,10.0.0.5")."""
+    return tuple(ipaddress.ip_network(item.strip(), strict=False) for item in value.split(",") if item.strip())
+
+
+def _is_trusted(address: str, trusted_proxies: Sequence[Network]) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in trusted_proxies)
+
+
+def client_ip(scope: Scope, trusted_proxies: Sequence[Network] = ()) -> str:
+    """
+    IP адрес клиента.
+
+    Заголовки прокси учитываются, только если соединение пришло от доверенного
+    прокси; из X-Forwarded-For берется ближайший справа адрес не из доверенных.
+    """
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not trusted_proxies or not _is_trusted(peer, trusted_proxies):
+        return peer
+    headers = Headers(scope=scope)
+    forwarded = [hop.strip() for hop in headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    for hop in reversed(forwarded):
+        if not _is_trusted(hop, trusted_proxies):
+            return hop
+    if forwarded:
+        return forwarded[0]
+    return headers.get("x-real-ip", "").strip() or peer
+
+
+def tenant_key(
+    scope: Scope,
+    trusted_proxies: Sequence[Network] = (),
+    trust_client_id: bool = False
+) -> str:
+    """Идентификатор клиента: хеш API ключа, client id (если ему доверяют) или IP адрес."""
+    headers = Headers(scope=scope)
+    api_key = headers.get("x-api-key")
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:16]
+    client_id = headers.get("x-client-id")
+    if client_id and trust_client_id:
+        return "client:" + client_id[:64]
+    return "ip:" + client_ip(scope, trusted_proxies)
+
+
+@dataclass
+class BucketState:
+    """Результат списания из token bucket."""
+    allowed: bool
+    tokens: float
+    limit: float
+    rate: float
+    cost: float
+
+    @property
+    def remaining(self) -> int:
+        return max(0, math.floor(self.tokens))
+
+    @property
+    def reset_after(self) -> int:
+        """Секунд до полного восстановления bucket."""
+        return max(0, math.ceil((self.limit - self.tokens) / self.rate))
+
+    @property
+    def retry_after(self) -> int:
+        """Секунд до момента, когда списание станет возможным."""
+        need = min(self.cost, self.limit)
+        return max(1, math.ceil((need - self.tokens) / self.rate))
+
+
+def _refill(tokens: float, updated_at: float, now: float, rate: float, limit: float) -> float:
+    return min(limit, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryRateLimitBackend:
+    """Token buckets в памяти процесса (LRU по количеству клиентов)."""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def consume(self, key: str, rate: float, limit: float, cost: float, force: bool = False) -> BucketState:
+        """
+        Списание cost токенов.
+
+        Запрос дороже всего bucket допускается при полном bucket (баланс уходит
+        в минус), force списывает без проверки — для учета уже выполненной работы;
+        отрицательный cost возвращает токены (не больше limit).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (limit, now))
+            tokens = _refill(tokens, updated_at, now, rate, limit)
+            allowed = force or tokens >= min(cost, limit)
+            if allowed:
+                tokens = min(limit, tokens - cost)
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return BucketState(allowed, tokens, limit, rate, cost)
+
+
+# Тот же алгоритм атомарно на стороне Redis
+_REDIS_CONSUME = """
+local rate = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local force = ARGV[5] == '1'
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or limit
+local ts = tonumber(state[2]) or now
+tokens = math.min(limit, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if force or tokens >= math.min(cost, limit) then
+    tokens = math.min(limit, tokens - cost)
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((limit - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Token buckets в Redis: лимиты общие для всех воркеров и экземпляров."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._client = redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_CONSUME)
+        self._fallback = MemoryRateLimitBackend()
+
+    async def consume(self, key: str, rate: float, limit: float, cost: float, force: bool = False) -> BucketState:
+        try:
+            allowed, tokens = await self._script(
+                keys=[self.prefix + key],
+                args=[rate, limit, cost, time.time(), "1" if force else "0"]
+            )
+        except Exception as e:
+            get_metrics().increment("rate_limit_backend_errors_total")
+            logger.warning(f"Redis недоступен для ограничения частоты, используется память процесса: {str(e)}")
+            return await self._fallback.consume(key, rate, limit, cost, force)
+        return BucketState(bool(allowed), float(tokens), limit, rate, cost)
+
+
+_backend = None
+
+
+def _reset_after_fork() -> None:
+    """Состояние (блокировки, соединения Redis) создается заново в каждом воркере."""
+    global _backend
+    _backend = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_rate_limit_backend():
+    """Получить хранилище token buckets согласно APP_CACHE_BACKEND."""
+    global _backend
+    if _backend is None:
+        config = get_app_config()
+        if config.cache_backend == "redis":
+            if redis_asyncio is None:
+                logger.warning("APP_CACHE_BACKEND=redis, но пакет redis не установлен: лимиты хранятся в памяти процесса")
+                _backend = MemoryRateLimitBackend()
+            else:
+                _backend = RedisRateLimitBackend(config.redis_url)
+        else:
+            _backend = MemoryRateLimitBackend()
+    return _backend
+
+
+def _rate_limit_headers(state: BucketState) -> List[Tuple[bytes, bytes]]:
+    return [
+        (b"ratelimit-limit", str(math.floor(state.limit)).encode()),
+        (b"ratelimit-remaining", str(state.remaining).encode()),
+        (b"ratelimit-reset", str(state.reset_after).encode()),
+    ]
+
+
+class RateLimitMiddleware:
+    """
+    Middleware ограничения частоты POST запросов к маршрутам анализа.
+
+    Клиент запроса определяется и доступен через get_current_tenant() (для
+    справедливой очереди распознаваний) и при выключенных лимитах.
+
+    Args:
+        app: ASGI приложение
+        path_prefix: Префикс путей, к которым применяются лимиты
+        requests_per_second: Скорость пополнения bucket запросов
+        burst: Размер bucket запросов
+        audio_seconds_per_minute: Секунд аудио в минуту на клиента (0 - без ограничения)
+        enabled: Применять лимиты (иначе только определение клиента)
+        trusted_proxies: Адреса и подсети прокси, которым доверяются X-Forwarded-For/X-Real-IP
+        trust_client_id: Учитывать X-Client-Id без API ключа
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        path_prefix: str,
+        requests_per_second: float,
+        burst: int,
+        audio_seconds_per_minute: float,
+        enabled: bool = True,
+        trusted_proxies: str = "",
+        trust_client_id: bool = False
+    ):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.audio_seconds_per_minute = audio_seconds_per_minute
+        self.enabled = enabled
+        self.trusted_proxies = parse_networks(trusted_proxies)
+        self.trust_client_id = trust_client_id
+
+    def _applies(self, scope: Scope) -> bool:
+        return (
+            scope["type"] == "http"
+            and scope["method"] == "POST"
+            and scope["path"].startswith(self.path_prefix)
+        )
+
+    @staticmethod
+    def _audio_seconds(body_bytes: int) -> float:
+        """Оценка длительности аудио по размеру тела с base64 (3/4 при декодировании) как PCM 16 кГц."""
+        return body_bytes * 3 / 4 / AUDIO_BYTES_PER_SECOND
+
+    async def _consume_audio(self, tenant: str, seconds: float, force: bool = False) -> BucketState:
+        return await get_rate_limit_backend().consume(
+            f"{tenant}:audio",
+            self.audio_seconds_per_minute / 60,
+            self.audio_seconds_per_minute,
+            seconds,
+            force=force
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._applies(scope):
+            await self.app(scope, receive, send)
+            return
+
+        tenant = tenant_key(scope, self.trusted_proxies, self.trust_client_id)
+        if not self.enabled:
+            token = _current_tenant.set(tenant)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _current_tenant.reset(token)
+            return
+
+        metrics = get_metrics()
+        backend = get_rate_limit_backend()
+
+        state = await backend.consume(f"{tenant}:requests", self.requests_per_second, self.burst, 1)
+        if not state.allowed:
+            metrics.increment("rate_limit_throttled_total", bucket="requests")
+            await self._reject(send, state, "Превышен лимит запросов")
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        audio_limited = self.audio_seconds_per_minute > 0
+        if audio_limited and content_length is not None and content_length.isdigit():
+            audio_state = await self._consume_audio(tenant, self._audio_seconds(int(content_length)))
+            if not audio_state.allowed:
+                metrics.increment("rate_limit_throttled_total", bucket="audio")
+                await self._reject(send, audio_state, "Превышен лимит длительности аудио")
+                return
+            # Заголовки отражают более исчерпанный лимит
+            if audio_state.tokens / audio_state.limit < state.tokens / state.limit:
+                state = audio_state
+            content_length = int(content_length)
+            estimated = self._audio_seconds(content_length)
+        else:
+            content_length = None
+            estimated = 0.0
+        metrics.increment("rate_limit_allowed_total")
+
+        received = 0
+
+        async def counting_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+            return message
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + _rate_limit_headers(state)
+            await send(message)
+
+        usage: List[float] = []
+        token = _current_tenant.set(tenant)
+        usage_token = _audio_usage.set(usage)
+        try:
+            await self.app(scope, counting_receive, send_with_headers)
+        finally:
+            _audio_usage.reset(usage_token)
+            _current_tenant.reset(token)
+            if audio_limited:
+                await self._settle_audio(tenant, estimated, usage, content_length is None, received)
+
+    async def _settle_audio(
+        self,
+        tenant: str,
+        estimated: float,
+        usage: List[float],
+        unknown_length: bool,
+        received: int
+    ) -> None:
+        """
+        Исправление списания аудио после обработки.
+
+        Оценка по Content-Length заменяется фактической длительностью из
+        результатов распознавания; без них остается оценка, а тело без
+        Content-Length (потоковый NDJSON) учитывается по прочитанному объему.
+        """
+        if usage:
+            actual = sum(usage)
+        elif unknown_length and received:
+            actual = self._audio_seconds(received)
+        else:
+            return
+        delta = actual - estimated
+        if delta < 0:
+            get_metrics().increment("rate_limit_audio_refunded_seconds_total", -delta)
+        elif delta > 0:
+            get_metrics().increment("rate_limit_audio_charged_seconds_total", delta)
+        if delta:
+            await self._consume_audio(tenant, delta, force=True)
+
+    async def _reject(self, send: Send, state: BucketState, detail: str) -> None:
+        """Ответ 429 без чтения тела запроса."""
+        body = orjson.dumps({"detail": detail})
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(state.retry_after).encode()),
+        ] + _rate_limit_headers(state)
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -4,12 +4,18 @@
 Содержит общие системные эндпоинты.
 """
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import JSONResponse
 from datetime import datetime
 import logging
+import os
 
 from .schemas import HealthResponse
 from .config import get_app_config
+from .metrics import get_metrics
+from .auth import require_admin_token
+from .startup import get_startup
+from .watchdog import get_slow_request_watchdog
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
@@ -53,6 +59,26 @@ async def health_check():
         )
 
 
+@router.get(
+    "/ready",
+    tags=["System"],
+    summary="Готовность сервиса",
+    description=(
+        "200, когда завершены загрузка и прогрев движка распознавания; иначе 503. "
+        "Используется как readiness/startup probe."
+    )
+)
+async def readiness_check():
+    """
+    Готовность сервиса к обработке запросов анализа.
+    
+    Returns:
+        JSONResponse: Состояние запуска и время этапов
+    """
+    status = get_startup().status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
 @router.get(
     "/info",
     tags=["System"],
@@ -75,11 +101,21 @@ async def service_info():
         "providers": ["Azure Cognitive Services"],
         "endpoints": {
             "azure_pronunciation": "/azure/pronunciation-assessment",
+            "azure_audio_upload": "/azure/audio",
+            "azure_result_details": "/azure/results/{result_id}/{phonemes|syllables|prosody}",
+            "azure_result_rescore": "/azure/results/{result_id}/rescore",
+            "azure_difficulty": "/azure/difficulty/{words|phrases}",
+            "azure_progress": "/azure/progress/{user_id}/{attempts|trend|phrases}",
             "azure_batch": "/azure/pronunciation-assessment/batch",
+            "azure_batch_stream": "/azure/pronunciation-assessment/batch/stream",
+            "azure_batch_ndjson": "/azure/pronunciation-assessment/batch/ndjson",
             "azure_health": "/azure/health",
             "azure_languages": "/azure/languages",
             "health": "/health",
-            "info": "/info"
+            "ready": "/ready",
+            "info": "/info",
+            "metrics": "/metrics",
+            "admin_slow_requests": "/admin/slow-requests"
         },
         "supported_formats": ["wav", "mp3", "ogg", "flac"],
         "max_audio_duration": "60 seconds",
@@ -87,3 +123,47 @@ async def service_info():
     }
 
 
+@router.get(
+    "/metrics",
+    tags=["System"],
+    summary="Метрики сервиса",
+    description="Счетчики, gauge-значения и распределения времени выполнения текущего процесса"
+)
+async def service_metrics():
+    """
+    Метрики сервиса.
+    
+    Returns:
+        dict: Снимок метрик процесса
+    """
+    return get_metrics().snapshot()
+
+
+@router.get(
+    "/admin/slow-requests",
+    tags=["System"],
+    summary="Медленные запросы",
+    description=(
+        "Отчеты о запросах дольше APP_SLOW_REQUEST_THRESHOLD текущего процесса: этапы трассы, "
+        "метаданные запроса и выборочный профиль стеков, снятый во время выполнения. "
+        "Требует заголовок X-Admin-Token."
+    ),
+    dependencies=[Depends(require_admin_token)]
+)
+async def slow_requests(limit: int = Query(20, ge=1, le=1000)):
+    """
+    Последние отчеты о медленных запросах (от новых к старым).
+    
+    Returns:
+        dict: Порог, число запросов в обработке и отчеты
+    """
+    watchdog = get_slow_request_watchdog()
+    if watchdog is None:
+        return {"enabled": False, "pid": os.getpid(), "in_flight": 0, "reports": []}
+    return {
+        "enabled": True,
+        "pid": os.getpid(),
+        "threshold_seconds": watchdog.threshold,
+        "in_flight": watchdog.in_flight(),
+        "reports": watchdog.reports(limit)
+    }
@@ -0,0 +1,77 @@
+"""
+Продакшен режим запуска сервера.
+
+Gunicorn запускает несколько процессов-воркеров uvicorn (uvloop + httptools)
+с общим слушающим сокетом, созданным до fork. Воркеры перезапускаются после
+заданного количества запросов (со случайным разбросом, чтобы не
+перезапускаться одновременно), что ограничивает рост памяти.
+
+Состояние процесса (метрики, хранилища, кеш конфигураций SDK) сбрасывается
+в дочернем процессе через os.register_at_fork в соответствующих модулях,
+поэтому каждый воркер инициализирует его заново, в том числе при preload.
+"""
+
+import logging
+import os
+from typing import Any, Dict
+
+from uvicorn.workers import UvicornWorker
+
+from .config import get_app_config, get_azure_config
+
+logger = logging.getLogger(__name__)
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """Воркер uvicorn с uvloop и httptools."""
+
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def default_workers() -> int:
+    """Количество воркеров по умолчанию: число доступных процессу ядер."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def gunicorn_options() -> Dict[str, Any]:
+    """Настройки gunicorn из конфигурации приложения."""
+    app_config = get_app_config()
+    return {
+        "bind": f"{app_config.host}:{app_config.port}",
+        "workers": app_config.workers or default_workers(),
+        "worker_class": f"{__name__}.ProductionUvicornWorker",
+        "max_requests": app_config.max_requests,
+        "max_requests_jitter": app_config.max_requests_jitter,
+        # Воркер должен успеть завершить пакетный анализ при перезапуске
+        "graceful_timeout": get_azure_config().batch_timeout + 10,
+        "timeout": app_config.worker_timeout,
+        "keepalive": 5,
+        "preload_app": app_config.preload_app,
+        "accesslog": "-",
+        "errorlog": "-",
+        "loglevel": "info",
+    }
+
+
+def run_production(app_uri: str = "main:app") -> None:
+    """Запуск приложения под gunicorn с воркерами uvicorn."""
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+        def load_config(self):
+            for key, value in gunicorn_options().items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from gunicorn.util import import_app
+            return import_app(app_uri)
+
+    options = gunicorn_options()
+    logger.info(
+        f"Продакшен режим: {options['workers']} воркеров на {options['bind']}, "
+        f"перезапуск после {options['max_requests']}±{options['max_requests_jitter']} запросов"
+    )
+    Application().run()
@@ -0,0 +1,130 @@
+"""
+Измерение времени запуска и готовность приложения.
+
+Время отсчитывается от начала импорта main.py: фиксируются импорт
+приложения, завершение startup и первый отправленный ответ. Если время до
+первого ответа превышает бюджет (APP_STARTUP_BUDGET), это отражается в логах
+и метриках, чтобы регрессии холодного старта были заметны.
+
+Готовность (/ready) наступает, когда завершены все зарегистрированные
+компоненты запуска (например, загрузка SDK в фоне).
+"""
+
+import logging
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """Этапы запуска процесса и компоненты, от которых зависит готовность."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.budget: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+        self._pending: Set[str] = set()
+        self._failed: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def restart(self, started_at: float) -> None:
+        """
+        Начало отсчета (момент начала импорта приложения).
+        
+        Сохраняется самый ранний момент: при запуске через `python main.py`
+        модуль приложения импортируется повторно сервером.
+        """
+        self.started_at = min(self.started_at, started_at)
+
+    def mark(self, stage: str) -> float:
+        """
+        Фиксация этапа запуска; повторные отметки этапа игнорируются.
+        
+        Returns:
+            float: Время от начала запуска до этапа в секундах
+        """
+        elapsed = time.perf_counter() - self.started_at
+        with self._lock:
+            if stage in self.stages:
+                return self.stages[stage]
+            self.stages[stage] = elapsed
+        get_metrics().set_gauge("startup_seconds", round(elapsed, 6), stage=stage)
+        logger.info(f"Запуск: {stage} через {elapsed:.3f} с")
+        return elapsed
+
+    def require(self, component: str) -> None:
+        """Регистрация компонента, без которого приложение не готово."""
+        with self._lock:
+            self._pending.add(component)
+
+    def complete(self, component: str, error: Optional[str] = None) -> None:
+        """Завершение компонента (успешное или с ошибкой)."""
+        with self._lock:
+            self._pending.discard(component)
+            if error is not None:
+                self._failed[component] = error
+        self.mark(f"{component}_ready" if error is None else f"{component}_failed")
+        if self.ready:
+            self.mark("ready")
+
+    @property
+    def ready(self) -> bool:
+        """Готово ли приложение принимать запросы анализа."""
+        with self._lock:
+            return not self._pending and not self._failed
+
+    def status(self) -> Dict[str, object]:
+        """Состояние запуска для эндпоинта готовности."""
+        with self._lock:
+            return {
+                "ready": not self._pending and not self._failed,
+                "pending": sorted(self._pending),
+                "failed": dict(self._failed),
+                "stages": {stage: round(value, 6) for stage, value in self.stages.items()},
+                "budget": self.budget,
+            }
+
+    def check_budget(self, stage: str) -> None:
+        """Сравнение времени этапа с бюджетом запуска."""
+        elapsed = self.stages.get(stage)
+        if self.budget is None or elapsed is None or elapsed <= self.budget:
+            return
+        get_metrics().increment("startup_budget_exceeded_total", stage=stage)
+        logger.warning(f"Запуск: {stage} через {elapsed:.3f} с превышает бюджет {self.budget:.3f} с")
+
+
+# Глобальное состояние запуска процесса
+startup = StartupTracker()
+
+
+def get_startup() -> StartupTracker:
+    """Получить состояние запуска."""
+    return startup
+
+
+class FirstResponseMiddleware:
+    """Фиксация времени до первого отправленного ответа (time-to-first-response)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.recorded = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.recorded or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False) and not self.recorded:
+                self.recorded = True
+                startup.mark("first_response")
+                startup.check_budget("first_response")
+
+        await self.app(scope, receive, send_wrapper)
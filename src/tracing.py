@@ -0,0 +1,385 @@
+"""
+Трассировка этапов обработки запросов.
+
+Middleware создает трассу для каждого HTTP запроса, а этапы конвейера
+оценки (декодирование, валидация, кеш, ожидание в очереди, настройка SDK,
+распознавание, разбор, сериализация) оборачиваются в span(). Текущая трасса
+и span хранятся в contextvars, поэтому этапы элементов пакета, выполняемых в
+отдельных задачах, попадают в трассу своего запроса.
+
+Длительности этапов возвращаются в заголовке Server-Timing (суммарно по
+имени этапа) вместе с идентификатором трассы. Для потоковых ответов заголовок
+отправляется до завершения обработки и содержит только завершенные этапы.
+Доля запросов APP_TRACING_SAMPLE_RATE (или запросы с sampled в заголовке
+traceparent) экспортируется в формате OTLP/JSON в файл (строка JSON на
+пакет) и/или на OTLP/HTTP коллектор.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_app_config
+from .metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+# OTLP: SPAN_KIND_INTERNAL, SPAN_KIND_SERVER; STATUS_CODE_ERROR
+_KIND_INTERNAL = 1
+_KIND_SERVER = 2
+_STATUS_ERROR = 2
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+@dataclass
+class Span:
+    """Этап обработки запроса."""
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    duration_ns: int = 0
+    error: Optional[str] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1e6
+
+
+class Trace:
+    """Трасса одного запроса: корневой span и завершенные этапы."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                 sampled: bool = False):
+        self.trace_id = trace_id or _new_id(16)
+        self.sampled = sampled
+        self.root = Span(name, _new_id(8), parent_id, time.time_ns())
+        self.spans: List[Span] = []
+        # Незавершенные этапы: span_id -> (span, perf_counter_ns начала)
+        self.active: Dict[str, tuple] = {}
+        self._started = time.perf_counter_ns()
+
+    def finish(self) -> None:
+        self.root.duration_ns = time.perf_counter_ns() - self._started
+
+    def elapsed(self) -> float:
+        """Время с начала запроса в секундах."""
+        return (time.perf_counter_ns() - self._started) / 1e9
+
+    def stage_timings(self) -> Dict[str, Dict[str, float]]:
+        """Длительности этапов по имени (мс); незавершенные учитываются по текущему времени."""
+        now = time.perf_counter_ns()
+        stages: Dict[str, Dict[str, float]] = {}
+        for span_ in list(self.spans):
+            stage = stages.setdefault(span_.name, {"duration_ms": 0.0, "count": 0, "running": 0})
+            stage["duration_ms"] += span_.duration_ms
+            stage["count"] += 1
+        for span_, started in list(self.active.values()):
+            stage = stages.setdefault(span_.name, {"duration_ms": 0.0, "count": 0, "running": 0})
+            stage["duration_ms"] += (now - started) / 1e6
+            stage["count"] += 1
+            stage["running"] += 1
+        for stage in stages.values():
+            stage["duration_ms"] = round(stage["duration_ms"], 1)
+        return stages
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing: суммарная длительность этапов по имени."""
+        totals: Dict[str, List[float]] = {}
+        for span in list(self.spans):
+            total = totals.setdefault(span.name, [0.0, 0])
+            total[0] += span.duration_ms
+            total[1] += 1
+        parts = [
+            f'{name};dur={duration:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (duration, count) in totals.items()
+        ]
+        parts.append(f"total;dur={(time.perf_counter_ns() - self._started) / 1e6:.1f}")
+        parts.append(f'trace;desc="{self.trace_id}"')
+        return ", ".join(parts)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def get_current_trace() -> Optional[Trace]:
+    """Трасса текущего запроса (None вне запроса или при отключенной трассировке)."""
+    return _current_trace.get()
+
+
+def annotate(**attributes) -> None:
+    """Атрибуты запроса (язык, размер аудио и т.п.) в корневом span текущей трассы."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.root.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Этап обработки текущего запроса.
+
+    Вне трассируемого запроса ничего не записывает. Исключение отмечается в
+    span и пробрасывается дальше.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get() or trace.root
+    current = Span(name, _new_id(8), parent.span_id, time.time_ns(), attributes)
+    started = time.perf_counter_ns()
+    token = _current_span.set(current)
+    trace.active[current.span_id] = (current, started)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        current.duration_ns = time.perf_counter_ns() - started
+        _current_span.reset(token)
+        trace.active.pop(current.span_id, None)
+        trace.spans.append(current)
+
+
+def _parse_traceparent(value: Optional[str]):
+    """W3C traceparent: (trace_id, parent_id, sampled) или None."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or parts[1] == "0" * 32:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+def _attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        typed = {"boolValue": value}
+    elif isinstance(value, int):
+        typed = {"intValue": str(value)}
+    elif isinstance(value, float):
+        typed = {"doubleValue": value}
+    else:
+        typed = {"stringValue": str(value)}
+    return {"key": key, "value": typed}
+
+
+def _otlp_span(trace: Trace, span_: Span, kind: int) -> Dict[str, Any]:
+    item = {
+        "traceId": trace.trace_id,
+        "spanId": span_.span_id,
+        "name": span_.name,
+        "kind": kind,
+        "startTimeUnixNano": str(span_.start_ns),
+        "endTimeUnixNano": str(span_.start_ns + span_.duration_ns),
+        "attributes": [_attribute(key, value) for key, value in span_.attributes.items()],
+    }
+    if span_.parent_id:
+        item["parentSpanId"] = span_.parent_id
+    if span_.error:
+        item["status"] = {"code": _STATUS_ERROR, "message": span_.error}
+    return item
+
+
+def to_otlp(traces: List[Trace], service_name: str) -> Dict[str, Any]:
+    """ExportTraceServiceRequest в представлении OTLP/JSON."""
+    spans = []
+    for trace in traces:
+        spans.append(_otlp_span(trace, trace.root, _KIND_SERVER))
+        spans.extend(_otlp_span(trace, span_, _KIND_INTERNAL) for span_ in trace.spans)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _attribute("service.name", service_name),
+                _attribute("process.pid", os.getpid()),
+            ]},
+            "scopeSpans": [{"scope": {"name": "pronunciation-api"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """
+    Буфер выбранных трасс с периодической выгрузкой в OTLP/JSON.
+
+    Args:
+        service_name: Значение service.name ресурса
+        file_path: Файл, в который дописывается строка JSON на каждый пакет
+        endpoint: Адрес OTLP/HTTP коллектора (например, http://collector:4318/v1/traces)
+        flush_interval: Период выгрузки в секундах
+        max_buffer: Предел буфера трасс; при переполнении трассы отбрасываются
+    """
+
+    def __init__(
+        self,
+        service_name: str,
+        file_path: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        flush_interval: float = 5.0,
+        max_buffer: int = 10_000
+    ):
+        self.service_name = service_name
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._buffer: List[Trace] = []
+        self._task: Optional[asyncio.Task] = None
+        self._client = None
+
+    def submit(self, trace: Trace) -> None:
+        if len(self._buffer) >= self.max_buffer:
+            get_metrics().increment("tracing_dropped_traces_total")
+            return
+        self._buffer.append(trace)
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self._client is not None:
+            await self._client.aclose()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        """Выгрузка накопленных трасс одним пакетом."""
+        if not self._buffer:
+            return
+        traces, self._buffer = self._buffer, []
+        body = orjson.dumps(to_otlp(traces, self.service_name))
+        metrics = get_metrics()
+        try:
+            if self.file_path:
+                await asyncio.to_thread(self._append, body)
+            if self.endpoint:
+                await self._post(body)
+        except Exception as e:
+            metrics.increment("tracing_export_errors_total")
+            logger.error(f"Ошибка выгрузки трасс ({len(traces)}): {str(e)}")
+            return
+        metrics.increment("tracing_traces_exported_total", len(traces))
+
+    def _append(self, body: bytes) -> None:
+        with open(self.file_path, "ab") as f:
+            f.write(body + b"\n")
+
+    async def _post(self, body: bytes) -> None:
+        if self._client is None:
+            # httpx нужен только для выгрузки на коллектор
+            import httpx
+            self._client = httpx.AsyncClient(timeout=10.0)
+        response = await self._client.post(
+            self.endpoint, content=body, headers={"content-type": "application/json"}
+        )
+        response.raise_for_status()
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def start_tracing_export() -> Optional[TraceExporter]:
+    """Запуск выгрузки трасс, если задан файл или коллектор (вызывается при старте воркера)."""
+    global _exporter
+    config = get_app_config()
+    if not (config.tracing_export_file or config.tracing_export_endpoint):
+        return None
+    _exporter = TraceExporter(
+        config.app_name,
+        config.tracing_export_file,
+        config.tracing_export_endpoint,
+        config.tracing_flush_interval
+    )
+    _exporter.start()
+    return _exporter
+
+
+async def stop_tracing_export() -> None:
+    """Выгрузка оставшихся трасс при остановке воркера."""
+    global _exporter
+    if _exporter is not None:
+        await _exporter.stop()
+        _exporter = None
+
+
+class TracingMiddleware:
+    """
+    Middleware трассировки HTTP запросов.
+
+    Args:
+        app: ASGI приложение
+        path_prefix: Префикс путей, для которых ведется трассировка
+        sample_rate: Доля запросов, экспортируемых в OTLP (0-1)
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str, sample_rate: float):
+        self.app = app
+        self.path_prefix = path_prefix
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        parent = _parse_traceparent(Headers(scope=scope).get("traceparent"))
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = None, None, random.random() < self.sample_rate
+        trace = Trace(f"{scope['method']} {scope['path']}", trace_id, parent_id, sampled)
+        trace.root.attributes.update({"http.method": scope["method"], "http.target": scope["path"]})
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                trace.root.attributes["http.status_code"] = message["status"]
+                if message["status"] >= 500:
+                    trace.root.error = f"HTTP {message['status']}"
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", trace.server_timing().encode("latin-1")),
+                    (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(None)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+            trace.finish()
+            if trace.sampled and _exporter is not None:
+                _exporter.submit(trace)
@@ -0,0 +1,359 @@
+"""
+Снимки медленных запросов.
+
+Средние значения скрывают патологические запросы, а к моменту их
+завершения причина уже не видна. Отдельный поток-наблюдатель следит за
+запросами в обработке; когда запрос превышает порог APP_SLOW_REQUEST_THRESHOLD,
+он, пока запрос еще выполняется, снимает выборочный профиль:
+
+- стеки потоков через sys._current_frames() несколько раз с коротким
+  интервалом: поток цикла событий отдельно (видно, чем занят или заблокирован
+  цикл), остальные потоки - агрегированно по одинаковым стекам;
+- цепочку ожидания (await) задачи запроса, собранную в самом цикле событий;
+  если цикл не выполнил обратный вызов за время снятия профиля, он
+  отмечается как заблокированный.
+
+Отчет содержит длительности этапов из трассы запроса (tracing), в том числе
+еще не завершенных, и метаданные запроса (размер тела, формат аудио и
+ответа, язык, количество слов). Последние отчеты хранятся в кольцевом буфере
+и доступны через /api/v1/admin/slow-requests по токену администратора.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import get_app_config
+from .metrics import get_metrics
+from .tracing import Trace, get_current_trace
+
+logger = logging.getLogger(__name__)
+
+# Глубина стека и количество самых частых стеков в отчете
+STACK_LIMIT = 40
+TOP_STACKS = 5
+# Минимальный интервал между снятиями профиля (при массовом замедлении)
+CAPTURE_COOLDOWN = 1.0
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{frame.f_globals.get('__name__', code.co_filename)}.{code.co_name}:{frame.f_lineno}"
+
+
+def _thread_stack(frame) -> tuple:
+    """Стек потока от внешнего вызова к текущему (не глубже STACK_LIMIT)."""
+    names = []
+    while frame is not None and len(names) < STACK_LIMIT:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return tuple(reversed(names))
+
+
+def _coroutine_stack(task: asyncio.Task) -> List[str]:
+    """Цепочка await задачи: от корутины задачи до текущей точки ожидания."""
+    names = []
+    coroutine = task.get_coro()
+    while coroutine is not None and len(names) < STACK_LIMIT:
+        frame = getattr(coroutine, "cr_frame", None) or getattr(coroutine, "gi_frame", None) \
+            or getattr(coroutine, "ag_frame", None)
+        if frame is None:
+            break
+        names.append(_frame_name(frame))
+        coroutine = getattr(coroutine, "cr_await", None) or getattr(coroutine, "gi_yieldfrom", None) \
+            or getattr(coroutine, "ag_await", None)
+    return names
+
+
+def _top(stacks: Counter) -> List[Dict[str, Any]]:
+    return [{"samples": count, "stack": list(stack)} for stack, count in stacks.most_common(TOP_STACKS)]
+
+
+@dataclass
+class _InFlight:
+    method: str
+    path: str
+    request_bytes: Optional[int]
+    trace: Optional[Trace]
+    loop: asyncio.AbstractEventLoop
+    loop_thread: int
+    task: Optional[asyncio.Task]
+    started: float = field(default_factory=time.perf_counter)
+    report: Optional[Dict[str, Any]] = None
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+
+class SlowRequestWatchdog:
+    """
+    Наблюдатель запросов в обработке со снятием профиля медленных.
+
+    Args:
+        threshold: Порог длительности запроса в секундах
+        samples: Количество снимков стеков в профиле
+        sample_interval: Интервал между снимками стеков в секундах
+        max_reports: Размер кольцевого буфера отчетов
+    """
+
+    def __init__(self, threshold: float, samples: int = 20, sample_interval: float = 0.01, max_reports: int = 50):
+        self.threshold = threshold
+        self.samples = samples
+        self.sample_interval = sample_interval
+        self.poll_interval = min(0.5, threshold / 4)
+        self._in_flight: Dict[int, _InFlight] = {}
+        self._reports: deque = deque(maxlen=max_reports)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._last_capture = 0.0
+
+    # --- Регистрация запросов (цикл событий) -----------------------------------
+
+    def track(self, scope: Scope) -> _InFlight:
+        content_length = Headers(scope=scope).get("content-length")
+        entry = _InFlight(
+            method=scope["method"],
+            path=scope["path"],
+            request_bytes=int(content_length) if content_length and content_length.isdigit() else None,
+            trace=get_current_trace(),
+            loop=asyncio.get_running_loop(),
+            loop_thread=threading.get_ident(),
+            task=asyncio.current_task()
+        )
+        with self._lock:
+            self._in_flight[id(entry)] = entry
+        return entry
+
+    def done(self, entry: _InFlight, status: Optional[int]) -> None:
+        """Завершение запроса: итоговая длительность и этапы в отчете медленного запроса."""
+        elapsed = entry.elapsed
+        with self._lock:
+            self._in_flight.pop(id(entry), None)
+            if elapsed < self.threshold:
+                return
+            if entry.report is None:
+                # Запрос завершился до снятия профиля: отчет без стеков
+                entry.report = self._report(entry, elapsed)
+                self._reports.append(entry.report)
+                get_metrics().increment("slow_requests_total")
+            entry.report.update(
+                completed=True,
+                duration_seconds=round(elapsed, 3),
+                status=status,
+                stages=entry.trace.stage_timings() if entry.trace else {}
+            )
+
+    # --- Поток-наблюдатель -----------------------------------------------------
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="slow-request-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            if time.monotonic() - self._last_capture < CAPTURE_COOLDOWN:
+                continue
+            with self._lock:
+                slow = [
+                    entry for entry in self._in_flight.values()
+                    if entry.report is None and entry.elapsed >= self.threshold
+                ]
+            if slow:
+                try:
+                    self._capture(slow)
+                except Exception as e:
+                    logger.error(f"Ошибка снятия профиля медленного запроса: {str(e)}")
+                self._last_capture = time.monotonic()
+
+    def _report(self, entry: _InFlight, elapsed: float) -> Dict[str, Any]:
+        payload: Dict[str, Any] = {"request_bytes": entry.request_bytes}
+        if entry.trace is not None:
+            payload.update(
+                (key, value) for key, value in entry.trace.root.attributes.items() if not key.startswith("http.")
+            )
+        return {
+            "trace_id": entry.trace.trace_id if entry.trace else None,
+            "method": entry.method,
+            "path": entry.path,
+            "captured_at": time.time(),
+            "elapsed_at_capture_seconds": round(elapsed, 3),
+            "completed": False,
+            "duration_seconds": None,
+            "status": None,
+            "payload": payload,
+            "stages": entry.trace.stage_timings() if entry.trace else {},
+            "profile": None,
+        }
+
+    def _capture(self, entries: List[_InFlight]) -> None:
+        """Профиль для всех запросов, ставших медленными (один на всех)."""
+        started = time.perf_counter()
+        loop = entries[0].loop
+        loop_thread = entries[0].loop_thread
+
+        # Цепочки await собираются в цикле событий; если он не успеет — цикл заблокирован
+        task_stacks: Dict[int, List[str]] = {}
+        collected = threading.Event()
+
+        def collect() -> None:
+            for entry in entries:
+                if entry.task is not None:
+                    task_stacks[id(entry)] = _coroutine_stack(entry.task)
+            collected.set()
+
+        try:
+            loop.call_soon_threadsafe(collect)
+        except RuntimeError:  # цикл закрыт
+            collected.set()
+
+        loop_stacks: Counter = Counter()
+        thread_stacks: Counter = Counter()
+        own = threading.get_ident()
+        for index in range(self.samples):
+            frames = sys._current_frames()
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                (loop_stacks if ident == loop_thread else thread_stacks)[_thread_stack(frame)] += 1
+            # Ссылки на кадры не должны удерживать локальные переменные потоков
+            del frames, frame
+            if index + 1 < self.samples:
+                time.sleep(self.sample_interval)
+        responsive = collected.wait(timeout=self.sample_interval)
+
+        profile = {
+            "samples": self.samples,
+            "sample_interval_seconds": self.sample_interval,
+            "event_loop_responsive": responsive,
+            "event_loop": _top(loop_stacks),
+            "threads": _top(thread_stacks),
+        }
+        metrics = get_metrics()
+        with self._lock:
+            for entry in entries:
+                if entry.report is not None:
+                    continue
+                report = self._report(entry, entry.elapsed)
+                report["profile"] = dict(profile, task_stack=task_stacks.get(id(entry)), stages=report["stages"])
+                entry.report = report
+                self._reports.append(report)
+                metrics.increment("slow_requests_total")
+                logger.warning(
+                    f"Медленный запрос {entry.method} {entry.path}: {report['elapsed_at_capture_seconds']} с "
+                    f"(трасса {report['trace_id']}), снят профиль"
+                )
+        if not responsive:
+            metrics.increment("slow_request_event_loop_blocked_total")
+        metrics.increment("slow_request_captures_total")
+        metrics.observe("slow_request_capture_seconds", time.perf_counter() - started)
+
+    # --- Отчеты ---------------------------------------------------------------
+
+    def reports(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Отчеты от новых к старым."""
+        with self._lock:
+            reports = list(self._reports)[::-1]
+        return reports[:limit] if limit else reports
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+
+_watchdog: Optional[SlowRequestWatchdog] = None
+
+
+def _reset_after_fork() -> None:
+    """Поток-наблюдатель и запросы родителя не переходят в воркер."""
+    global _watchdog
+    _watchdog = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def get_slow_request_watchdog() -> Optional[SlowRequestWatchdog]:
+    """Наблюдатель медленных запросов (None, если APP_SLOW_REQUEST_THRESHOLD = 0)."""
+    global _watchdog
+    config = get_app_config()
+    if config.slow_request_threshold <= 0:
+        return None
+    if _watchdog is None:
+        _watchdog = SlowRequestWatchdog(
+            config.slow_request_threshold,
+            config.slow_request_samples,
+            config.slow_request_sample_interval,
+            config.slow_request_reports
+        )
+    return _watchdog
+
+
+def start_watchdog() -> Optional[SlowRequestWatchdog]:
+    """Запуск потока-наблюдателя (вызывается при старте воркера: потоки не переживают fork)."""
+    watchdog = get_slow_request_watchdog()
+    if watchdog is not None:
+        watchdog.start()
+    return watchdog
+
+
+def stop_watchdog() -> None:
+    if _watchdog is not None:
+        _watchdog.stop()
+
+
+class SlowRequestMiddleware:
+    """
+    Регистрация запросов в наблюдателе медленных запросов.
+
+    Располагается внутри TracingMiddleware, чтобы отчет содержал этапы и
+    атрибуты трассы запроса.
+
+    Args:
+        app: ASGI приложение
+        path_prefix: Префикс наблюдаемых путей
+    """
+
+    def __init__(self, app: ASGIApp, path_prefix: str):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        watchdog = get_slow_request_watchdog()
+        if watchdog is None or scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        entry = watchdog.track(scope)
+        status = None
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            watchdog.done(entry, status)